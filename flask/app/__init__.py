@@ -1,5 +1,7 @@
 from flask import Flask
 from flask_login import LoginManager
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import OperationalError
 from app.models import db, User
 from app.config import Config
 
@@ -46,5 +48,24 @@ def create_app(config_class=Config):
     
     with app.app_context():
         db.create_all()
+        
+        # create_all does not add columns to existing tables
+        columns = {column['name'] for column in inspect(db.engine).get_columns('health_records')}
+        if 'model_probability' not in columns:
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(text('ALTER TABLE health_records ADD COLUMN model_probability FLOAT'))
+            except OperationalError:
+                pass  # another worker added it first
+        
+        if app.config.get('PREDICTION_WRITE_BEHIND'):
+            from app.utils.write_behind import WriteBehindQueue
+            write_behind = WriteBehindQueue(app,
+                                            app.config['PREDICTION_WRITE_BEHIND_DIR'],
+                                            interval_ms=app.config['PREDICTION_WRITE_BEHIND_INTERVAL_MS'],
+                                            fsync=app.config['PREDICTION_WRITE_BEHIND_FSYNC'],
+                                            max_attempts=app.config['PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS'])
+            write_behind.replay()
+            app.extensions['write_behind'] = write_behind
     
     return app
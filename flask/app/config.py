@@ -5,3 +5,80 @@ class Config:
     basedir = os.path.abspath(os.path.dirname(os.path.dirname(__file__)))
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or f'sqlite:///{os.path.join(basedir, "health_app.db")}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Maximum number of patients accepted by /prediction/batch in one request
+    PREDICTION_BATCH_MAX_ROWS = int(os.environ.get('PREDICTION_BATCH_MAX_ROWS', 10000))
+    # and the largest request body it will read (checked before parsing)
+    PREDICTION_BATCH_MAX_BYTES = int(os.environ.get('PREDICTION_BATCH_MAX_BYTES', 10 * 1024 * 1024))
+    
+    # Versioned model artifacts published by train_merged_model.py
+    MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR') or os.path.join(basedir, 'model_registry')
+    MODEL_REGISTRY_POLL_SECONDS = float(os.environ.get('MODEL_REGISTRY_POLL_SECONDS', 5))
+    
+    # Explanations are built when a model version loads. A tree model with more (leaf, path feature)
+    # pairs than this (about 1 ms per explained row) is explained through its first-stage model instead,
+    # when the version has one; those explanations are marked approximate
+    EXPLAIN_MAX_TREE_PAIRS = int(os.environ.get('EXPLAIN_MAX_TREE_PAIRS', 30000))
+    
+    # Coalesce concurrent single-row predictions into one model call
+    PREDICTION_MICROBATCH_ENABLED = os.environ.get('PREDICTION_MICROBATCH_ENABLED', 'false').lower() == 'true'
+    PREDICTION_MICROBATCH_MAX_SIZE = int(os.environ.get('PREDICTION_MICROBATCH_MAX_SIZE', 64))
+    PREDICTION_MICROBATCH_WAIT_MS = float(os.environ.get('PREDICTION_MICROBATCH_WAIT_MS', 2))
+    
+    # 'inprocess' scores in the web worker; 'process_pool' scores in a pool of worker processes
+    INFERENCE_BACKEND = os.environ.get('INFERENCE_BACKEND', 'inprocess')
+    INFERENCE_POOL_WORKERS = int(os.environ.get('INFERENCE_POOL_WORKERS', os.cpu_count() or 1))
+    
+    # LRU cache of scores and plans for resubmitted inputs (0 disables it)
+    PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 1024))
+    PREDICTION_CACHE_TTL_SECONDS = float(os.environ.get('PREDICTION_CACHE_TTL_SECONDS', 300))
+    
+    # Hand prediction side-effect writes to a journaled background writer
+    PREDICTION_WRITE_BEHIND = os.environ.get('PREDICTION_WRITE_BEHIND', 'false').lower() == 'true'
+    PREDICTION_WRITE_BEHIND_DIR = os.environ.get('PREDICTION_WRITE_BEHIND_DIR') or os.path.join(basedir, 'write_behind')
+    PREDICTION_WRITE_BEHIND_INTERVAL_MS = float(os.environ.get('PREDICTION_WRITE_BEHIND_INTERVAL_MS', 50))
+    PREDICTION_WRITE_BEHIND_FSYNC = os.environ.get('PREDICTION_WRITE_BEHIND_FSYNC', 'true').lower() == 'true'
+    # Failed commits of one journal segment before it is set aside as .failed
+    PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('PREDICTION_WRITE_BEHIND_MAX_ATTEMPTS', 5))
+    
+    # Online SGD learner trained from RL feedback, shadow-scored and published when it beats the serving model
+    ONLINE_LEARNING_ENABLED = os.environ.get('ONLINE_LEARNING_ENABLED', 'false').lower() == 'true'
+    ONLINE_LEARNING_INTERVAL_SECONDS = float(os.environ.get('ONLINE_LEARNING_INTERVAL_SECONDS', 5))
+    ONLINE_LEARNING_WINDOW = int(os.environ.get('ONLINE_LEARNING_WINDOW', 200))
+    ONLINE_LEARNING_MIN_SAMPLES = int(os.environ.get('ONLINE_LEARNING_MIN_SAMPLES', 100))
+    
+    # Seconds an RL dashboard event stream stays open before the browser reconnects
+    # (each open stream holds a request thread: keep it short unless workers are async)
+    RL_STATS_STREAM_SECONDS = int(os.environ.get('RL_STATS_STREAM_SECONDS', 25))
+    
+    # train_merged_model.py: CV folds and worker processes (-1 = all cores)
+    TRAINING_CV_FOLDS = int(os.environ.get('TRAINING_CV_FOLDS', 5))
+    TRAINING_N_JOBS = int(os.environ.get('TRAINING_N_JOBS', -1))
+    TRAINING_SEARCH_DIR = os.environ.get('TRAINING_SEARCH_DIR') or os.path.join(basedir, 'training_search')
+    DATASET_CACHE_DIR = os.environ.get('DATASET_CACHE_DIR') or os.path.join(basedir, 'dataset_cache')
+    # train_merged_model.py --production: labelled health records exported here, read in chunks of this size
+    PRODUCTION_DATA_FILE = os.environ.get('PRODUCTION_DATA_FILE') or os.path.join(basedir, 'production_feedback.csv')
+    RETRAIN_CHUNK_SIZE = int(os.environ.get('RETRAIN_CHUNK_SIZE', 1000))
+    
+    # Model selection budget: candidates slower or larger than this are skipped;
+    # models within the accuracy tolerance of the best count as ties, won by the fastest
+    SELECTION_MAX_SINGLE_P99_MS = float(os.environ.get('SELECTION_MAX_SINGLE_P99_MS', 10))
+    SELECTION_MAX_MODEL_MB = float(os.environ.get('SELECTION_MAX_MODEL_MB', 100))
+    SELECTION_ACCURACY_TOLERANCE = float(os.environ.get('SELECTION_ACCURACY_TOLERANCE', 0.005))
+    
+    # Distillation of the selected model into a logistic or shallow-tree student; the student
+    # serves only when it agrees with the teacher on at least DISTILLATION_MIN_AGREEMENT of test rows
+    DISTILLATION_ENABLED = os.environ.get('DISTILLATION_ENABLED', 'true').lower() == 'true'
+    DISTILLATION_SYNTHETIC_SAMPLES = int(os.environ.get('DISTILLATION_SYNTHETIC_SAMPLES', 5000))
+    DISTILLATION_TREE_DEPTH = int(os.environ.get('DISTILLATION_TREE_DEPTH', 6))
+    DISTILLATION_MIN_AGREEMENT = float(os.environ.get('DISTILLATION_MIN_AGREEMENT', 0.97))
+    
+    # Cascade inference for versions published with a first-stage model: rows whose first-stage
+    # probability is within CASCADE_BAND of the probability that calibrates to CASCADE_THRESHOLD
+    # are rescored by the full model; CASCADE_AUDIT_RATE of the other rows are rescored too, only
+    # to measure agreement. Off by default: outside the band the served label can differ from the
+    # full model's (see the 'cascade' agreement in the model metadata before enabling it)
+    CASCADE_ENABLED = os.environ.get('CASCADE_ENABLED', 'false').lower() == 'true'
+    CASCADE_THRESHOLD = float(os.environ.get('CASCADE_THRESHOLD', 0.5))
+    CASCADE_BAND = float(os.environ.get('CASCADE_BAND', 0.15))
+    CASCADE_AUDIT_RATE = float(os.environ.get('CASCADE_AUDIT_RATE', 0.01))
@@ -1,7 +1,13 @@
-from flask import render_template, redirect, url_for, flash, request
+from flask import render_template, redirect, url_for, flash, request, jsonify
 from flask_login import login_required, current_user
 from app.doctor import doctor_bp
 from app.models import db, User, DoctorNote, Appointment, HealthRecord
+from app.utils.health_checkup import (generate_cohort_checkup_codes, decode_blood_tests,
+                                      CHECKUP_FREQUENCY_LEVELS, BP_CATEGORIES, EXERCISE_PLANS, SLEEP_PLANS,
+                                      STRESS_PLANS, BLOOD_TESTS)
+from sqlalchemy import func
+import numpy as np
+import pandas as pd
 from datetime import datetime, timedelta
 
 def doctor_required(f):
@@ -61,11 +67,66 @@ def patient_details(patient_id):
         doctor_id=current_user.id
     ).order_by(DoctorNote.created_at.desc()).all()
     
+    # Top factors behind each recent risk score, explained in one batch
+    explanations = _explain_records(health_records[:10], top=3) or []
+    
     return render_template('doctor/patient_details.html',
                          patient=patient,
                          health_records=health_records,
+                         explanations=explanations,
                          doctor_notes=doctor_notes)
 
+def _explain_records(records, top=None):
+    """
+    Explanations for health records under the model currently served (None if it has no explainer)
+
+    These are approximations: the record may have been scored by an earlier model version,
+    and the features it does not store are taken at their training mean. Each explanation
+    says which model version and imputed features it used, and whether it reproduces the
+    stored model probability (matches_stored_score)
+    """
+    if not records:
+        return []
+    from app.prediction.routes import explain_features, model_registry, FEATURE_NAMES
+    from app.utils.production_data import record_feature_row, RECORD_FEATURES
+    bundle = model_registry.current()
+    if bundle is None or not hasattr(bundle.scaler, 'mean_'):
+        return None  # explainers need the scaler's training means as well
+    training_means = dict(zip(FEATURE_NAMES, bundle.scaler.mean_))
+    stored = [record.model_probability if record.model_probability is not None else np.nan for record in records]
+    explanations = explain_features([record_feature_row(record, FEATURE_NAMES, training_means) for record in records],
+                                    bundle, top=top, model_probabilities=stored)
+    if explanations is None:
+        return None
+    imputed = [name for name in FEATURE_NAMES if name not in RECORD_FEATURES]
+    for explanation, probability in zip(explanations, stored):
+        explanation['model_version'] = bundle.version
+        explanation['imputed_features'] = imputed
+        explanation['matches_stored_score'] = bool(abs(explanation['model_probability'] - probability) < 1e-6)
+    return explanations
+
+@doctor_bp.route('/patient/<int:patient_id>/explanations')
+@login_required
+@doctor_required
+def patient_explanations(patient_id):
+    """Per-feature contributions for every health record of a patient"""
+    health_records = HealthRecord.query.filter_by(user_id=patient_id).order_by(
+        HealthRecord.created_at.desc()
+    ).all()
+    
+    explanations = _explain_records(health_records)
+    if explanations is None:
+        return jsonify({'error': 'The served model does not support explanations'}), 501
+    
+    return jsonify({
+        'patient_id': patient_id,
+        'records': [
+            {'record_id': record.id, 'created_at': record.created_at.isoformat(), 'risk_level': record.risk_level,
+             **explanation}
+            for record, explanation in zip(health_records, explanations)
+        ]
+    })
+
 @doctor_bp.route('/patient/<int:patient_id>/add-note', methods=['POST'])
 @login_required
 @doctor_required
@@ -119,3 +180,56 @@ def cancel_appointment(appointment_id):
     db.session.commit()
     flash('Appointment cancelled.', 'success')
     return redirect(url_for('doctor.appointments'))
+
+@doctor_bp.route('/cohort/checkups')
+@login_required
+@doctor_required
+def cohort_checkups():
+    """Checkup frequency and blood tests for the doctor's whole panel, from each patient's latest record"""
+    patient_ids = db.session.query(Appointment.patient_id).filter(Appointment.doctor_id == current_user.id)
+    latest_ids = db.session.query(func.max(HealthRecord.id)).filter(
+        HealthRecord.user_id.in_(patient_ids)
+    ).group_by(HealthRecord.user_id)
+    
+    rows = db.session.query(
+        HealthRecord.user_id, User.username, HealthRecord.age, HealthRecord.bmi, HealthRecord.glucose,
+        HealthRecord.bp_systolic, HealthRecord.bp_diastolic, HealthRecord.risk_level, HealthRecord.family_history
+    ).join(User, User.id == HealthRecord.user_id).filter(HealthRecord.id.in_(latest_ids)).all()
+    
+    if not rows:
+        return jsonify({'total_patients': 0, 'frequency_summary': {}, 'blood_test_summary': {}, 'patients': []})
+    
+    panel = pd.DataFrame(rows, columns=['user_id', 'username', 'age', 'bmi', 'glucose',
+                                        'bp_systolic', 'bp_diastolic', 'risk_level', 'family_history'])
+    codes = generate_cohort_checkup_codes(
+        panel['age'], panel['bmi'], panel['glucose'], panel['bp_systolic'], panel['bp_diastolic'],
+        panel['risk_level'] == 'High', panel['family_history'].fillna(False)
+    )
+    
+    frequency_counts = np.bincount(codes['checkup_frequency'], minlength=len(CHECKUP_FREQUENCY_LEVELS))
+    masks = codes['blood_tests'].to_numpy()
+    test_counts = [int(((masks >> bit) & 1).sum()) for bit in range(len(BLOOD_TESTS))]
+    
+    return jsonify({
+        'total_patients': len(panel),
+        'frequency_summary': {
+            level['doctor_visits']: int(count)
+            for level, count in zip(CHECKUP_FREQUENCY_LEVELS, frequency_counts) if count
+        },
+        'blood_test_summary': {name: count for name, count in zip(BLOOD_TESTS, test_counts) if count},
+        'patients': [
+            {
+                'patient_id': int(patient.user_id),
+                'username': patient.username,
+                'doctor_visits': CHECKUP_FREQUENCY_LEVELS[code.checkup_frequency]['doctor_visits'],
+                'bp_category': BP_CATEGORIES[code.bp_category],
+                'blood_tests': decode_blood_tests(code.blood_tests),
+                'exercise': EXERCISE_PLANS[code.exercise_plan],
+                'sleep': SLEEP_PLANS[code.sleep_plan],
+                'stress_management': STRESS_PLANS[code.stress_plan],
+                'glucose_monitoring': bool(code.glucose_monitoring),
+                'weight_management': bool(code.weight_management)
+            }
+            for patient, code in zip(panel.itertuples(), codes.itertuples())
+        ]
+    })
@@ -46,6 +46,7 @@ class HealthRecord(db.Model):
     family_history = db.Column(db.Boolean, default=False)
     
     prediction_result = db.Column(db.Integer, nullable=False)
+    model_probability = db.Column(db.Float)  # uncalibrated model output, learned from by the RL calibration
     risk_level = db.Column(db.String(20), nullable=False)
     
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -54,6 +55,17 @@ class HealthRecord(db.Model):
         return f'<HealthRecord {self.id} - User {self.user_id}>'
 
 
+class IdSequence(db.Model):
+    """Block allocator for ids handed out before the row is written (write-behind inserts)"""
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.Integer, nullable=False)
+    
+    def __repr__(self):
+        return f'<IdSequence {self.name} - {self.next_value}>'
+
+
 class Gamification(db.Model):
     __tablename__ = 'gamification'
     
@@ -109,6 +121,13 @@ class Gamification(db.Model):
         if self.current_streak >= 30 and not self.badge_consistency_king:
             self.badge_consistency_king = True
     
+    def record_prediction(self, points=20):
+        """Apply the gamification side effects of one prediction"""
+        self.predictions_count += 1
+        self.update_streak()
+        self.add_points(points)
+        self.check_and_award_badges()
+    
     def check_and_award_badges(self):
         if self.predictions_count >= 1 and not self.badge_first_prediction:
             self.badge_first_prediction = True
@@ -1,29 +1,172 @@
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, current_app, Response, flash, abort
 from flask_login import login_required, current_user
 from app.prediction import prediction_bp
-from app.models import db, HealthRecord, Gamification
+from app.models import db, User, HealthRecord, Gamification
 import numpy as np
-import joblib
+from app.config import Config
 from app.utils.diet_planner import generate_diet_plan
 from app.utils.health_checkup import generate_health_checkup_plan
-from sklearn.preprocessing import StandardScaler
+from app.utils.model_registry import ModelRegistry
+from app.utils.micro_batcher import MicroBatcher
+from app.utils.inference_pool import InferencePool
+from app.utils.prediction_cache import PredictionCache
+from app.utils.online_learner import OnlineLearner
+from app.utils.cascade import CascadeRouter
+from app.utils.explainer import explain_rows
 import pandas as pd
+import io
+import json
 import os
+import time
+from datetime import datetime
 from rl_feedback_system import rl_system
 
-# Load new merged model and scaler
+# Feature order expected by the scaler and model
+FEATURE_NAMES = ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
+                 'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age']
+
+# Versioned model registry; workers pick up newly published versions without a restart
 base_path = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-model_path = os.path.join(base_path, 'model_merged.pkl')
-scaler_path = os.path.join(base_path, 'scaler_merged.pkl')
+model_registry = ModelRegistry(Config.MODEL_REGISTRY_DIR,
+                               poll_interval=Config.MODEL_REGISTRY_POLL_SECONDS,
+                               explain_max_cost=Config.EXPLAIN_MAX_TREE_PAIRS)
+
+if not model_registry.refresh(force=True):
+    # Nothing published yet: serve the artifacts train_merged_model.py writes next to the app
+    try:
+        model_registry.load_legacy(os.path.join(base_path, 'model_merged.pkl'),
+                                   os.path.join(base_path, 'scaler_merged.pkl'),
+                                   os.path.join(base_path, 'model_metadata.pkl'))
+        print("✓ Loaded merged model and scaler for probability-based predictions")
+    except Exception as e:
+        print(f"⚠ Could not load merged model: {e}. Run train_merged_model.py to publish one.")
+
+# Optional process-pool backend so CPU-heavy ensembles do not hold this worker's GIL
+inference_pool = None
+if Config.INFERENCE_BACKEND == 'process_pool':
+    inference_pool = InferencePool(Config.MODEL_REGISTRY_DIR,
+                                   os.path.join(base_path, 'model_merged.pkl'),
+                                   os.path.join(base_path, 'scaler_merged.pkl'),
+                                   max_workers=Config.INFERENCE_POOL_WORKERS)
+
+# Cascade: versions published with a first-stage model only run the full model near the threshold
+cascade_router = None
+if Config.CASCADE_ENABLED:
+    cascade_router = CascadeRouter(threshold=Config.CASCADE_THRESHOLD, band=Config.CASCADE_BAND,
+                                   audit_rate=Config.CASCADE_AUDIT_RATE)
 
-try:
-    model = joblib.load(model_path)
-    scaler = joblib.load(scaler_path)
-    print("✓ Loaded merged model and scaler for probability-based predictions")
-except Exception as e:
-    print(f"⚠ Could not load merged model: {e}. Falling back to old model.")
-    model = joblib.load(os.path.join(base_path, 'model.pkl'))
-    scaler = StandardScaler()
+def predict_full_model(features, bundle):
+    """Probabilities from the version's full model, in a pool worker when that backend is enabled"""
+    if inference_pool is not None:
+        return inference_pool.predict_positive(features, bundle.version)
+    return bundle.predict_positive(features)
+
+def score_features(features, bundle=None):
+    """
+    Score a matrix of patients (one row per patient, FEATURE_NAMES order)
+    Returns (risk_scores, pred_values, model_probabilities) as NumPy arrays:
+    calibrated risk scores in 0-100, and the uncalibrated model probabilities in 0-1
+    """
+    bundle = bundle or model_registry.current()
+    if bundle is None:
+        raise RuntimeError('No prediction model is available')
+    
+    features = np.asarray(features, dtype=float)
+    
+    try:
+        if cascade_router is not None and bundle.first_stage is not None:
+            # The served label is calibrated risk >= 50, so the band goes around the model
+            # probability that calibrates to it, not around the configured raw threshold
+            model_probabilities, _ = cascade_router.predict_positive(
+                features, bundle.predict_first_stage, lambda rows: predict_full_model(rows, bundle),
+                threshold=rl_system.raw_threshold(cascade_router.threshold))
+        else:
+            model_probabilities = predict_full_model(features, bundle)
+        
+        # Calibrate the whole array of risk scores with the map learned from feedback
+        risk_scores = rl_system.adjust_risk_score(model_probabilities * 100)
+        pred_values = (risk_scores >= 50).astype(int)
+    except Exception as e:
+        print(f"Probability prediction error: {e}")
+        # Fallback to binary prediction
+        pred_values = np.asarray(bundle.model.predict(bundle.scaler.transform(features))).astype(int)
+        risk_scores = pred_values * 100.0
+        model_probabilities = pred_values.astype(float)
+    
+    return risk_scores, pred_values, model_probabilities
+
+def explain_features(features, bundle=None, top=None, model_probabilities=None):
+    """
+    Per-feature contributions to the model probability of each row (FEATURE_NAMES order)
+
+    With model_probabilities (the probabilities that were served), each row is explained
+    with the model that produced it: the cascade serves the first stage's probability
+    unchanged, so rows where it matches are attributed to the first stage.
+    Versions whose full model is too costly to explain per request explain every row with
+    the first stage; those explanations have approximate=True (explained_by != scored_by).
+    Returns None when a model that explains a row has no explainer
+    """
+    bundle = bundle or model_registry.current()
+    if bundle is None:
+        return None
+    features = np.asarray(features, dtype=float)
+    from_first_stage = np.zeros(len(features), dtype=bool)
+    try:
+        if model_probabilities is not None and bundle.first_stage is not None:
+            # Batched scoring may differ from a one-row rescore in the last bits
+            from_first_stage = np.isclose(np.asarray(model_probabilities, dtype=float),
+                                          bundle.predict_first_stage(features), rtol=0, atol=1e-9)
+        
+        explanations = [None] * len(features)
+        for first_stage in (False, True):
+            rows = np.flatnonzero(from_first_stage == first_stage)
+            if not len(rows):
+                continue
+            explained_by_first_stage = first_stage or bundle.explains_with_first_stage
+            explainer = bundle.explainer(first_stage=explained_by_first_stage)
+            if explainer is None:
+                return None
+            for row, explanation in zip(rows, explain_rows(explainer, features[rows],
+                                                           bundle.feature_names or FEATURE_NAMES, top=top)):
+                explanation['scored_by'] = 'first_stage' if first_stage else 'model'
+                explanation['explained_by'] = 'first_stage' if explained_by_first_stage else 'model'
+                explanation['approximate'] = explained_by_first_stage != first_stage
+                explanations[row] = explanation
+        return explanations
+    except Exception as e:
+        print(f"Explanation error: {e}")
+        return None
+
+# Optional in-process batching of concurrent single-row predictions
+micro_batcher = None
+if Config.PREDICTION_MICROBATCH_ENABLED:
+    micro_batcher = MicroBatcher(score_features,
+                                 max_batch_size=Config.PREDICTION_MICROBATCH_MAX_SIZE,
+                                 max_wait_ms=Config.PREDICTION_MICROBATCH_WAIT_MS)
+
+# Bounded LRU + TTL cache of scores and plans for resubmitted inputs
+prediction_cache = None
+if Config.PREDICTION_CACHE_SIZE > 0:
+    prediction_cache = PredictionCache(max_size=Config.PREDICTION_CACHE_SIZE,
+                                       ttl_seconds=Config.PREDICTION_CACHE_TTL_SECONDS)
+
+# Optional shadow model that learns from feedback in the background and is published when it wins
+online_learner = None
+if Config.ONLINE_LEARNING_ENABLED:
+    online_learner = OnlineLearner(model_registry, rl_system.event_log, FEATURE_NAMES,
+                                   interval=Config.ONLINE_LEARNING_INTERVAL_SECONDS,
+                                   window=Config.ONLINE_LEARNING_WINDOW,
+                                   min_samples=Config.ONLINE_LEARNING_MIN_SAMPLES)
+
+def score_row(float_features, bundle=None):
+    """Score a single patient with the given model bundle, through the micro-batcher when it is enabled"""
+    bundle = bundle or model_registry.current()
+    if micro_batcher is not None:
+        risk_score, pred_value, model_probability = micro_batcher.submit(float_features, bundle).result()
+    else:
+        risk_scores, pred_values, model_probabilities = score_features([float_features], bundle)
+        risk_score, pred_value, model_probability = risk_scores[0], pred_values[0], model_probabilities[0]
+    return float(risk_score), int(pred_value), float(model_probability)
 
 @prediction_bp.route('/', methods=['GET'])
 @login_required
@@ -46,27 +189,36 @@ def predict():
     # Prepare features for model (all 8 features in correct order)
     # Order: Pregnancies, Glucose, BloodPressure, SkinThickness, Insulin, BMI, DiabetesPedigreeFunction, Age
     float_features = [pregnancies, glucose, blood_pressure, skin_thickness, insulin, bmi, dpf, age]
-    final_features = [np.array(float_features)]
     
-    # Scale features
-    scaled_features = scaler.transform(final_features)
+    # Resubmitted inputs reuse the cached score, plans and explanation while the model and calibration are unchanged
+    cache_key = (tuple(float_features), family_history)
+    bundle = model_registry.current()
+    if bundle is None:
+        # Same condition predict_batch and model_info report as 503
+        flash('Predictions are temporarily unavailable: no prediction model is loaded. Please try again later.', 'error')
+        return render_template('prediction/form.html'), 503
+    cache_generation = (bundle.version if bundle else None, rl_system.calibration_version())
+    cached = prediction_cache.get(cache_key, cache_generation) if prediction_cache else None
     
-    # Get probability-based prediction (0-100%)
-    try:
-        prediction_proba = model.predict_proba(scaled_features)[0]
-        diabetes_probability = float(prediction_proba[1]) * 100  # Convert to Python float, probability of diabetes class
+    if cached:
+        risk_score, pred_value, model_probability, diet_plan, checkup_plan, explanation = cached
+    else:
+        # Scale features and get probability-based prediction (0-100%)
+        risk_score, pred_value, model_probability = score_row(float_features, bundle)
         
-        # Apply RL-based adjustment to risk score
-        risk_score = float(rl_system.adjust_risk_score(diabetes_probability))
+        # Generate personalized plans
+        diet_plan = generate_diet_plan(glucose, insulin, bmi, age, pred_value)
+        checkup_plan = generate_health_checkup_plan(
+            age, bmi, glucose, blood_pressure, blood_pressure, 
+            pred_value, family_history
+        )
         
-        # Convert probability to binary prediction for classification
-        pred_value = 1 if risk_score >= 50 else 0
-    except Exception as e:
-        print(f"Probability prediction error: {e}")
-        # Fallback to binary prediction
-        prediction = model.predict(scaled_features)
-        pred_value = int(prediction[0])
-        risk_score = 100.0 if pred_value == 1 else 0.0
+        # Why the model scored this patient the way it did
+        explanations = explain_features([float_features], bundle, model_probabilities=[model_probability])
+        explanation = explanations[0] if explanations else None
+        if prediction_cache:
+            cached = (risk_score, pred_value, model_probability, diet_plan, checkup_plan, explanation)
+            prediction_cache.set(cache_key, cache_generation, cached)
     
     # Determine prediction text and risk level
     if pred_value == 1:
@@ -88,9 +240,18 @@ def predict():
         bp_diastolic=float(blood_pressure),
         family_history=bool(family_history),
         prediction_result=float(risk_score / 100),  # Store as decimal (0-1)
+        model_probability=model_probability,
         risk_level=str(risk_level)
     )
-    db.session.add(health_record)
+    
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind:
+        # Reserve the id now; the insert and gamification update are committed in the background
+        health_record.id = write_behind.reserve_ids(1)[0]
+        health_record.created_at = datetime.utcnow()
+        write_behind.enqueue_prediction(health_record, points=20)
+    else:
+        db.session.add(health_record)
     
     # Record prediction for RL feedback system
     # Convert all values to Python native types for RL system
@@ -108,21 +269,12 @@ def predict():
     )
     
     # Update gamification
-    gamification = Gamification.query.filter_by(user_id=current_user.id).first()
-    if gamification:
-        gamification.predictions_count += 1
-        gamification.update_streak()
-        gamification.add_points(20)
-        gamification.check_and_award_badges()
-    
-    db.session.commit()
-    
-    # Generate personalized plans
-    diet_plan = generate_diet_plan(glucose, insulin, bmi, age, pred_value)
-    checkup_plan = generate_health_checkup_plan(
-        age, bmi, glucose, blood_pressure, blood_pressure, 
-        pred_value, family_history
-    )
+    if not write_behind:
+        gamification = Gamification.query.filter_by(user_id=current_user.id).first()
+        if gamification:
+            gamification.record_prediction(20)
+        
+        db.session.commit()
     
     # Calculate detailed health metrics analysis
     bmi_category = "Underweight" if bmi < 18.5 else "Normal Weight" if bmi < 25 else "Overweight" if bmi < 30 else "Obese"
@@ -212,8 +364,134 @@ def predict():
                          health_metrics=health_metrics,
                          health_score=health_score,
                          risk_score=risk_score,
+                         explanation=explanation,
                          prediction_data=prediction_data)
 
+def _load_batch_rows():
+    """Read a batch upload (JSON or CSV) into a DataFrame"""
+    if request.is_json:
+        payload = request.get_json(silent=True)
+        rows = payload.get('patients') if isinstance(payload, dict) else payload
+        if not isinstance(rows, list) or not rows:
+            raise ValueError('Expected a non-empty list of patients')
+        
+        if all(isinstance(row, dict) for row in rows):
+            return pd.DataFrame(rows)
+        
+        # Plain rows must be in FEATURE_NAMES order
+        if any(len(row) != len(FEATURE_NAMES) for row in rows):
+            raise ValueError(f'Each row must contain {len(FEATURE_NAMES)} values: {", ".join(FEATURE_NAMES)}')
+        return pd.DataFrame(rows, columns=FEATURE_NAMES)
+    
+    upload = request.files.get('file')
+    text = upload.read().decode('utf-8') if upload else request.get_data(as_text=True)
+    if not text.strip():
+        raise ValueError('Expected a JSON body or a CSV upload')
+    
+    df = pd.read_csv(io.StringIO(text))
+    if not set(FEATURE_NAMES).issubset(df.columns):
+        # Headerless CSV in FEATURE_NAMES order
+        df = pd.read_csv(io.StringIO(text), header=None)
+        if df.shape[1] != len(FEATURE_NAMES):
+            raise ValueError(f'CSV must have the columns: {", ".join(FEATURE_NAMES)}')
+        df.columns = FEATURE_NAMES
+    return df
+
+@prediction_bp.route('/batch', methods=['POST'])
+@login_required
+def predict_batch():
+    """
+    Score many patients in one request
+    Accepts JSON (list of rows or objects keyed by feature name) or CSV,
+    scores the whole matrix at once and bulk-inserts the health records
+    """
+    # Refuse oversized uploads before reading them; chunked bodies are cut off at the same limit
+    max_bytes = current_app.config.get('PREDICTION_BATCH_MAX_BYTES', 10 * 1024 * 1024)
+    if request.content_length is not None and request.content_length > max_bytes:
+        return jsonify({'error': f'Batch upload exceeds the limit of {max_bytes} bytes'}), 413
+    request.max_content_length = max_bytes
+    
+    try:
+        df = _load_batch_rows()
+        missing = [name for name in FEATURE_NAMES if name not in df.columns]
+        if missing:
+            raise ValueError(f'Missing features: {", ".join(missing)}')
+        features = df[FEATURE_NAMES].astype(float).to_numpy()
+    except (ValueError, TypeError, pd.errors.ParserError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if np.isnan(features).any():
+        return jsonify({'error': 'Feature values must not be empty'}), 400
+    
+    max_rows = current_app.config.get('PREDICTION_BATCH_MAX_ROWS', 10000)
+    if len(features) > max_rows:
+        return jsonify({'error': f'Batch exceeds the limit of {max_rows} patients'}), 413
+    
+    # Doctors and admins may file records under their patients' accounts
+    if 'user_id' in df.columns and current_user.role in ('doctor', 'admin'):
+        parsed_ids = pd.to_numeric(df['user_id'], errors='coerce')
+        invalid = df.index[df['user_id'].notna() & (parsed_ids.isna() | (parsed_ids % 1 != 0))].tolist()
+        if invalid:
+            return jsonify({'error': f'Invalid user_id in rows: {invalid}'}), 400
+        user_ids = parsed_ids.fillna(current_user.id).astype(int).tolist()
+        known_ids = {row.id for row in User.query.filter(User.id.in_(set(user_ids))).all()}
+        unknown = sorted(set(user_ids) - known_ids)
+        if unknown:
+            return jsonify({'error': f'Unknown user ids: {unknown}'}), 400
+    else:
+        user_ids = [int(current_user.id)] * len(features)
+    
+    if 'family_history' in df.columns:
+        family_history = df['family_history'].astype(str).str.lower().isin(['1', 'true', 'yes']).tolist()
+    else:
+        family_history = [False] * len(features)
+    
+    try:
+        risk_scores, pred_values, model_probabilities = score_features(features)
+    except RuntimeError as e:
+        return jsonify({'error': str(e)}), 503
+    risk_levels = np.where(pred_values == 1, 'High', 'Low')
+    
+    health_records = [
+        HealthRecord(
+            user_id=user_ids[i],
+            glucose=float(row[1]),
+            insulin=float(row[4]),
+            bmi=float(row[5]),
+            age=int(row[7]),
+            bp_systolic=float(row[2]),
+            bp_diastolic=float(row[2]),
+            family_history=bool(family_history[i]),
+            prediction_result=float(risk_scores[i] / 100),
+            model_probability=float(model_probabilities[i]),
+            risk_level=str(risk_levels[i])
+        )
+        for i, row in enumerate(features)
+    ]
+    # With write-behind on, ids come from the shared allocator so they never collide with reserved ones
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind:
+        for record, record_id in zip(health_records, write_behind.reserve_ids(len(health_records))):
+            record.id = record_id
+    
+    db.session.add_all(health_records)
+    db.session.commit()
+    
+    return jsonify({
+        'success': True,
+        'count': len(health_records),
+        'results': [
+            {
+                'record_id': record.id,
+                'user_id': record.user_id,
+                'risk_score': float(risk_scores[i]),
+                'prediction': int(pred_values[i]),
+                'risk_level': record.risk_level
+            }
+            for i, record in enumerate(health_records)
+        ]
+    })
+
 @prediction_bp.route('/feedback/<int:record_id>', methods=['POST'])
 @login_required
 def submit_feedback(record_id):
@@ -221,7 +499,22 @@ def submit_feedback(record_id):
     Submit feedback on whether prediction was accurate
     Users can report if they got diagnosed or if prediction was wrong
     """
-    record = HealthRecord.query.get_or_404(record_id)
+    # The record may still be waiting in the write-behind queue
+    write_behind = current_app.extensions.get('write_behind')
+    if write_behind and write_behind.is_pending(record_id):
+        write_behind.flush()
+    
+    record = HealthRecord.query.get(record_id)
+    if record is None and write_behind:
+        # Another worker may have journaled it and not committed it yet
+        if write_behind.pending_elsewhere(record_id):
+            response = jsonify({'error': 'Prediction is still being saved, please retry'})
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        # It may have been committed while the journals were scanned
+        record = HealthRecord.query.get(record_id)
+    if record is None:
+        abort(404)
     
     if record.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
@@ -233,8 +526,12 @@ def submit_feedback(record_id):
     
     # Get stored prediction data
     prediction_data = {
+        'record_id': record.id,  # lets retraining join the outcome back to this record
         'user_id': record.user_id,
         'prediction_prob': float(record.prediction_result),
+        # Calibration learns from the uncalibrated probability (older records only have the adjusted one)
+        'model_prob': float(record.model_probability if record.model_probability is not None
+                            else record.prediction_result),
         'predicted_label': 1 if record.risk_level == 'High' else 0,
         'timestamp': record.created_at.isoformat(),
         'features': {
@@ -249,6 +546,8 @@ def submit_feedback(record_id):
     
     # Record feedback in RL system
     rl_system.record_feedback(prediction_data, actual_outcome)
+    if online_learner is not None:
+        online_learner.ensure_started()
     
     # Get updated stats
     stats = rl_system.get_feedback_stats()
@@ -259,12 +558,95 @@ def submit_feedback(record_id):
         'rl_stats': stats
     })
 
+@prediction_bp.route('/model-info', methods=['GET'])
+@login_required
+def model_info():
+    """Describe the model version currently being served"""
+    bundle = model_registry.current()
+    if bundle is None:
+        return jsonify({'error': 'No prediction model is available'}), 503
+    
+    return jsonify({
+        'version': bundle.version,
+        'model_name': bundle.manifest.get('model_name'),
+        'feature_names': bundle.feature_names,
+        'fast_inference': bundle.fast_model is not None,
+        'first_stage_model': bundle.manifest.get('first_stage_model'),
+        # Set for distilled students: the version to activate to fall back to the teacher
+        'teacher_version': bundle.manifest.get('metadata', {}).get('distillation', {}).get('teacher_version'),
+        'available_versions': model_registry.versions()
+    })
+
+@prediction_bp.route('/inference-stats', methods=['GET'])
+@login_required
+def inference_stats():
+    """Runtime metrics of the prediction serving path"""
+    return jsonify({
+        'backend': Config.INFERENCE_BACKEND,
+        'micro_batching': micro_batcher.get_stats() if micro_batcher is not None else {'enabled': False},
+        'process_pool': inference_pool.get_stats() if inference_pool is not None else {'enabled': False},
+        'prediction_cache': prediction_cache.get_stats() if prediction_cache is not None else {'enabled': False},
+        'write_behind': current_app.extensions['write_behind'].get_stats() if 'write_behind' in current_app.extensions else {'enabled': False},
+        'online_learning': online_learner.get_stats() if online_learner is not None else {'enabled': False},
+        'cascade': cascade_router.get_stats() if cascade_router is not None else {'enabled': False}
+    })
+
 @prediction_bp.route('/rl-stats', methods=['GET'])
 @login_required
 def get_rl_stats():
-    """Get RL feedback system statistics"""
-    stats = rl_system.get_feedback_stats()
-    return jsonify(stats)
+    """
+    Get RL feedback system statistics
+    Tagged with the RL state version, so unchanged stats are answered with an empty 304
+    """
+    etag = f'rl-{rl_system.state_version()}'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(rl_system.get_feedback_stats())
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+@prediction_bp.route('/rl-stats/stream', methods=['GET'])
+@login_required
+def stream_rl_stats():
+    """
+    Server-sent events for the RL dashboard: the full stats first, then only the
+    fields that changed, pushed when feedback or an intervention is recorded
+
+    Each open stream holds a request thread, so the stream ends after
+    RL_STATS_STREAM_SECONDS and the browser reconnects (after `retry` ms). On a
+    reconnect, Last-Event-ID tells whether the browser already has the current
+    stats, so a quiet dashboard costs one short request per interval.
+    """
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    
+    def generate():
+        yield 'retry: 1000\n\n'
+        sent = {}
+        version = int(last_event_id) if last_event_id.isdigit() else None
+        deadline = time.monotonic() + Config.RL_STATS_STREAM_SECONDS
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            if version is None:
+                current = rl_system.state_version()
+            else:
+                current = rl_system.wait_for_change(version, timeout=min(15.0, remaining))
+            if current == version:
+                yield ': keepalive\n\n'
+                continue
+            version = current
+            stats = rl_system.get_feedback_stats()
+            encoded = {key: json.dumps(value) for key, value in stats.items()}
+            delta = {key: stats[key] for key in stats if sent.get(key) != encoded[key]}
+            sent = encoded
+            if delta:
+                yield f'id: {version}\ndata: {json.dumps(delta)}\n\n'
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @prediction_bp.route('/rl-dashboard', methods=['GET'])
 @login_required
@@ -143,7 +143,9 @@ def update_measure(measure_id):
                         measure_type=measure.measure_type,
                         baseline_glucose=measure.baseline_glucose,
                         outcome_glucose=latest_record.glucose if latest_record.glucose else measure.baseline_glucose,
-                        effectiveness_score=effectiveness
+                        effectiveness_score=effectiveness,
+                        baseline_bmi=measure.baseline_bmi,
+                        risk_level=latest_record.risk_level
                     )
                 except Exception as e:
                     print(f"Error recording intervention: {e}")
@@ -0,0 +1,106 @@
+"""
+Cascade Inference for Diabetes Predictor
+Scores every row with a cheap first-stage model and sends only the rows whose
+probability lies near the decision threshold to the expensive model
+"""
+
+import threading
+
+import numpy as np
+
+
+def _positive_label(probabilities, threshold):
+    return probabilities >= threshold
+
+
+class CascadeRouter:
+    """
+    Rows with |p_fast - threshold| <= band are escalated: their probability is
+    replaced by the expensive model's. The others keep the first-stage probability.
+
+    A random audit_rate of the non-escalated rows is also scored by the expensive
+    model (the result is only counted, not served) so the agreement outside the band
+    is measured too; it is what tells whether the band is wide enough.
+    """
+
+    def __init__(self, threshold=0.5, band=0.15, audit_rate=0.0, seed=None):
+        self.threshold = threshold
+        self.band = band
+        self.audit_rate = audit_rate
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'rows': 0, 'escalated': 0, 'escalated_agreed': 0,
+                       'audited': 0, 'audited_agreed': 0, 'last_threshold': threshold}
+
+    def predict_positive(self, features, fast_predict, heavy_predict, threshold=None):
+        """
+        Args:
+            features: (n_rows, n_features) matrix
+            fast_predict, heavy_predict: functions from such a matrix to positive-class probabilities
+            threshold: decision threshold on these (uncalibrated) probabilities, when a
+                calibration map moves it away from self.threshold
+
+        Returns:
+            (probabilities, escalated) where escalated marks the rows the expensive model scored
+        """
+        threshold = self.threshold if threshold is None else threshold
+        features = np.asarray(features, dtype=float)
+        fast = np.asarray(fast_predict(features), dtype=float)
+        escalated = np.abs(fast - threshold) <= self.band
+        with self._lock:
+            audited = ~escalated & (self._rng.random(len(fast)) < self.audit_rate)
+        scored = escalated | audited
+
+        probabilities = fast.copy()
+        agreed = np.zeros(0, dtype=bool)
+        if scored.any():
+            heavy = np.asarray(heavy_predict(features[scored]), dtype=float)
+            agreed = _positive_label(fast[scored], threshold) == _positive_label(heavy, threshold)
+            probabilities[escalated] = heavy[escalated[scored]]
+
+        with self._lock:
+            self._stats['last_threshold'] = threshold
+            self._stats['calls'] += 1
+            self._stats['rows'] += len(fast)
+            self._stats['escalated'] += int(escalated.sum())
+            self._stats['escalated_agreed'] += int(agreed[escalated[scored]].sum())
+            self._stats['audited'] += int(audited.sum())
+            self._stats['audited_agreed'] += int(agreed[audited[scored]].sum())
+        return probabilities, escalated
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['threshold'] = self.threshold
+        stats['band'] = self.band
+        stats['audit_rate'] = self.audit_rate
+        stats['escalation_rate'] = stats['escalated'] / stats['rows'] if stats['rows'] else 0.0
+        # Share of escalated rows where the first stage alone would have given the same label
+        stats['agreement_in_band'] = (stats['escalated_agreed'] / stats['escalated']
+                                      if stats['escalated'] else None)
+        # Share of audited rows (outside the band) where both models give the same label
+        stats['agreement_outside_band'] = (stats['audited_agreed'] / stats['audited']
+                                           if stats['audited'] else None)
+        return stats
+
+
+def evaluate_band(fast_probabilities, heavy_probabilities, threshold=0.5, band=0.15):
+    """
+    Offline view of a band on rows scored by both models
+
+    Returns:
+        dict with the fraction escalated, and the agreement of the cascade's labels
+        with the expensive model's labels (overall and outside the band)
+    """
+    fast_probabilities = np.asarray(fast_probabilities, dtype=float)
+    heavy_probabilities = np.asarray(heavy_probabilities, dtype=float)
+    escalated = np.abs(fast_probabilities - threshold) <= band
+    cascade = np.where(escalated, heavy_probabilities, fast_probabilities)
+    same = _positive_label(cascade, threshold) == _positive_label(heavy_probabilities, threshold)
+    return {
+        'threshold': threshold,
+        'band': band,
+        'escalation_rate': float(escalated.mean()),
+        'agreement': float(same.mean()),
+        'agreement_outside_band': float(same[~escalated].mean()) if (~escalated).any() else None,
+    }
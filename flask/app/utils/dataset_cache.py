@@ -0,0 +1,169 @@
+"""
+Dataset Cache for the Training Pipeline
+Builds the merged training set once per combination of source files: rows are
+deduplicated by content hash, provenance is recorded, and the result is stored as
+.npy columns that later runs memory-map instead of parsing the CSVs again
+
+Cache layout (one directory per set of source file hashes):
+    <root>/<key>/features.npy   float64 matrix, one column per feature
+    <root>/<key>/target.npy     int64 labels
+    <root>/<key>/source.npy     (source index, row number in that file) of every kept row
+    <root>/<key>/schema.json    columns, dtypes, fill values and per-source provenance
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+# Bump when the build steps change so old caches are not reused
+BUILD_VERSION = 1
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class CachedDataset:
+    """Memory-mapped view of a built dataset"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'schema.json')) as f:
+            self.schema = json.load(f)
+        self.feature_names = self.schema['feature_names']
+        self.target_name = self.schema['target']
+        self.features = np.load(os.path.join(path, 'features.npy'), mmap_mode='r')
+        self.target = np.load(os.path.join(path, 'target.npy'), mmap_mode='r')
+        self.source = np.load(os.path.join(path, 'source.npy'), mmap_mode='r')
+
+    @property
+    def key(self):
+        return self.schema['key']
+
+    def frame(self):
+        """(X, y) as a DataFrame and Series (the feature names travel with X into the scaler)"""
+        X = pd.DataFrame(self.features, columns=self.feature_names, copy=False)
+        y = pd.Series(self.target, name=self.target_name)
+        return X, y
+
+
+def cache_key(sources, target, drop_columns):
+    digest = hashlib.sha256()
+    digest.update(json.dumps({'version': BUILD_VERSION, 'target': target,
+                              'drop_columns': sorted(drop_columns)}).encode())
+    for path in sources:
+        digest.update(file_hash(path).encode())
+    return digest.hexdigest()[:16]
+
+
+def build_dataset(sources, cache_root, target='Outcome', drop_columns=('Id',)):
+    """
+    Merged, deduplicated dataset for the given CSV files, built on first use
+
+    Returns:
+        (CachedDataset, built) where built is False when an existing cache was reused
+    """
+    key = cache_key(sources, target, drop_columns)
+    path = os.path.join(cache_root, key)
+    if os.path.exists(os.path.join(path, 'schema.json')):
+        return CachedDataset(path), False
+
+    frames, provenance = [], []
+    for index, source in enumerate(sources):
+        df = pd.read_csv(source)
+        df = df.drop(columns=[column for column in drop_columns if column in df.columns])
+        df['_source'] = index
+        df['_row'] = np.arange(len(df))
+        frames.append(df)
+        provenance.append({'path': os.path.basename(source), 'sha256': file_hash(source), 'rows_read': len(df)})
+    merged = pd.concat(frames, axis=0, ignore_index=True)
+
+    if target not in merged.columns:
+        raise ValueError(f"Target column '{target}' not found in {list(merged.columns)}")
+    feature_names = [column for column in merged.drop(columns=[target, '_source', '_row'])
+                     .select_dtypes(include=[np.number]).columns]
+
+    # Identical rows (features and label), within or across files, are kept once: first occurrence wins
+    content = merged[feature_names + [target]]
+    row_hash = pd.util.hash_pandas_object(content, index=False).to_numpy()
+    duplicate = pd.Series(row_hash).duplicated().to_numpy()
+    for index, entry in enumerate(provenance):
+        from_source = merged['_source'].to_numpy() == index
+        entry['rows_kept'] = int((from_source & ~duplicate).sum())
+        entry['duplicates_dropped'] = int((from_source & duplicate).sum())
+    deduped = merged[~duplicate]
+
+    # Same features with different labels cannot be resolved by dedup; report them
+    conflicting = int(deduped.duplicated(subset=feature_names, keep=False).sum())
+
+    fill_values = deduped[feature_names].mean()
+    features = deduped[feature_names].fillna(fill_values).to_numpy(dtype=np.float64)
+    labels = deduped[target].to_numpy(dtype=np.int64)
+    source_rows = deduped[['_source', '_row']].to_numpy(dtype=np.int64)
+
+    schema = {
+        'key': key,
+        'build_version': BUILD_VERSION,
+        'created_at': datetime.now().isoformat(),
+        'feature_names': feature_names,
+        'target': target,
+        'dtypes': {column: str(merged[column].dtype) for column in feature_names + [target]},
+        'n_rows': int(len(labels)),
+        'duplicates_dropped': int(duplicate.sum()),
+        'conflicting_label_rows': conflicting,
+        'missing_values_filled': {column: int(count) for column, count in deduped[feature_names].isna().sum().items() if count},
+        'fill_values': {column: float(value) for column, value in fill_values.items()},
+        'sources': provenance,
+    }
+
+    os.makedirs(cache_root, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=cache_root)
+    try:
+        np.save(os.path.join(staging, 'features.npy'), features)
+        np.save(os.path.join(staging, 'target.npy'), labels)
+        np.save(os.path.join(staging, 'source.npy'), source_rows)
+        with open(os.path.join(staging, 'schema.json'), 'w') as f:
+            json.dump(schema, f, indent=2)
+        os.rename(staging, path)
+    except OSError:
+        # Another run built the same key first
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.exists(os.path.join(path, 'schema.json')):
+            raise
+    return CachedDataset(path), True
+
+
+def with_extra_rows(dataset, path):
+    """
+    (X, y) of a cached dataset plus the rows of another CSV in the same format
+    The extra rows are merged on top of the cache rather than keyed into it, so a CSV
+    that changes on every run (the production export) never forces a rebuild of the
+    base sources; their missing values take the cached dataset's fill values
+
+    Returns:
+        (X, y, provenance) with provenance shaped like a schema['sources'] entry
+    """
+    extra = pd.read_csv(path)
+    missing = [column for column in dataset.feature_names + [dataset.target_name] if column not in extra.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} lacks columns {missing}")
+    extra_X = extra[dataset.feature_names].astype(np.float64)
+    filled = {column: int(count) for column, count in extra_X.isna().sum().items() if count}
+    extra_X = extra_X.fillna(dataset.schema['fill_values'])
+
+    X, y = dataset.frame()
+    X = pd.concat([X, extra_X], ignore_index=True)
+    y = pd.concat([y, extra[dataset.target_name].astype(np.int64)], ignore_index=True)
+    provenance = {'path': os.path.basename(path), 'sha256': file_hash(path), 'rows_read': len(extra),
+                  'missing_values_filled': filled}
+    return X, y, provenance
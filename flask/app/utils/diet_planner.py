@@ -3,6 +3,9 @@ Diet Plan Generator for Diabetes Predictor
 Generates personalized diet plans based on user data and prediction results
 """
 
+from app.utils.plan_tables import build_table, freeze
+
+
 def calculate_daily_calories(age, bmi, glucose, has_diabetes):
     """Calculate personalized daily calorie target"""
     # Base calorie calculation
@@ -238,6 +241,42 @@ def generate_weekly_schedule(calories, has_diabetes):
     return schedule
 
 
+def _diet_bucket(glucose, insulin, bmi, age, has_diabetes):
+    """Threshold comparisons that decide every bucket-dependent part of the diet plan"""
+    return (
+        bmi < 18.5, bmi < 25, bmi < 30,
+        age > 60, age < 30,
+        bool(has_diabetes),
+        glucose > 140, glucose > 180,
+        insulin > 150
+    )
+
+
+def _build_diet_sections(glucose, insulin, bmi, age, has_diabetes):
+    """Parts of the diet plan that depend only on the threshold bucket"""
+    has_diabetes_bool = bool(has_diabetes)
+    
+    calories = calculate_daily_calories(age, bmi, glucose, has_diabetes_bool)
+    return {
+        "daily_calories": calories,
+        "macronutrients": get_macronutrient_breakdown(glucose, insulin, has_diabetes_bool),
+        "diabetic_friendly_foods": get_diabetic_friendly_foods(),
+        "foods_to_avoid": get_foods_to_avoid(),
+        "meal_suggestions": generate_meal_suggestions(calories, has_diabetes_bool),
+        "weekly_schedule": generate_weekly_schedule(calories, has_diabetes_bool)
+    }
+
+
+# Every bucket combination, built once at import and shared read-only between calls
+_DIET_SECTIONS = build_table(_diet_bucket, _build_diet_sections, [
+    [100, 160, 200],     # glucose: <=140, 140-180, >180
+    [100, 200],          # insulin: <=150, >150
+    [17, 20, 27, 35],    # bmi: <18.5, <25, <30, >=30
+    [25, 45, 65],        # age: <30, 30-60, >60
+    [0, 1]               # has_diabetes
+])
+
+
 def generate_diet_plan(glucose, insulin, bmi, age, has_diabetes):
     """
     Generate complete diet plan based on user data and prediction
@@ -250,16 +289,12 @@ def generate_diet_plan(glucose, insulin, bmi, age, has_diabetes):
         has_diabetes: Whether patient has diabetes (1) or not (0)
     
     Returns:
-        dict: Complete diet plan with all components
+        dict: Complete diet plan with all components (shared sections are read-only)
     """
-    has_diabetes_bool = bool(has_diabetes)
-    
-    calories = calculate_daily_calories(age, bmi, glucose, has_diabetes_bool)
-    macros = get_macronutrient_breakdown(glucose, insulin, has_diabetes_bool)
-    friendly_foods = get_diabetic_friendly_foods()
-    foods_avoid = get_foods_to_avoid()
-    meal_suggestions = generate_meal_suggestions(calories, has_diabetes_bool)
-    weekly_schedule = generate_weekly_schedule(calories, has_diabetes_bool)
+    sections = _DIET_SECTIONS.get(_diet_bucket(glucose, insulin, bmi, age, has_diabetes))
+    if sections is None:
+        # Inputs outside every bucket (e.g. NaN) are built directly
+        sections = freeze(_build_diet_sections(glucose, insulin, bmi, age, has_diabetes))
     
     # Generate personalized tips based on glucose and insulin levels
     tips = [
@@ -287,12 +322,12 @@ def generate_diet_plan(glucose, insulin, bmi, age, has_diabetes):
         tips.append("Weight management is crucial - combine diet with regular physical activity")
     
     diet_plan = {
-        "daily_calories": calories,
-        "macronutrients": macros,
-        "diabetic_friendly_foods": friendly_foods,
-        "foods_to_avoid": foods_avoid,
-        "meal_suggestions": meal_suggestions,
-        "weekly_schedule": weekly_schedule,
+        "daily_calories": sections["daily_calories"],
+        "macronutrients": sections["macronutrients"],
+        "diabetic_friendly_foods": sections["diabetic_friendly_foods"],
+        "foods_to_avoid": sections["foods_to_avoid"],
+        "meal_suggestions": sections["meal_suggestions"],
+        "weekly_schedule": sections["weekly_schedule"],
         "tips": tips,
         "health_metrics": {
             "glucose": f"{glucose:.0f} mg/dL",
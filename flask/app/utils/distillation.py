@@ -0,0 +1,94 @@
+"""
+Model Distillation for Diabetes Predictor
+Trains a compact student (logistic regression or one shallow tree) to reproduce the
+soft predict_proba output of the selected teacher, on the training rows plus
+synthetic rows drawn around them, so production can serve the student instead
+"""
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+STUDENT_KINDS = ['logistic', 'tree']
+
+
+def synthetic_samples(X, n_samples, noise=0.1, random_state=42):
+    """
+    Unscaled rows between random pairs of real rows (mixup), plus Gaussian noise of
+    `noise` standard deviations per feature, clipped to the observed feature range
+    """
+    X = np.asarray(X, dtype=np.float64)
+    rng = np.random.default_rng(random_state)
+    first = X[rng.integers(len(X), size=n_samples)]
+    second = X[rng.integers(len(X), size=n_samples)]
+    mix = rng.uniform(size=(n_samples, 1))
+    samples = mix * first + (1 - mix) * second
+    samples += rng.standard_normal(samples.shape) * noise * X.std(axis=0)
+    return np.clip(samples, X.min(axis=0), X.max(axis=0))
+
+
+def _soft_label_rows(X_scaled, probabilities):
+    """
+    sklearn classifiers take hard labels; a soft target p becomes the row twice,
+    labelled 1 with weight p and 0 with weight 1 - p
+    """
+    X_doubled = np.vstack([X_scaled, X_scaled])
+    y_doubled = np.concatenate([np.ones(len(X_scaled), dtype=int), np.zeros(len(X_scaled), dtype=int)])
+    weights = np.concatenate([probabilities, 1 - probabilities])
+    return X_doubled, y_doubled, weights
+
+
+def fit_student(kind, X_scaled, probabilities, max_depth=6, random_state=42):
+    """Fit a student of the given kind to the teacher's positive-class probabilities"""
+    if kind == 'logistic':
+        # Weak regularisation: the student should match the teacher, not shrink towards 0.5
+        student = LogisticRegression(C=100.0, max_iter=2000, random_state=random_state)
+    elif kind == 'tree':
+        student = DecisionTreeClassifier(max_depth=max_depth, min_samples_leaf=20, random_state=random_state)
+    else:
+        raise ValueError(f'Unknown student kind: {kind}')
+    X_doubled, y_doubled, weights = _soft_label_rows(X_scaled, probabilities)
+    return student.fit(X_doubled, y_doubled, sample_weight=weights)
+
+
+def fidelity(teacher_probabilities, student_probabilities, threshold=0.5):
+    """How closely the student reproduces the teacher"""
+    teacher_probabilities = np.asarray(teacher_probabilities)
+    student_probabilities = np.asarray(student_probabilities)
+    errors = np.abs(teacher_probabilities - student_probabilities)
+    return {
+        'agreement': float(np.mean((teacher_probabilities >= threshold) == (student_probabilities >= threshold))),
+        'probability_mae': float(errors.mean()),
+        'probability_max_error': float(errors.max()),
+    }
+
+
+def distill(teacher, scaler, X_train, X_eval, kinds=STUDENT_KINDS, n_synthetic=5000, max_depth=6,
+            random_state=42):
+    """
+    Fit one student per kind on the teacher's probabilities over X_train plus synthetic rows
+
+    Fidelity is measured on X_eval (real rows the students never saw), and the student
+    with the highest agreement (then lowest probability MAE) is returned first.
+
+    Returns:
+        (best kind, kind -> {'model', 'fidelity'})
+    """
+    X_fit = np.vstack([np.asarray(X_train, dtype=np.float64),
+                       synthetic_samples(X_train, n_synthetic, random_state=random_state)])
+    X_fit_scaled = scaler.transform(X_fit)
+    X_eval_scaled = scaler.transform(X_eval)
+    teacher_fit = teacher.predict_proba(X_fit_scaled)[:, 1]
+    teacher_eval = teacher.predict_proba(X_eval_scaled)[:, 1]
+
+    students = {}
+    for kind in kinds:
+        student = fit_student(kind, X_fit_scaled, teacher_fit, max_depth=max_depth, random_state=random_state)
+        students[kind] = {
+            'model': student,
+            'fidelity': fidelity(teacher_eval, student.predict_proba(X_eval_scaled)[:, 1]),
+        }
+
+    best_kind = max(students, key=lambda kind: (students[kind]['fidelity']['agreement'],
+                                                 -students[kind]['fidelity']['probability_mae']))
+    return best_kind, students
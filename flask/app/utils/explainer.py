@@ -0,0 +1,242 @@
+"""
+Per-prediction Explanations for Diabetes Predictor
+Additive feature attributions computed directly from the fitted model: exact
+coefficient x scaled value contributions for linear models, path-dependent
+TreeSHAP for tree ensembles. Everything that depends only on the model (training
+baselines, leaf paths and their TreeSHAP weight tables) is precomputed once, so
+explaining a row costs a few vectorised NumPy operations
+"""
+
+import math
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+from app.utils.fast_inference import CompiledTreeEnsemble, _is_logistic, _sigmoid
+
+# Upper bound on (rows x leaf path features) values held at once by TreeExplainer
+TREE_CHUNK_ELEMENTS = 4_000_000
+
+
+class LinearExplainer:
+    """
+    Logistic model on standardised features: log-odds = b + sum_j w_j * z_j, and the
+    training mean of every z_j is 0, so w_j * z_j is feature j's exact contribution
+    relative to the average training patient (whose log-odds is b)
+    """
+
+    link = 'logit'
+
+    def __init__(self, model, scaler):
+        self.weights = np.asarray(model.coef_[0], dtype=np.float64)
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.expected_value = float(model.intercept_[0])
+        # Values computed per explained row
+        self.cost = len(self.weights)
+
+    def shap_values(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        return (X - self.mean) / self.scale * self.weights
+
+
+class TreeExplainer:
+    """
+    Path-dependent TreeSHAP in its per-leaf form: each leaf's value is shared among the
+    distinct features on its root path according to whether the row satisfies that
+    feature's conditions and to the share of training samples that went that way
+    (the node covers stand in for the training distribution, so no background set is
+    needed at request time).
+
+    With zero_j the cover fraction of path feature j and U the path features whose
+    conditions the row satisfies, a leaf of value v gives feature i
+
+        v * (one_i - zero_i) / zero_i * K[U - {i}],   K[A] = sum over S in A of w(|S|) * prod_{j not in S} zero_j
+
+    K depends only on the leaf, so it is tabulated at load for every subset of the
+    leaf's path features (2^depth values, depth <= number of features). Explaining a
+    row is then one pass over the (leaf, path feature) pairs of all trees together:
+    an interval test, a table lookup and a sum per feature.
+    Attributions are in the model's raw output: log-odds for gradient boosting,
+    probability for random forests and single trees.
+    """
+
+    def __init__(self, model, scaler):
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.n_features = len(self.mean)
+
+        if isinstance(model, GradientBoostingClassifier):
+            trees = [estimator[0].tree_ for estimator in model.estimators_]
+            values = [tree.value[:, 0, 0] * model.learning_rate for tree in trees]
+            self.expected_value = CompiledTreeEnsemble._boosting_init_score(model)
+            self.link = 'logit'
+        else:
+            trees = [model.tree_] if isinstance(model, DecisionTreeClassifier) else \
+                [estimator.tree_ for estimator in model.estimators_]
+            values = []
+            for tree in trees:
+                counts = tree.value[:, 0, :]
+                values.append(counts[:, 1] / counts.sum(axis=1) / len(trees))
+            self.expected_value = 0.0
+            self.link = 'identity'
+
+        leaves = []
+        for tree, value in zip(trees, values):
+            leaves.extend(self._leaf_paths(tree, value))
+        # The expected output over the training samples: each leaf weighted by its cover
+        self.expected_value += float(sum(leaf_value * np.prod(fractions) for leaf_value, _, fractions, _, _ in leaves))
+        # A single-leaf tree only shifts the expected value
+        leaves = [leaf for leaf in leaves if leaf[1]]
+
+        depths = np.array([len(leaf[1]) for leaf in leaves], dtype=np.intp)
+        value = np.array([leaf[0] for leaf in leaves], dtype=np.float64)
+        zero = np.concatenate([leaf[2] for leaf in leaves]).astype(np.float64) if leaves else np.zeros(0)
+        # One entry per (leaf, path feature) pair, leaf by leaf
+        self.pair_leaf = np.repeat(np.arange(len(leaves)), depths)
+        self.pair_feature = np.concatenate([leaf[1] for leaf in leaves]).astype(np.intp) if leaves else np.zeros(0, np.intp)
+        self.pair_lower = np.concatenate([leaf[3] for leaf in leaves]).astype(np.float64) if leaves else np.zeros(0)
+        self.pair_upper = np.concatenate([leaf[4] for leaf in leaves]).astype(np.float64) if leaves else np.zeros(0)
+        self.leaf_start = np.concatenate([[0], np.cumsum(depths)[:-1]]).astype(np.intp)
+        position = np.arange(len(self.pair_leaf)) - self.leaf_start[self.pair_leaf]
+        # Smallest integer type that holds a leaf's bit set
+        bit_type = np.uint8 if depths.max(initial=0) <= 8 else np.uint16 if depths.max() <= 16 else np.int64
+        self.pair_bit = (1 << position).astype(bit_type)
+        # K is scaled by value * (1 - zero) / zero when the row satisfies the condition, by -value otherwise
+        self.pair_off = -value[self.pair_leaf]
+        self.pair_gain = value[self.pair_leaf] / zero
+        self.onehot = np.zeros((len(self.pair_leaf), self.n_features))
+        self.onehot[np.arange(len(self.pair_leaf)), self.pair_feature] = 1.0
+
+        # K tables of all leaves back to back; a leaf's table starts at leaf_table[leaf]
+        sizes = 1 << depths
+        self.leaf_table = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int64)
+        self.tables = np.zeros(int(sizes.sum()))
+        for depth in np.unique(depths):
+            members = np.flatnonzero(depths == depth)
+            tables = self._subset_tables(np.array([leaves[leaf][2] for leaf in members], dtype=np.float64))
+            self.tables[self.leaf_table[members][:, None] + np.arange(1 << depth)] = tables
+        self.pair_table = self.leaf_table[self.pair_leaf]
+        # Values computed per explained row (several passes over each pair)
+        self.cost = len(self.pair_leaf)
+
+    @staticmethod
+    def _subset_tables(zero):
+        """K[A] for every subset A (bit j = path feature j) of leaves that share a depth; zero is (leaves, depth)"""
+        depth = zero.shape[1]
+        subsets = np.arange(1 << depth)
+        bits = (subsets[:, None] >> np.arange(depth)) & 1                    # (subsets, depth)
+        # Shapley weight of a subset of size k among the other depth - 1 features
+        weights = np.array([math.factorial(k) * math.factorial(depth - k - 1) / math.factorial(depth)
+                            for k in range(depth)] + [0.0])
+        # w(|S|) * prod_{j not in S} zero_j for every S, then summed over the subsets of each A
+        tables = weights[bits.sum(axis=1)] * np.prod(np.where(bits[None] > 0, 1.0, zero[:, None, :]), axis=2)
+        for j in range(depth):
+            with_j = subsets[(subsets >> j) & 1 > 0]
+            tables[:, with_j] += tables[:, with_j ^ (1 << j)]
+        return tables
+
+    @staticmethod
+    def _leaf_paths(tree, value):
+        """(leaf value, features, zero fractions, lower bounds, upper bounds) per leaf, one entry per distinct feature"""
+        cover = tree.weighted_n_node_samples
+        leaves = []
+        stack = [(0, {})]
+        while stack:
+            node, conditions = stack.pop()
+            left, right = tree.children_left[node], tree.children_right[node]
+            if left == -1:
+                features = sorted(conditions)
+                leaves.append((float(value[node]), features,
+                               [conditions[f][0] for f in features],
+                               [conditions[f][1] for f in features],
+                               [conditions[f][2] for f in features]))
+                continue
+            feature, threshold = int(tree.feature[node]), float(tree.threshold[node])
+            fraction, lower, upper = conditions.get(feature, (1.0, -np.inf, np.inf))
+            # Repeated splits on one feature merge: fractions multiply, intervals intersect
+            stack.append((left, {**conditions, feature: (fraction * cover[left] / cover[node], lower, min(upper, threshold))}))
+            stack.append((right, {**conditions, feature: (fraction * cover[right] / cover[node], max(lower, threshold), upper)}))
+        return leaves
+
+    def shap_values(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        # sklearn trees compare float32 features, as in CompiledTreeEnsemble
+        scaled = ((X - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+        phi = np.zeros((len(scaled), self.n_features))
+        if not len(self.pair_leaf):
+            return phi
+        step = max(1, TREE_CHUNK_ELEMENTS // len(self.pair_leaf))
+        for start in range(0, len(scaled), step):
+            rows = slice(start, start + step)
+            phi[rows] = self._contributions(scaled[rows])
+        return phi
+
+    def _contributions(self, scaled):
+        x = scaled[:, self.pair_feature]                                  # (rows, pairs)
+        one = (x > self.pair_lower) & (x <= self.pair_upper)
+        # Bit set U of satisfied path features per (row, leaf), then U - {i} per pair
+        satisfied = np.add.reduceat(one * self.pair_bit, self.leaf_start, axis=1, dtype=self.pair_bit.dtype)
+        subset = satisfied[:, self.pair_leaf] & ~self.pair_bit
+        contributions = self.tables[self.pair_table + subset] * (self.pair_off + one * self.pair_gain)
+        if len(scaled) == 1:
+            return np.bincount(self.pair_feature, weights=contributions[0], minlength=self.n_features)[None]
+        return contributions @ self.onehot
+
+
+def build_explainer(model, scaler):
+    """Explainer for a fitted model, or None when the model type has no fast attribution"""
+    if not hasattr(scaler, 'mean_') or not hasattr(scaler, 'scale_'):
+        return None
+    try:
+        if _is_logistic(model) and len(model.classes_) == 2:
+            return LinearExplainer(model, scaler)
+        if isinstance(model, (RandomForestClassifier, GradientBoostingClassifier, DecisionTreeClassifier)) \
+                and len(model.classes_) == 2:
+            return TreeExplainer(model, scaler)
+    except Exception as e:
+        print(f"⚠ Could not build explainer: {e}")
+    return None
+
+
+def explain_rows(explainer, X, feature_names, top=None):
+    """
+    One explanation per row of X (unscaled, feature_names order)
+
+    contribution is in the explainer's raw output (log-odds or probability), and
+    risk_points restates it in percentage points of model probability: contributions
+    are shared out in proportion so they add up to the row's probability minus the
+    baseline probability. Features are ordered by absolute contribution.
+    """
+    X = np.asarray(X, dtype=np.float64)
+    phi = explainer.shap_values(X)
+    raw = explainer.expected_value + phi.sum(axis=1)
+    if explainer.link == 'logit':
+        baseline, probabilities = _sigmoid(explainer.expected_value), _sigmoid(raw)
+        totals = phi.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            points = np.where(np.abs(totals) > 1e-12,
+                              phi / totals * (probabilities - baseline)[:, None] * 100, 0.0)
+    else:
+        baseline, probabilities = explainer.expected_value, raw
+        points = phi * 100
+
+    explanations = []
+    for row, contributions, row_points, probability in zip(X, phi, points, probabilities):
+        order = np.argsort(-np.abs(contributions))[:top]
+        explanations.append({
+            'baseline_probability': float(baseline),
+            'model_probability': float(probability),
+            'link': explainer.link,
+            'contributions': [
+                {
+                    'feature': feature_names[j],
+                    'value': float(row[j]),
+                    'contribution': float(contributions[j]),
+                    'risk_points': float(row_points[j]),
+                }
+                for j in order
+            ],
+        })
+    return explanations
@@ -0,0 +1,156 @@
+"""
+Fast Inference Engine for Diabetes Predictor
+Compiles the fitted scaler + model into plain NumPy arrays so a prediction
+skips sklearn's per-call validation overhead
+"""
+
+import numpy as np
+from sklearn.linear_model import LogisticRegression, SGDClassifier
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.dummy import DummyClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+
+def _sigmoid(z):
+    return 1.0 / (1.0 + np.exp(-z))
+
+
+class CompiledLinearModel:
+    """Logistic regression (or log-loss SGD) with the scaler's mean/scale folded into the weights"""
+
+    def __init__(self, model, scaler):
+        coef = model.coef_[0] / scaler.scale_
+        self.weights = np.ascontiguousarray(coef, dtype=np.float64)
+        self.bias = float(model.intercept_[0] - np.dot(coef, scaler.mean_))
+        self.classes_ = model.classes_
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        positive = _sigmoid(X @ self.weights + self.bias)
+        return np.column_stack([1.0 - positive, positive])
+
+
+class CompiledTreeEnsemble:
+    """
+    Tree ensemble (or a single tree) flattened into contiguous node arrays
+    All trees are walked together, one level per step, for every row at once
+    """
+
+    def __init__(self, model, scaler):
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64)
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64)
+        self.classes_ = model.classes_
+
+        if isinstance(model, GradientBoostingClassifier):
+            trees = [estimator[0].tree_ for estimator in model.estimators_]
+            self.kind = 'boosting'
+            self.learning_rate = float(model.learning_rate)
+            self.init_score = self._boosting_init_score(model)
+        elif isinstance(model, DecisionTreeClassifier):
+            # A lone tree is a forest of one
+            trees = [model.tree_]
+            self.kind = 'forest'
+        else:
+            trees = [estimator.tree_ for estimator in model.estimators_]
+            self.kind = 'forest'
+
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n_nodes = tree.node_count
+            is_leaf = tree.children_left == -1
+            node_ids = np.arange(n_nodes) + offset
+
+            # Leaves point back to themselves so extra steps are no-ops
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+
+            if self.kind == 'boosting':
+                values.append(tree.value[:, 0, 0])
+            else:
+                counts = tree.value[:, 0, :]
+                values.append(counts[:, 1] / counts.sum(axis=1))
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        self.feature = np.ascontiguousarray(np.concatenate(features), dtype=np.intp)
+        self.threshold = np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64)
+        self.left = np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp)
+        self.right = np.ascontiguousarray(np.concatenate(rights), dtype=np.intp)
+        self.value = np.ascontiguousarray(np.concatenate(values), dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.max_depth = max_depth
+
+    @staticmethod
+    def _boosting_init_score(model):
+        if model.init_ == 'zero':
+            return 0.0
+        if isinstance(model.init_, DummyClassifier) and model.init_.strategy == 'prior':
+            prior = float(model.init_.class_prior_[1])
+            return float(np.log(prior / (1.0 - prior)))
+        raise ValueError('Unsupported GradientBoosting init estimator')
+
+    def leaf_values(self, X):
+        """Return the leaf value each tree assigns to each row (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=np.float64)
+        # sklearn trees compare float32 features, so do the same for exact parity
+        scaled = ((X - self.mean) / self.scale).astype(np.float32).astype(np.float64)
+
+        rows = np.arange(len(scaled))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(scaled), len(self.roots)))
+        for _ in range(self.max_depth):
+            go_left = scaled[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        return self.value[nodes]
+
+    def predict_proba(self, X):
+        leaves = self.leaf_values(X)
+        if self.kind == 'boosting':
+            positive = _sigmoid(self.init_score + self.learning_rate * leaves.sum(axis=1))
+        else:
+            positive = leaves.mean(axis=1)
+        return np.column_stack([1.0 - positive, positive])
+
+
+def _is_logistic(model):
+    if isinstance(model, SGDClassifier):
+        return model.loss == 'log_loss'
+    return isinstance(model, LogisticRegression)
+
+
+def compile_model(model, scaler, check_rows=256, tolerance=1e-6):
+    """
+    Build a compiled NumPy inference object from a fitted model and scaler
+
+    Returns None when the model type is not supported or the compiled
+    output does not match sklearn, so callers keep using sklearn
+    """
+    if not hasattr(scaler, 'mean_') or not hasattr(scaler, 'scale_'):
+        return None
+
+    try:
+        if _is_logistic(model) and len(model.classes_) == 2:
+            compiled = CompiledLinearModel(model, scaler)
+        elif (isinstance(model, (RandomForestClassifier, GradientBoostingClassifier, DecisionTreeClassifier))
+              and len(model.classes_) == 2):
+            compiled = CompiledTreeEnsemble(model, scaler)
+        else:
+            return None
+    except Exception as e:
+        print(f"⚠ Could not compile model for fast inference: {e}")
+        return None
+
+    # Parity check against sklearn on synthetic rows around the training mean
+    rng = np.random.default_rng(0)
+    sample = scaler.mean_ + scaler.scale_ * rng.standard_normal((check_rows, len(scaler.mean_)))
+    expected = model.predict_proba(scaler.transform(sample))
+    if not np.allclose(compiled.predict_proba(sample), expected, atol=tolerance):
+        print("⚠ Compiled model does not match sklearn output, using sklearn")
+        return None
+
+    return compiled
@@ -3,6 +3,12 @@ Health Checkup Recommendation Tool
 Generates personalized health checkup recommendations based on patient data
 """
 
+import numpy as np
+import pandas as pd
+
+from app.utils.plan_tables import build_table, freeze
+
+
 def get_blood_test_recommendations(age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history):
     """
     Generate recommended blood tests based on patient profile
@@ -272,6 +278,65 @@ def get_lifestyle_recommendations(age, bmi, glucose, blood_pressure_systolic, ha
     return tips
 
 
+NEXT_STEPS = [
+    "Schedule an appointment with your primary care physician",
+    "Discuss these test recommendations with your doctor",
+    "Get baseline tests done if you haven't had them recently",
+    "Create a health tracking log for blood sugar and blood pressure",
+    "Follow up on any abnormal results promptly"
+]
+
+
+def _checkup_bucket(age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history):
+    """Threshold comparisons that decide every bucket-dependent part of the checkup plan"""
+    return (
+        age > 40, age > 45, age > 50, age > 60, age < 65,
+        bmi > 25, bmi > 30,
+        glucose > 100, glucose > 125,
+        blood_pressure_systolic >= 130, blood_pressure_systolic >= 140,
+        blood_pressure_diastolic >= 80, blood_pressure_diastolic >= 90,
+        bool(has_diabetes), bool(family_history)
+    )
+
+
+def _build_checkup_sections(age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history):
+    """Parts of the checkup plan that depend only on the threshold bucket"""
+    # Determine BP category
+    if blood_pressure_systolic >= 140 or blood_pressure_diastolic >= 90:
+        bp_category = "High (Hypertension)"
+        bp_status = "concerning"
+    elif blood_pressure_systolic >= 130 or blood_pressure_diastolic >= 80:
+        bp_category = "Elevated"
+        bp_status = "attention"
+    else:
+        bp_category = "Normal"
+        bp_status = "good"
+    
+    return {
+        "bp_category": bp_category,
+        "bp_status": bp_status,
+        "blood_tests": get_blood_test_recommendations(
+            age, bmi, glucose, blood_pressure_systolic, 
+            blood_pressure_diastolic, has_diabetes, family_history
+        ),
+        "checkup_frequency": get_checkup_frequency(age, has_diabetes, glucose, blood_pressure_systolic, blood_pressure_diastolic),
+        "lifestyle_tips": get_lifestyle_recommendations(age, bmi, glucose, blood_pressure_systolic, has_diabetes),
+        "next_steps": NEXT_STEPS
+    }
+
+
+# Every bucket combination, built once at import and shared read-only between calls
+_CHECKUP_SECTIONS = build_table(_checkup_bucket, _build_checkup_sections, [
+    [30, 42, 47, 55, 62, 70],   # age: <=40, 40-45, 45-50, 50-60, 60-65, >=65
+    [22, 28, 35],               # bmi: <=25, 25-30, >30
+    [90, 110, 130],             # glucose: <=100, 100-125, >125
+    [120, 135, 150],            # systolic: <130, 130-140, >=140
+    [70, 85, 95],               # diastolic: <80, 80-90, >=90
+    [0, 1],                     # has_diabetes
+    [False, True]               # family_history
+])
+
+
 def generate_health_checkup_plan(age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history):
     """
     Generate complete health checkup recommendation plan
@@ -286,46 +351,157 @@ def generate_health_checkup_plan(age, bmi, glucose, blood_pressure_systolic, blo
         family_history: Whether patient has family history of diabetes
     
     Returns:
-        dict: Complete health checkup plan
+        dict: Complete health checkup plan (shared sections are read-only)
     """
-    
-    blood_tests = get_blood_test_recommendations(
-        age, bmi, glucose, blood_pressure_systolic, 
-        blood_pressure_diastolic, has_diabetes, family_history
-    )
-    
-    checkup_frequency = get_checkup_frequency(age, has_diabetes, glucose, blood_pressure_systolic, blood_pressure_diastolic)
-    
-    lifestyle_tips = get_lifestyle_recommendations(age, bmi, glucose, blood_pressure_systolic, has_diabetes)
-    
-    # Determine BP category
-    if blood_pressure_systolic >= 140 or blood_pressure_diastolic >= 90:
-        bp_category = "High (Hypertension)"
-        bp_status = "concerning"
-    elif blood_pressure_systolic >= 130 or blood_pressure_diastolic >= 80:
-        bp_category = "Elevated"
-        bp_status = "attention"
-    else:
-        bp_category = "Normal"
-        bp_status = "good"
+    inputs = (age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history)
+    sections = _CHECKUP_SECTIONS.get(_checkup_bucket(*inputs))
+    if sections is None:
+        # Inputs outside every bucket (e.g. NaN) are built directly
+        sections = freeze(_build_checkup_sections(*inputs))
     
     checkup_plan = {
         "blood_pressure_info": {
             "reading": f"{blood_pressure_systolic}/{blood_pressure_diastolic} mmHg",
-            "category": bp_category,
-            "status": bp_status
+            "category": sections["bp_category"],
+            "status": sections["bp_status"]
         },
-        "blood_tests": blood_tests,
-        "checkup_frequency": checkup_frequency,
-        "lifestyle_tips": lifestyle_tips,
+        "blood_tests": sections["blood_tests"],
+        "checkup_frequency": sections["checkup_frequency"],
+        "lifestyle_tips": sections["lifestyle_tips"],
         "family_history": family_history,
-        "next_steps": [
-            "Schedule an appointment with your primary care physician",
-            "Discuss these test recommendations with your doctor",
-            "Get baseline tests done if you haven't had them recently",
-            "Create a health tracking log for blood sugar and blood pressure",
-            "Follow up on any abnormal results promptly"
-        ]
+        "next_steps": sections["next_steps"]
     }
     
     return checkup_plan
+
+
+# ----- Vectorized rules for whole patient panels -----
+
+# Overall checkup frequency per code, in the priority order used by get_checkup_frequency
+CHECKUP_FREQUENCY_LEVELS = [
+    get_checkup_frequency(30, True, 90, 120, 70),     # 0: diabetes
+    get_checkup_frequency(30, False, 90, 150, 70),    # 1: hypertension
+    get_checkup_frequency(30, False, 130, 120, 70),   # 2: high glucose or elevated BP
+    get_checkup_frequency(70, False, 90, 120, 70),    # 3: senior
+    get_checkup_frequency(30, False, 90, 120, 70),    # 4: routine
+]
+
+BP_CATEGORIES = ["Normal", "Elevated", "High (Hypertension)"]
+
+# Exercise recommendation per code, in the priority order used by get_lifestyle_recommendations
+EXERCISE_PLANS = [
+    get_lifestyle_recommendations(30, 35, 90, 120, False)[1]["recommendation"],   # 0: BMI over 30
+    get_lifestyle_recommendations(30, 22, 90, 120, True)[1]["recommendation"],    # 1: diabetes
+    get_lifestyle_recommendations(30, 22, 90, 120, False)[1]["recommendation"],   # 2: general
+]
+
+# Sleep and stress management recommendations per code, as chosen by get_lifestyle_recommendations
+SLEEP_PLANS = [
+    get_lifestyle_recommendations(30, 22, 90, 120, False)[0]["recommendation"],   # 0: under 65
+    get_lifestyle_recommendations(70, 22, 90, 120, False)[0]["recommendation"],   # 1: 65 and over
+]
+STRESS_PLANS = [
+    get_lifestyle_recommendations(30, 22, 90, 150, False)[3]["recommendation"],   # 0: systolic 140 or more
+    get_lifestyle_recommendations(30, 22, 90, 120, False)[3]["recommendation"],   # 1: otherwise
+]
+
+# Bit i of a blood test mask means BLOOD_TESTS[i] is recommended
+BLOOD_TESTS = [
+    "Fasting Blood Glucose (FBG)",
+    "HbA1c (Glycated Hemoglobin)",
+    "Lipid Panel (Cholesterol)",
+    "Blood Pressure Monitoring",
+    "Urine Microalbumin",
+    "Kidney Function Tests (Creatinine, BUN)",
+    "Comprehensive Metabolic Panel",
+    "Eye Examination (Dilated)",
+    "Foot Examination",
+    "Thyroid Function Tests (TSH)",
+    "Vitamin D Levels",
+    "Liver Function Tests",
+    "Insulin Levels (Fasting)",
+    "C-Peptide Test",
+    "Bone Density Scan",
+    "Complete Blood Count (CBC)",
+    "Vitamin B12",
+]
+
+
+def generate_cohort_checkup_codes(age, bmi, glucose, blood_pressure_systolic, blood_pressure_diastolic, has_diabetes, family_history):
+    """
+    Vectorized version of the checkup rules for many patients at once
+    
+    Args:
+        Array-likes (NumPy arrays or pandas columns) of equal length, one entry per patient,
+        with the same meaning as the generate_health_checkup_plan arguments
+    
+    Returns:
+        DataFrame with one row per patient:
+            checkup_frequency: index into CHECKUP_FREQUENCY_LEVELS
+            bp_category: index into BP_CATEGORIES
+            blood_tests: bitmask over BLOOD_TESTS
+            exercise_plan: index into EXERCISE_PLANS
+            sleep_plan: index into SLEEP_PLANS
+            stress_plan: index into STRESS_PLANS
+            glucose_monitoring, weight_management: whether those lifestyle tips apply
+        (hydration and harmful-habit tips are the same for every patient)
+    """
+    age = np.asarray(age, dtype=float)
+    bmi = np.asarray(bmi, dtype=float)
+    glucose = np.asarray(glucose, dtype=float)
+    systolic = np.asarray(blood_pressure_systolic, dtype=float)
+    diastolic = np.asarray(blood_pressure_diastolic, dtype=float)
+    has_diabetes = np.asarray(has_diabetes).astype(bool)
+    family_history = np.asarray(family_history).astype(bool)
+    
+    hypertension = (systolic >= 140) | (diastolic >= 90)
+    elevated_bp = (systolic >= 130) | (diastolic >= 80)
+    high_glucose = has_diabetes | (glucose > 125)
+    always = np.ones(len(age), dtype=bool)
+    
+    checkup_frequency = np.select(
+        [has_diabetes, hypertension, (glucose > 125) | elevated_bp, age > 60],
+        [0, 1, 2, 3],
+        default=4
+    )
+    bp_category = np.select([hypertension, elevated_bp], [2, 1], default=0)
+    exercise_plan = np.select([bmi > 30, has_diabetes], [0, 1], default=2)
+    
+    test_conditions = {
+        "Fasting Blood Glucose (FBG)": always,
+        "HbA1c (Glycated Hemoglobin)": always,
+        "Lipid Panel (Cholesterol)": always,
+        "Blood Pressure Monitoring": hypertension,
+        "Urine Microalbumin": high_glucose,
+        "Kidney Function Tests (Creatinine, BUN)": hypertension,
+        "Comprehensive Metabolic Panel": high_glucose,
+        "Eye Examination (Dilated)": high_glucose,
+        "Foot Examination": high_glucose,
+        "Thyroid Function Tests (TSH)": age > 40,
+        "Vitamin D Levels": age > 50,
+        "Liver Function Tests": bmi > 30,
+        "Insulin Levels (Fasting)": family_history,
+        "C-Peptide Test": family_history,
+        "Bone Density Scan": age > 50,
+        "Complete Blood Count (CBC)": always,
+        "Vitamin B12": always,
+    }
+    blood_tests = np.zeros(len(age), dtype=np.int64)
+    for bit, name in enumerate(BLOOD_TESTS):
+        blood_tests |= test_conditions[name].astype(np.int64) << bit
+    
+    return pd.DataFrame({
+        "checkup_frequency": checkup_frequency,
+        "bp_category": bp_category,
+        "blood_tests": blood_tests,
+        "exercise_plan": exercise_plan,
+        "sleep_plan": np.where(age < 65, 0, 1),
+        "stress_plan": np.where(systolic >= 140, 0, 1),
+        "glucose_monitoring": high_glucose,
+        "weight_management": bmi > 25,
+    })
+
+
+def decode_blood_tests(mask):
+    """Names of the blood tests set in a blood test bitmask"""
+    return [name for bit, name in enumerate(BLOOD_TESTS) if int(mask) >> bit & 1]
@@ -0,0 +1,118 @@
+"""
+Process-pool Inference Backend for Diabetes Predictor
+Runs predict_proba in separate worker processes so CPU-heavy ensembles
+(RandomForest, SVC with probability=True) do not hold the web worker's GIL
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Per-process state inside pool workers
+_worker_registry = None
+_worker_legacy_paths = None
+_worker_bundle = None
+
+
+def _init_worker(registry_root, legacy_model_path, legacy_scaler_path):
+    global _worker_registry, _worker_legacy_paths
+    from app.utils.model_registry import ModelRegistry
+    # Pool workers only score rows
+    _worker_registry = ModelRegistry(registry_root, explain=False)
+    _worker_legacy_paths = (legacy_model_path, legacy_scaler_path)
+
+
+def _worker_bundle_for(version):
+    """Load the requested model version once per worker process"""
+    global _worker_bundle
+    if _worker_bundle is None or _worker_bundle.version != version:
+        if version == 'legacy':
+            _worker_bundle = _worker_registry.load_legacy(*_worker_legacy_paths)
+        else:
+            _worker_bundle = _worker_registry.load_version(version)
+    return _worker_bundle
+
+
+def _score_shared(shm_name, n_rows, n_features, version):
+    """
+    Worker task: rows are read from, and probabilities written back to,
+    the caller's shared-memory block (n_rows * (n_features + 1) float64)
+    """
+    bundle = _worker_bundle_for(version)
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        buffer = np.ndarray((n_rows, n_features + 1), dtype=np.float64, buffer=shm.buf)
+        buffer[:, n_features] = bundle.predict_positive(buffer[:, :n_features])
+        del buffer
+    finally:
+        shm.close()
+
+
+class InferencePool:
+    """Drop-in replacement for LoadedModel.predict_positive backed by worker processes"""
+
+    def __init__(self, registry_root, legacy_model_path, legacy_scaler_path, max_workers=None):
+        self.registry_root = registry_root
+        self.legacy_paths = (legacy_model_path, legacy_scaler_path)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {'calls': 0, 'rows': 0, 'errors': 0}
+
+    def _get_executor(self):
+        # Created lazily per process; spawn avoids forking a threaded web worker.
+        # Spawned workers re-import the main module, so entry points must not build
+        # the app when imported as __mp_main__ (see run.py)
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.registry_root, *self.legacy_paths),
+                )
+                self._pid = os.getpid()
+            return self._executor
+
+    def predict_positive(self, features, version):
+        """Probability of diabetes per row, computed by a pool worker"""
+        features = np.asarray(features, dtype=np.float64)
+        n_rows, n_features = features.shape
+
+        shm = shared_memory.SharedMemory(create=True, size=n_rows * (n_features + 1) * 8)
+        try:
+            buffer = np.ndarray((n_rows, n_features + 1), dtype=np.float64, buffer=shm.buf)
+            buffer[:, :n_features] = features
+            try:
+                self._get_executor().submit(_score_shared, shm.name, n_rows, n_features, version).result()
+            except Exception:
+                with self._lock:
+                    self._stats['errors'] += 1
+                raise
+            probabilities = buffer[:, n_features].copy()
+            del buffer
+        finally:
+            shm.close()
+            shm.unlink()
+
+        with self._lock:
+            self._stats['calls'] += 1
+            self._stats['rows'] += n_rows
+        return probabilities
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['workers'] = self.max_workers
+        return stats
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=True)
+            self._executor = None
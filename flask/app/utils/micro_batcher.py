@@ -0,0 +1,121 @@
+"""
+Micro-batching Scheduler for Diabetes Predictor
+Coalesces single-row prediction requests from concurrent threads into one
+stacked call to the scoring function
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher:
+    """
+    Collects rows for up to max_wait_ms (or until max_batch_size rows are
+    waiting), scores them in one call and resolves each caller's future
+
+    score_fn takes an (n, n_features) matrix and the context the rows were
+    submitted with, and returns a tuple of arrays, each with one entry per row;
+    every caller gets its own row of each array. Rows submitted with different
+    contexts (e.g. model versions) are scored in separate calls.
+    """
+
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=2.0):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'batches': 0,
+            'rows': 0,
+            'max_batch_size': 0,
+            'total_queue_wait_ms': 0.0,
+            'max_queue_wait_ms': 0.0,
+            'errors': 0,
+        }
+
+    def _ensure_worker(self):
+        # Started lazily and per process so forked workers get their own thread
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid() or not self._thread.is_alive():
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name='prediction-microbatcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, row, context=None):
+        """Queue one feature row; returns a Future resolving to that row's results"""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((np.asarray(row, dtype=float), future, time.perf_counter(), context))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            waits = [(started - queued_at) * 1000 for _, _, queued_at, _ in batch]
+
+            groups = {}
+            for entry in batch:
+                groups.setdefault(id(entry[3]), []).append(entry)
+
+            error = False
+            for group in groups.values():
+                futures = [future for _, future, _, _ in group]
+                try:
+                    results = self.score_fn(np.vstack([row for row, _, _, _ in group]), group[0][3])
+                except Exception as e:
+                    for future in futures:
+                        future.set_exception(e)
+                    error = True
+                    continue
+
+                for i, future in enumerate(futures):
+                    future.set_result(tuple(values[i] for values in results))
+            self._record(len(batch), waits, error=error)
+
+    def _record(self, batch_size, waits, error=False):
+        with self._stats_lock:
+            self._stats['batches'] += 1
+            self._stats['rows'] += batch_size
+            self._stats['max_batch_size'] = max(self._stats['max_batch_size'], batch_size)
+            self._stats['total_queue_wait_ms'] += sum(waits)
+            self._stats['max_queue_wait_ms'] = max(self._stats['max_queue_wait_ms'], max(waits))
+            if error:
+                self._stats['errors'] += 1
+
+    def get_stats(self):
+        """Batch size and queue wait metrics"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        total_wait = stats.pop('total_queue_wait_ms')
+        stats['avg_batch_size'] = (stats['rows'] / stats['batches']) if stats['batches'] else 0
+        stats['avg_queue_wait_ms'] = (total_wait / stats['rows']) if stats['rows'] else 0
+        stats['pending'] = self._queue.qsize()
+        stats['max_wait_ms'] = self.max_wait * 1000
+        stats['max_batch_limit'] = self.max_batch_size
+        return stats
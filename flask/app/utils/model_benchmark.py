@@ -0,0 +1,116 @@
+"""
+Serving-cost Benchmark for Diabetes Predictor
+Measures what a candidate model would cost in production (latency through the
+same LoadedModel path the app serves with, pickle size, memory once loaded) and
+picks a model under a latency/size budget
+"""
+
+import io
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+
+from app.utils.model_registry import LoadedModel
+
+
+def _percentiles_ms(samples):
+    samples = np.asarray(samples) * 1000
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 99))
+
+
+def benchmark_model(model, scaler, X_sample, single_rows=300, batch_size=1000, batch_repeats=30):
+    """
+    Args:
+        model, scaler: fitted candidate and the scaler it was trained behind
+        X_sample: unscaled feature rows to score (recycled to fill batches)
+
+    Returns:
+        dict with single-row and batch p50/p99 latency (ms), pickle size (bytes),
+        memory allocated by loading the pickle (bytes), and whether the compiled path is used
+    """
+    X_sample = np.asarray(X_sample, dtype=np.float64)
+    bundle = LoadedModel('benchmark', model, scaler, {})
+
+    # Warm up caches and lazy initialisation before timing
+    bundle.predict_positive(X_sample[:1])
+
+    single = []
+    for i in range(single_rows):
+        row = X_sample[i % len(X_sample)][np.newaxis, :]
+        start = time.perf_counter()
+        bundle.predict_positive(row)
+        single.append(time.perf_counter() - start)
+
+    batch = np.resize(X_sample, (batch_size, X_sample.shape[1]))
+    batches = []
+    for _ in range(batch_repeats):
+        start = time.perf_counter()
+        bundle.predict_positive(batch)
+        batches.append(time.perf_counter() - start)
+
+    buffer = io.BytesIO()
+    joblib.dump(model, buffer)
+    pickle_bytes = buffer.tell()
+
+    buffer.seek(0)
+    tracemalloc.start()
+    loaded = joblib.load(buffer)
+    memory_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del loaded
+
+    single_p50, single_p99 = _percentiles_ms(single)
+    batch_p50, batch_p99 = _percentiles_ms(batches)
+    return {
+        'single_p50_ms': single_p50,
+        'single_p99_ms': single_p99,
+        'batch_size': batch_size,
+        'batch_p50_ms': batch_p50,
+        'batch_p99_ms': batch_p99,
+        'pickle_bytes': pickle_bytes,
+        'memory_bytes': memory_bytes,
+        'compiled': bundle.fast_model is not None,
+    }
+
+
+def select_model(results, benchmarks, metric='accuracy', max_single_p99_ms=None, max_model_mb=None,
+                 tolerance=0.0):
+    """
+    Pick the model to ship
+
+    Candidates over the latency or size budget are excluded (unless all of them are).
+    Among the rest, any model within `tolerance` of the best metric counts as a tie,
+    and the tie goes to the lowest single-row p99 latency.
+
+    Returns:
+        (model name, selection record for the metadata)
+    """
+    def within_budget(name):
+        benchmark = benchmarks[name]
+        if max_single_p99_ms is not None and benchmark['single_p99_ms'] > max_single_p99_ms:
+            return False
+        if max_model_mb is not None and benchmark['pickle_bytes'] > max_model_mb * 1024 * 1024:
+            return False
+        return True
+
+    eligible = [name for name in results if within_budget(name)]
+    over_budget = not eligible
+    if over_budget:
+        eligible = list(results)
+
+    best_score = max(results[name][metric] for name in eligible)
+    ties = [name for name in eligible if results[name][metric] >= best_score - tolerance]
+    chosen = min(ties, key=lambda name: benchmarks[name]['single_p99_ms'])
+
+    return chosen, {
+        'metric': metric,
+        'max_single_p99_ms': max_single_p99_ms,
+        'max_model_mb': max_model_mb,
+        'tolerance': tolerance,
+        'within_budget': [] if over_budget else eligible,
+        'ties': ties,
+        'chosen': chosen,
+        'best_by_metric': max(results, key=lambda name: results[name][metric]),
+    }
@@ -0,0 +1,270 @@
+"""
+Versioned Model Registry for Diabetes Predictor
+Stores trained model/scaler artifacts under numbered versions with a manifest
+and lets running workers switch to a newly published version without a restart
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+
+from app.utils.fast_inference import compile_model
+from app.utils.explainer import build_explainer
+
+MODEL_FILE = 'model.pkl'
+SCALER_FILE = 'scaler.pkl'
+FIRST_STAGE_FILE = 'first_stage.pkl'
+MANIFEST_FILE = 'manifest.json'
+CURRENT_FILE = 'CURRENT'
+
+
+def file_checksum(path):
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_builtin(value):
+    """json.dump fallback for NumPy scalars/arrays found in model metadata"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+class LoadedModel:
+    """Immutable bundle of everything needed to serve one model version"""
+
+    def __init__(self, version, model, scaler, manifest, first_stage=None):
+        self.version = version
+        self.model = model
+        self.scaler = scaler
+        self.manifest = manifest
+        self.feature_names = manifest.get('feature_names', [])
+        self.fast_model = compile_model(model, scaler)
+        # Optional cheap model (same scaler) that scores rows before this one, see cascade.py
+        self.first_stage = first_stage
+        self.fast_first_stage = compile_model(first_stage, scaler) if first_stage is not None else None
+        self._explainers = {}
+        # Set by build_explainers when rows the full model scored are explained through the first stage
+        self.explains_with_first_stage = False
+
+    def predict_positive(self, features):
+        """Probability of diabetes per row; compiled NumPy path first, sklearn as fallback"""
+        if self.fast_model is not None:
+            try:
+                return self.fast_model.predict_proba(features)[:, 1]
+            except Exception as e:
+                print(f"Fast inference error, falling back to sklearn: {e}")
+        return self.model.predict_proba(self.scaler.transform(features))[:, 1]
+
+    def build_explainers(self, max_cost=None):
+        """
+        Build both explainers now, at load, so no request pays for them
+        When the model's explainer costs more than max_cost per row and there is a first
+        stage, rows the model scored are explained through the first stage instead
+        """
+        model_explainer, first_stage_explainer = self.explainer(), self.explainer(first_stage=True)
+        if max_cost and model_explainer is not None and first_stage_explainer is not None \
+                and model_explainer.cost > max_cost:
+            self.explains_with_first_stage = True
+            print(f"⚠ {self.version}: explaining with the first-stage model ({model_explainer.cost} tree path pairs "
+                  f"exceed the budget of {max_cost})")
+
+    def explainer(self, first_stage=False):
+        """Feature attribution for the model (or the first stage), None if unsupported"""
+        if first_stage not in self._explainers:
+            model = self.first_stage if first_stage else self.model
+            self._explainers[first_stage] = build_explainer(model, self.scaler) if model is not None else None
+        return self._explainers[first_stage]
+
+    def predict_first_stage(self, features):
+        """Probability of diabetes per row from the first-stage model"""
+        if self.fast_first_stage is not None:
+            return self.fast_first_stage.predict_proba(features)[:, 1]
+        return self.first_stage.predict_proba(self.scaler.transform(features))[:, 1]
+
+
+class ModelRegistry:
+    """
+    Registry layout:
+        <root>/CURRENT                name of the active version
+        <root>/v0001/model.pkl
+        <root>/v0001/scaler.pkl
+        <root>/v0001/first_stage.pkl  optional cheap model for cascade inference
+        <root>/v0001/manifest.json    metadata, feature order and checksums
+
+    Requests call current() once and keep that bundle for the whole request,
+    so swapping to a new version never affects a request already in flight.
+    """
+
+    def __init__(self, root, poll_interval=5.0, mmap_mode='r', explain=True, explain_max_cost=None):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.mmap_mode = mmap_mode
+        # Build explainers while loading a version (see LoadedModel.build_explainers)
+        self.explain = explain
+        self.explain_max_cost = explain_max_cost
+        self._bundle = None
+        self._lock = threading.Lock()
+        self._last_check = 0.0
+
+    # ----- publishing -----
+
+    def versions(self):
+        """All published versions, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            name for name in os.listdir(self.root)
+            if name.startswith('v') and os.path.exists(os.path.join(self.root, name, MANIFEST_FILE))
+        )
+
+    def active_version(self):
+        """Version named in CURRENT, or None"""
+        try:
+            with open(os.path.join(self.root, CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, model, scaler, metadata=None, activate=True, first_stage=None):
+        """
+        Write a new version of the artifacts and optionally make it active
+        first_stage: optional cheap model, fitted behind the same scaler, for cascade inference
+        """
+        os.makedirs(self.root, exist_ok=True)
+        metadata = dict(metadata or {})
+
+        staging = tempfile.mkdtemp(prefix='.staging-', dir=self.root)
+        try:
+            # Uncompressed dumps so the arrays can be memory-mapped on load
+            joblib.dump(model, os.path.join(staging, MODEL_FILE))
+            joblib.dump(scaler, os.path.join(staging, SCALER_FILE))
+            if first_stage is not None:
+                joblib.dump(first_stage, os.path.join(staging, FIRST_STAGE_FILE))
+
+            existing = self.versions()
+            number = int(existing[-1][1:]) + 1 if existing else 1
+            version = f'v{number:04d}'
+
+            manifest = {
+                'version': version,
+                'created_at': datetime.now().isoformat(),
+                'model_name': metadata.get('model_name', type(model).__name__),
+                'feature_names': list(metadata.get('feature_names') or getattr(scaler, 'feature_names_in_', [])),
+                'metadata': metadata,
+                'checksums': {
+                    MODEL_FILE: file_checksum(os.path.join(staging, MODEL_FILE)),
+                    SCALER_FILE: file_checksum(os.path.join(staging, SCALER_FILE)),
+                },
+            }
+            if first_stage is not None:
+                manifest['first_stage_model'] = type(first_stage).__name__
+                manifest['checksums'][FIRST_STAGE_FILE] = file_checksum(os.path.join(staging, FIRST_STAGE_FILE))
+            with open(os.path.join(staging, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=2, default=_to_builtin)
+
+            os.rename(staging, os.path.join(self.root, version))
+        except Exception:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Atomically point CURRENT at an existing version"""
+        if version not in self.versions():
+            raise ValueError(f'Unknown model version: {version}')
+        fd, tmp_path = tempfile.mkstemp(prefix='.current-', dir=self.root)
+        with os.fdopen(fd, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, os.path.join(self.root, CURRENT_FILE))
+
+    # ----- loading -----
+
+    def load_version(self, version):
+        """Load and verify one version from disk"""
+        version_dir = os.path.join(self.root, version)
+        with open(os.path.join(version_dir, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+
+        for name, expected in manifest.get('checksums', {}).items():
+            if file_checksum(os.path.join(version_dir, name)) != expected:
+                raise ValueError(f'Checksum mismatch for {version}/{name}')
+
+        # mmap_mode lets forked workers share the arrays through the page cache
+        model = joblib.load(os.path.join(version_dir, MODEL_FILE), mmap_mode=self.mmap_mode)
+        scaler = joblib.load(os.path.join(version_dir, SCALER_FILE), mmap_mode=self.mmap_mode)
+        first_stage = None
+        if FIRST_STAGE_FILE in manifest.get('checksums', {}):
+            first_stage = joblib.load(os.path.join(version_dir, FIRST_STAGE_FILE), mmap_mode=self.mmap_mode)
+        bundle = LoadedModel(version, model, scaler, manifest, first_stage)
+        if self.explain:
+            bundle.build_explainers(self.explain_max_cost)
+        return bundle
+
+    def load_legacy(self, model_path, scaler_path, metadata_path=None):
+        """Serve artifacts written by train_merged_model.py before the registry existed"""
+        model = joblib.load(model_path, mmap_mode=self.mmap_mode)
+        scaler = joblib.load(scaler_path, mmap_mode=self.mmap_mode)
+        metadata = {}
+        if metadata_path and os.path.exists(metadata_path):
+            metadata = joblib.load(metadata_path)
+        manifest = {
+            'version': 'legacy',
+            'model_name': metadata.get('model_name', type(model).__name__),
+            'feature_names': metadata.get('feature_names', []),
+            'metadata': metadata,
+        }
+        bundle = LoadedModel('legacy', model, scaler, manifest)
+        if self.explain:
+            bundle.build_explainers(self.explain_max_cost)
+        self._bundle = bundle
+        return self._bundle
+
+    def refresh(self, force=False):
+        """
+        Swap to the active version if it changed on disk
+        Cheap to call per request: the CURRENT file is checked at most once per poll interval
+        """
+        now = time.monotonic()
+        if not force and now - self._last_check < self.poll_interval:
+            return False
+        # Another thread is already reloading; keep serving the current bundle
+        if not self._lock.acquire(blocking=force):
+            return False
+        try:
+            self._last_check = now
+            version = self.active_version()
+            if version is None or (self._bundle is not None and self._bundle.version == version):
+                return False
+            try:
+                bundle = self.load_version(version)
+            except Exception as e:
+                print(f"⚠ Could not load model version {version}: {e}")
+                return False
+            self._bundle = bundle
+            print(f"✓ Serving model version {version} ({bundle.manifest.get('model_name')})")
+            return True
+        finally:
+            self._lock.release()
+
+    def current(self):
+        """The bundle to use for this request (None if nothing could be loaded)"""
+        self.refresh()
+        return self._bundle
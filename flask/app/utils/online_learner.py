@@ -0,0 +1,234 @@
+"""
+Online Learner for Diabetes Predictor
+Trains an SGD logistic model from the RL feedback stream in a background thread,
+scores it in shadow against the serving model, and publishes it when it does better
+"""
+
+import copy
+import fcntl
+import os
+import threading
+import time
+from collections import deque
+
+import joblib
+import numpy as np
+from sklearn.linear_model import SGDClassifier
+
+# Feedback carries what HealthRecord stores; the model learns from these features only
+FEEDBACK_FEATURES = {'Glucose': ('glucose',), 'BloodPressure': ('bp_systolic', 'blood_pressure'),
+                     'Insulin': ('insulin',), 'BMI': ('bmi',), 'Age': ('age',)}
+
+CHECKPOINT_FILE = 'online_learner.pkl'
+LOCK_FILE = 'online_learner.lock'
+
+
+def _log_loss(probabilities, labels):
+    probabilities = np.clip(probabilities, 1e-6, 1 - 1e-6)
+    return -(labels * np.log(probabilities) + (1 - labels) * np.log(1 - probabilities))
+
+
+class OnlineLearner:
+    """
+    Tails the shared RL event log, so feedback posted to any worker is learned from.
+    One process at a time trains (it holds a lock file in the registry directory);
+    the others retry every interval and take over if that process exits.
+
+    Each feedback is used test-then-train: the shadow model scores it before learning
+    from it, and is compared with the probability the serving model gave when the
+    prediction was made (from the full form input). Over the last `window`
+    feedbacks, the shadow model is published to the registry, and so picked up by
+    every worker, when its log loss is lower by `margin` and its accuracy is no worse.
+    Progress is checkpointed, so a restart resumes where it stopped.
+
+    Feedback only stores FEEDBACK_FEATURES. The other inputs are held at their
+    training mean (0 after scaling), so their weights stay exactly 0 and the
+    published model ignores them rather than weighting values it never saw vary.
+    """
+
+    def __init__(self, registry, event_log, feature_names, interval=5.0, window=200, min_samples=100,
+                 margin=0.01):
+        self.registry = registry
+        self.event_log = event_log
+        self.feature_names = list(feature_names)
+        self.trained_features = [name for name in self.feature_names if name in FEEDBACK_FEATURES]
+        self.interval = interval
+        self.min_samples = min_samples
+        self.margin = margin
+        self.model = None
+        self.scaler = None  # the shadow model is trained on this scaler's output
+        self.last_event_id = 0
+        self.trained = 0
+        self.history = deque(maxlen=window)  # (primary_loss, shadow_loss, primary_correct, shadow_correct)
+        # get_stats reads the window on request threads while the trainer thread appends to it
+        self._history_lock = threading.Lock()
+        self._lock_file = None
+        self._pid = None
+        self._stats = {'promotions': 0, 'last_promoted_version': None, 'errors': 0}
+
+    def ensure_started(self):
+        # Per process: forked web workers start their own (standby) thread
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock_file = None
+        threading.Thread(target=self._run, name='online-learner', daemon=True).start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                if self._acquire():
+                    self.train_pending()
+            except Exception as e:
+                print(f"⚠ Online learning step failed: {e}")
+                self._stats['errors'] += 1
+
+    def _acquire(self):
+        """Become the training process if no other process is; held until exit"""
+        if self._lock_file is not None:
+            return True
+        os.makedirs(self.registry.root, exist_ok=True)
+        lock_file = open(os.path.join(self.registry.root, LOCK_FILE), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        self._load_checkpoint()
+        return True
+
+    def _feature_row(self, features):
+        """Model input for one feedback, NaN where the feature was not stored"""
+        row = []
+        for name in self.feature_names:
+            keys = [key for key in FEEDBACK_FEATURES.get(name, ()) if key in features]
+            row.append(float(features[keys[0]]) if keys else np.nan)
+        return row
+
+    def train_pending(self, chunk_size=1000):
+        """Shadow-score and learn from every feedback logged since the last step, chunk_size feedbacks at a time"""
+        bundle = self.registry.current()
+        if bundle is None:
+            return
+
+        rows, labels, served, last_event_id = [], [], [], self.last_event_id
+        for event_id, kind, payload in self.event_log.events_after(self.last_event_id, chunk_size):
+            last_event_id = event_id
+            if kind == 'feedback':
+                prediction_data = payload['prediction_data']
+                rows.append(self._feature_row(prediction_data['features']))
+                labels.append(payload['actual_outcome'])
+                # Uncalibrated serving probability (older feedback only has the adjusted one)
+                served.append(prediction_data.get('model_prob', prediction_data['prediction_prob']))
+                if len(rows) == chunk_size:
+                    self._learn(bundle, rows, labels, served, last_event_id)
+                    rows, labels, served = [], [], []
+        if rows:
+            self._learn(bundle, rows, labels, served, last_event_id)
+        self.last_event_id = last_event_id
+
+    def _learn(self, bundle, rows, labels, served, last_event_id):
+        X = np.array(rows, dtype=float)
+        y = np.array(labels, dtype=int)
+        if self.scaler is None:
+            self.scaler = bundle.scaler
+        # The scaler passes NaN through; 0 is the training mean after standard scaling
+        X_scaled = np.nan_to_num(self.scaler.transform(X), nan=0.0)
+
+        primary = np.array(served, dtype=float)
+        shadow = self.model.predict_proba(X_scaled)[:, 1] if self.model is not None else np.full(len(y), 0.5)
+        with self._history_lock:
+            self.history.extend(zip(_log_loss(primary, y), _log_loss(shadow, y),
+                                    (primary >= 0.5) == y, (shadow >= 0.5) == y))
+
+        if self.model is None:
+            self.model = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+        self.model.partial_fit(X_scaled, y, classes=[0, 1])
+        self.trained += len(y)
+        self.last_event_id = last_event_id
+
+        self._maybe_promote(bundle)
+        self._save_checkpoint()
+
+    def _history_snapshot(self):
+        with self._history_lock:
+            return list(self.history)
+
+    def _window_metrics(self, history):
+        history = np.array(history, dtype=float).reshape(-1, 4)
+        primary_loss, shadow_loss, primary_accuracy, shadow_accuracy = history.mean(axis=0)
+        return {'primary_log_loss': primary_loss, 'shadow_log_loss': shadow_loss,
+                'primary_accuracy': primary_accuracy, 'shadow_accuracy': shadow_accuracy}
+
+    def _maybe_promote(self, bundle):
+        history = self._history_snapshot()
+        if self.trained < self.min_samples or len(history) < min(self.history.maxlen, self.min_samples):
+            return
+        metrics = self._window_metrics(history)
+        if (metrics['shadow_log_loss'] >= metrics['primary_log_loss'] - self.margin
+                or metrics['shadow_accuracy'] < metrics['primary_accuracy']):
+            return
+
+        version = self.registry.publish(copy.deepcopy(self.model), self.scaler, {
+            'model_name': 'Online SGD Logistic Regression',
+            'feature_names': self.feature_names,
+            'trained_features': self.trained_features,
+            'promoted_from_version': bundle.version,
+            'trained_samples': self.trained,
+            'last_event_id': self.last_event_id,
+            **{key: float(value) for key, value in metrics.items()},
+        })
+        print(f"✓ Promoted online model as {version} (log loss {metrics['shadow_log_loss']:.4f} "
+              f"vs {metrics['primary_log_loss']:.4f} for {bundle.version})")
+        self._stats['promotions'] += 1
+        self._stats['last_promoted_version'] = version
+        # The promoted model now serves; compare future updates against it from scratch
+        with self._history_lock:
+            self.history.clear()
+
+    def _checkpoint_path(self):
+        return os.path.join(self.registry.root, CHECKPOINT_FILE)
+
+    def _save_checkpoint(self):
+        tmp_path = self._checkpoint_path() + '.tmp'
+        joblib.dump({
+            'model': self.model,
+            'scaler': self.scaler,
+            'trained_features': self.trained_features,
+            'last_event_id': self.last_event_id,
+            'trained': self.trained,
+            'history': self._history_snapshot(),
+        }, tmp_path)
+        os.replace(tmp_path, self._checkpoint_path())
+
+    def _load_checkpoint(self):
+        if not os.path.exists(self._checkpoint_path()):
+            return
+        try:
+            checkpoint = joblib.load(self._checkpoint_path())
+        except Exception as e:
+            print(f"⚠ Could not load online learner checkpoint, starting over: {e}")
+            return
+        if checkpoint.get('trained_features') != self.trained_features:
+            # Older checkpoints learned from defaulted inputs as well; their weights cannot be reused
+            print("⚠ Online learner checkpoint was trained on other features, starting over")
+            return
+        self.model = checkpoint['model']
+        self.scaler = checkpoint['scaler']
+        self.last_event_id = checkpoint['last_event_id']
+        self.trained = checkpoint['trained']
+        with self._history_lock:
+            self.history.clear()
+            self.history.extend(checkpoint['history'])
+
+    def get_stats(self):
+        stats = dict(self._stats)
+        stats['role'] = 'trainer' if self._lock_file is not None else 'standby'
+        stats['trained_samples'] = self.trained
+        history = self._history_snapshot()
+        stats['window'] = len(history)
+        if history:
+            stats.update({key: float(value) for key, value in self._window_metrics(history).items()})
+        return stats
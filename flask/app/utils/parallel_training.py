@@ -0,0 +1,236 @@
+"""
+Parallel Cross-validated Training for Diabetes Predictor
+Scales every CV fold once, writes it to disk for memory-mapping, and fits every
+(candidate model, fold) pair in a pool of worker processes
+"""
+
+import hashlib
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from sklearn.model_selection import ParameterGrid, StratifiedKFold
+from sklearn.preprocessing import StandardScaler
+
+METRICS = ['accuracy', 'precision', 'recall', 'f1', 'auc']
+
+
+def prepare_folds(X, y, n_splits, fold_dir, random_state=42):
+    """
+    Fit a scaler on each fold's training part and dump the scaled matrices once
+    Returns one file path per fold; workers memory-map them read-only
+    """
+    X = np.asarray(X, dtype=np.float64)
+    y = np.asarray(y)
+    rng = np.random.default_rng(random_state)
+    paths = []
+    splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    for fold, (train_index, val_index) in enumerate(splitter.split(X, y)):
+        scaler = StandardScaler().fit(X[train_index])
+        path = os.path.join(fold_dir, f'fold-{fold}.joblib')
+        joblib.dump({
+            'X_train': scaler.transform(X[train_index]),
+            'y_train': y[train_index],
+            'X_val': scaler.transform(X[val_index]),
+            'y_val': y[val_index],
+            # Fixed row order for training on subsets (successive halving)
+            'subset_order': rng.permutation(len(train_index)),
+        }, path)
+        paths.append(path)
+    return paths
+
+
+def cached_folds(X, y, n_splits, fold_dir, random_state=42):
+    """prepare_folds, reusing the files in fold_dir when they were built from the same data"""
+    X = np.ascontiguousarray(X, dtype=np.float64)
+    y = np.ascontiguousarray(y)
+    digest = hashlib.sha256()
+    for part in (X.tobytes(), y.tobytes(), str(X.shape).encode(), f'{n_splits}-{random_state}'.encode()):
+        digest.update(part)
+    fingerprint = digest.hexdigest()
+
+    fingerprint_path = os.path.join(fold_dir, 'FINGERPRINT')
+    paths = [os.path.join(fold_dir, f'fold-{fold}.joblib') for fold in range(n_splits)]
+    if os.path.exists(fingerprint_path) and all(os.path.exists(path) for path in paths):
+        with open(fingerprint_path) as f:
+            if f.read() == fingerprint:
+                return paths, fingerprint
+
+    os.makedirs(fold_dir, exist_ok=True)
+    paths = prepare_folds(X, y, n_splits, fold_dir, random_state)
+    with open(fingerprint_path, 'w') as f:
+        f.write(fingerprint)
+    return paths, fingerprint
+
+
+def fit_fold(name, estimator, fold, path, params=None, n_samples=None):
+    """
+    Worker task: fit one candidate on one memory-mapped fold and score it
+    With n_samples, only that many training rows (in the fold's fixed order) are used
+    """
+    data = joblib.load(path, mmap_mode='r')
+    model = clone(estimator).set_params(**(params or {}))
+    X_train, y_train = data['X_train'], data['y_train']
+    if n_samples is not None and n_samples < len(y_train):
+        rows = np.sort(data['subset_order'][:n_samples])
+        X_train, y_train = X_train[rows], y_train[rows]
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    y_pred = model.predict(data['X_val'])
+    y_pred_proba = model.predict_proba(data['X_val'])[:, 1]
+    predict_seconds = time.perf_counter() - start
+
+    y_val = data['y_val']
+    return {
+        'model': name,
+        'fold': fold,
+        'n_samples': len(y_train),
+        'accuracy': accuracy_score(y_val, y_pred),
+        'precision': precision_score(y_val, y_pred, zero_division=0),
+        'recall': recall_score(y_val, y_pred, zero_division=0),
+        'f1': f1_score(y_val, y_pred, zero_division=0),
+        'auc': roc_auc_score(y_val, y_pred_proba),
+        'fit_seconds': fit_seconds,
+        'predict_seconds': predict_seconds,
+        'pid': os.getpid(),
+    }
+
+
+def cross_validate_models(models, X, y, n_splits=5, n_jobs=-1, random_state=42):
+    """
+    K-fold CV of every candidate, all (model, fold) fits running in parallel
+
+    Returns:
+        results: model name -> mean/std of each metric, mean fit/predict time, total CPU seconds
+        folds: one dict per (model, fold) fit
+        wall_seconds: elapsed time of the whole parallel run
+    """
+    fold_dir = tempfile.mkdtemp(prefix='cv-folds-')
+    try:
+        paths = prepare_folds(X, y, n_splits, fold_dir, random_state)
+        tasks = [(name, estimator, fold, path)
+                 for name, estimator in models.items()
+                 for fold, path in enumerate(paths)]
+
+        start = time.perf_counter()
+        folds = Parallel(n_jobs=n_jobs, backend='loky')(delayed(fit_fold)(*task) for task in tasks)
+        wall_seconds = time.perf_counter() - start
+    finally:
+        shutil.rmtree(fold_dir, ignore_errors=True)
+
+    results = {}
+    for name in models:
+        rows = [row for row in folds if row['model'] == name]
+        summary = {}
+        for metric in METRICS:
+            values = np.array([row[metric] for row in rows])
+            summary[metric] = float(values.mean())
+            summary[f'{metric}_std'] = float(values.std())
+        summary['fit_seconds'] = float(np.mean([row['fit_seconds'] for row in rows]))
+        summary['predict_seconds'] = float(np.mean([row['predict_seconds'] for row in rows]))
+        summary['cpu_seconds'] = float(sum(row['fit_seconds'] + row['predict_seconds'] for row in rows))
+        results[name] = summary
+    return results, folds, wall_seconds
+
+
+def _candidate_key(family, params):
+    return f'{family}|{json.dumps(params, sort_keys=True, default=str)}'
+
+
+def successive_halving_search(estimators, param_grids, X, y, search_dir, n_splits=5, n_jobs=-1,
+                              factor=3, min_samples=100, random_state=42):
+    """
+    Successive halving over a hyperparameter grid per model family
+
+    Every configuration starts on a small subset of each fold's training rows; after
+    each rung only the best 1/factor of each family (by mean CV accuracy) continue,
+    with factor times more rows, until the last rung uses the full folds.
+
+    Scaled folds are cached in search_dir and reused while the data is unchanged.
+    Every finished fit is recorded in search_dir/checkpoint.json, so an interrupted
+    search resumes where it stopped.
+
+    Returns:
+        best: family -> {'params', 'accuracy', 'n_samples'}
+        rungs: one dict per rung with the number of configurations, rows and seconds
+    """
+    paths, fingerprint = cached_folds(X, y, n_splits, os.path.join(search_dir, 'folds'), random_state)
+    full_samples = min(len(joblib.load(path, mmap_mode='r')['y_train']) for path in paths)
+
+    candidates = {family: [dict(params) for params in ParameterGrid(param_grids[family])]
+                  for family in estimators}
+    n_rungs = max(1, math.ceil(math.log(max(len(grid) for grid in candidates.values()), factor)) + 1)
+
+    checkpoint_path = os.path.join(search_dir, 'checkpoint.json')
+    done = {}
+    if os.path.exists(checkpoint_path):
+        with open(checkpoint_path) as f:
+            checkpoint = json.load(f)
+        if checkpoint.get('fingerprint') == fingerprint:
+            done = checkpoint['results']
+            print(f"  ↻ Resuming hyperparameter search: {len(done)} fits already done")
+
+    def save_checkpoint():
+        tmp_path = checkpoint_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'results': done}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    rungs = []
+    alive = candidates
+    for rung in range(n_rungs):
+        n_samples = max(min_samples, full_samples // factor ** (n_rungs - 1 - rung))
+        n_samples = min(n_samples, full_samples)
+        tasks = []
+        for family, grid in alive.items():
+            for params in grid:
+                for fold, path in enumerate(paths):
+                    task_key = f'{_candidate_key(family, params)}|{fold}|{n_samples}'
+                    if task_key not in done:
+                        tasks.append((task_key, family, params, fold, path))
+
+        start = time.perf_counter()
+        if tasks:
+            results = Parallel(n_jobs=n_jobs, backend='loky', return_as='generator')(
+                delayed(fit_fold)(family, estimators[family], fold, path, params, n_samples)
+                for _, family, params, fold, path in tasks
+            )
+            for (task_key, *_), result in zip(tasks, results):
+                done[task_key] = result['accuracy']
+                save_checkpoint()
+        seconds = time.perf_counter() - start
+
+        # Keep the best 1/factor of every family for the next rung
+        scores = {}
+        for family, grid in alive.items():
+            scores[family] = [
+                (float(np.mean([done[f'{_candidate_key(family, params)}|{fold}|{n_samples}']
+                                for fold in range(len(paths))])), params)
+                for params in grid
+            ]
+        rungs.append({'rung': rung, 'n_samples': n_samples, 'fits': len(tasks), 'seconds': seconds,
+                      'configurations': sum(len(grid) for grid in alive.values())})
+
+        if rung == n_rungs - 1:
+            break
+        alive = {family: [params for _, params in sorted(ranked, key=lambda item: -item[0])
+                          [:max(1, math.ceil(len(ranked) / factor))]]
+                 for family, ranked in scores.items()}
+
+    best = {}
+    for family, ranked in scores.items():
+        accuracy, params = max(ranked, key=lambda item: item[0])
+        best[family] = {'params': params, 'accuracy': accuracy, 'n_samples': n_samples}
+    return best, rungs
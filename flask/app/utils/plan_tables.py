@@ -0,0 +1,36 @@
+"""
+Plan Lookup Tables for Diabetes Predictor
+Helpers to precompute rule-based plan sections once per threshold bucket
+"""
+
+from itertools import product
+from types import MappingProxyType
+
+
+def freeze(value):
+    """Recursively turn dicts/lists into read-only mappings/tuples so plan sections can be shared"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def build_table(bucket_key, build_section, grid):
+    """
+    Enumerate every bucket combination once
+
+    Args:
+        bucket_key: function(*inputs) -> hashable key of threshold comparisons
+        build_section: function(*inputs) -> dict with the bucket-dependent plan parts
+        grid: one list of representative values per input, covering every bucket
+
+    Returns:
+        dict: key -> frozen plan section
+    """
+    table = {}
+    for inputs in product(*grid):
+        key = bucket_key(*inputs)
+        if key not in table:
+            table[key] = freeze(build_section(*inputs))
+    return table
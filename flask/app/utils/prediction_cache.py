@@ -0,0 +1,70 @@
+"""
+Prediction Cache for Diabetes Predictor
+Bounded LRU + TTL cache for risk scores and the plans generated from them
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """
+    Entries are keyed on the exact inputs and tagged with a generation
+    (model version + RL calibration version). When the generation changes
+    every entry is dropped, so a new model or a refit calibration is never served stale.
+
+    Cached values are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, max_size=1024, ttl_seconds=300):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def _check_generation(self, generation):
+        if generation != self._generation:
+            if self._entries:
+                self._stats['invalidations'] += 1
+            self._entries.clear()
+            self._generation = generation
+
+    def get(self, key, generation):
+        """Cached value for key, or None on a miss"""
+        with self._lock:
+            self._check_generation(generation)
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[1]
+
+    def set(self, key, generation, value):
+        with self._lock:
+            self._check_generation(generation)
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = (stats['hits'] / lookups * 100) if lookups else 0
+        stats['max_size'] = self.max_size
+        stats['ttl_seconds'] = self.ttl_seconds
+        return stats
@@ -0,0 +1,163 @@
+"""
+Production Training Data for Diabetes Predictor
+Exports the health records users have labelled through prediction feedback as a
+CSV in the training datasets' format, streaming both the feedback log and the
+health_records table in chunks so memory stays bounded on the app host: labels are
+spooled to a temporary SQLite file and merge-joined with the records in id order
+"""
+
+import csv
+import os
+import sqlite3
+import tempfile
+
+from app.models import db, HealthRecord
+from rl_event_log import RLEventLog, read_archive
+
+# Training column -> HealthRecord column; the other features are not stored with the record
+RECORD_FEATURES = {'Glucose': 'glucose', 'BloodPressure': 'bp_systolic', 'Insulin': 'insulin',
+                   'BMI': 'bmi', 'Age': 'age'}
+
+
+def record_feature_row(record, feature_names, fill_values=None):
+    """
+    Model input for a HealthRecord (or a query row with its column names), in feature_names order
+    Features the record does not store take fill_values[name], or None (missing) when not given
+    """
+    fill_values = fill_values or {}
+    return [float(getattr(record, RECORD_FEATURES[name])) if name in RECORD_FEATURES
+            else fill_values.get(name) for name in feature_names]
+
+
+class FeedbackLabels:
+    """
+    Outcome reported for each record, kept in a temporary SQLite file rather than in memory
+        by_id    record_id -> outcome, for feedback that carries the record id
+        by_time  (user_id, timestamp) -> outcome, for older feedback that predates record_id
+    Later feedback for the same record replaces earlier feedback
+    """
+
+    def __init__(self, directory=None):
+        fd, self.path = tempfile.mkstemp(prefix='feedback-labels-', suffix='.db', dir=directory)
+        os.close(fd)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute('PRAGMA journal_mode=OFF')
+        self._conn.execute('PRAGMA synchronous=OFF')
+        self._conn.executescript('''
+            CREATE TABLE by_id (record_id INTEGER PRIMARY KEY, outcome INTEGER NOT NULL);
+            CREATE TABLE by_time (user_id INTEGER, timestamp TEXT, outcome INTEGER NOT NULL,
+                                  PRIMARY KEY (user_id, timestamp));
+        ''')
+        self._has_timestamps = False
+
+    def add(self, events):
+        """Insert a chunk of feedback payloads, in the order they were recorded"""
+        by_id, by_time = [], []
+        for payload in events:
+            prediction_data = payload['prediction_data']
+            outcome = int(payload['actual_outcome'])
+            if prediction_data.get('record_id') is not None:
+                by_id.append((prediction_data['record_id'], outcome))
+            else:
+                by_time.append((prediction_data.get('user_id'), prediction_data.get('timestamp'), outcome))
+        self._conn.executemany('INSERT OR REPLACE INTO by_id VALUES (?, ?)', by_id)
+        self._conn.executemany('INSERT OR REPLACE INTO by_time VALUES (?, ?, ?)', by_time)
+        self._conn.commit()
+        self._has_timestamps = self._has_timestamps or bool(by_time)
+
+    def by_record_id(self):
+        """Stream (record_id, outcome) in record id order"""
+        return self._conn.cursor().execute('SELECT record_id, outcome FROM by_id ORDER BY record_id')
+
+    def by_timestamp(self, user_id, timestamp):
+        if not self._has_timestamps:
+            return None
+        row = self._conn.execute('SELECT outcome FROM by_time WHERE user_id = ? AND timestamp = ?',
+                                 (user_id, timestamp)).fetchone()
+        return row[0] if row else None
+
+    def __len__(self):
+        return self._conn.execute('SELECT (SELECT COUNT(*) FROM by_id) + (SELECT COUNT(*) FROM by_time)').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _chunks(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def load_feedback_labels(log_file, archive_file=None, chunk_size=1000, directory=None):
+    """
+    FeedbackLabels from the archive and then the live log (latest feedback wins)
+    Events are copied chunk_size at a time into a temporary SQLite file in directory
+    """
+    labels = FeedbackLabels(directory)
+    try:
+        if archive_file and os.path.exists(archive_file):
+            archived = (event['payload'] for event in read_archive(archive_file, kind='feedback'))
+            for chunk in _chunks(archived, chunk_size):
+                labels.add(chunk)
+
+        event_log = RLEventLog(log_file)
+        live = (payload for _, payload in event_log.iter_events('feedback', chunk_size))
+        for chunk in _chunks(live, chunk_size):
+            labels.add(chunk)
+    except Exception:
+        labels.close()
+        raise
+    return labels
+
+
+def export_labelled_records(path, feature_names, labels, target='Outcome', chunk_size=1000):
+    """
+    Write every health record with a feedback label to `path` as CSV (feature_names + target)
+    Records are read chunk_size rows at a time (yield_per) in id order and merged with the
+    labels streamed in the same order, so neither side is held in memory
+
+    Features that are not stored are left empty rather than given a fixed value, so
+    build_dataset imputes them from the other training rows (and reports the count)
+
+    Returns:
+        dict with the number of records scanned and exported
+    """
+    columns = [HealthRecord.id, HealthRecord.user_id, HealthRecord.created_at] + \
+        [getattr(HealthRecord, column) for column in RECORD_FEATURES.values()]
+    query = db.session.query(*columns).order_by(HealthRecord.id).yield_per(chunk_size)
+
+    scanned = exported = 0
+    by_id = labels.by_record_id()
+    label = next(by_id, None)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(list(feature_names) + [target])
+        for row in query:
+            scanned += 1
+            # Labels for records that no longer exist are passed over
+            while label is not None and label[0] < row.id:
+                label = next(by_id, None)
+            outcome = label[1] if label is not None and label[0] == row.id else None
+            if outcome is None and row.created_at is not None:
+                outcome = labels.by_timestamp(row.user_id, row.created_at.isoformat())
+            if outcome is None:
+                continue
+            writer.writerow(record_feature_row(row, feature_names) + [outcome])
+            exported += 1
+    os.replace(tmp_path, path)
+    return {'records_scanned': scanned, 'records_exported': exported, 'labels': len(labels)}
@@ -0,0 +1,380 @@
+"""
+Write-behind Queue for Prediction Side Effects
+Journals each prediction's HealthRecord + Gamification writes to a local file,
+returns immediately, and lets a background thread commit them in groups
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy import case, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, HealthRecord, Gamification, IdSequence
+
+# Columns copied from a HealthRecord into its journal entry
+RECORD_FIELDS = ['user_id', 'glucose', 'insulin', 'bmi', 'age', 'bp_systolic', 'bp_diastolic',
+                 'family_history', 'prediction_result', 'model_probability', 'risk_level']
+
+
+class IdAllocator:
+    """
+    Hands out HealthRecord ids before the row exists
+    Ids are reserved from the database in blocks, so several processes never overlap
+    """
+
+    def __init__(self, app, name='health_records', block_size=100):
+        self.app = app
+        self.name = name
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def _reserve_block(self, size):
+        with self.app.app_context():
+            max_id = select(func.coalesce(func.max(HealthRecord.id), 0) + 1).scalar_subquery()
+            with db.engine.begin() as conn:
+                if conn.execute(select(IdSequence.name).where(IdSequence.name == self.name)).first() is None:
+                    try:
+                        with conn.begin_nested():
+                            conn.execute(IdSequence.__table__.insert().values(name=self.name, next_value=1))
+                    except IntegrityError:
+                        pass  # another process created it first
+
+                # Never hand out ids below rows that were inserted without a reservation
+                start = case((IdSequence.next_value >= max_id, IdSequence.next_value), else_=max_id)
+                end = conn.execute(
+                    update(IdSequence)
+                    .where(IdSequence.name == self.name)
+                    .values(next_value=start + size)
+                    .returning(IdSequence.next_value)
+                ).scalar_one()
+        return end - size, end
+
+    def reserve(self, count=1):
+        """List of count fresh ids"""
+        ids = []
+        with self._lock:
+            while len(ids) < count:
+                if self._next >= self._end:
+                    self._next, self._end = self._reserve_block(max(self.block_size, count - len(ids)))
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+        return ids
+
+
+class WriteBehindQueue:
+    """
+    Journal layout in journal_dir:
+        journal-<pid>-<token>.jsonl           entries being appended by this process
+        journal-<pid>-<token>-<ns>.segment    rotated entries waiting to be committed
+        journal-<pid>-<token>-<ns>.failed     segments set aside after max_attempts failed commits
+        journal-<pid>-<token>-<ns>.conflict   entries whose record id exists with different contents
+
+    <token> is the process start time (a random id where that is not available), so a
+    reused pid never writes to, or is mistaken for, a dead process's files; <ns> is the
+    rotation time in nanoseconds.
+
+    Every interval the writer rotates the journal and commits each segment in one
+    transaction, deleting it afterwards. Segments left behind by a crash (or a
+    failed commit) are replayed; entries whose record id already exists with the same
+    contents are skipped, and ones that disagree with the stored row are set aside.
+    """
+
+    def __init__(self, app, journal_dir, interval_ms=50, block_size=100, fsync=True, max_attempts=5):
+        self.app = app
+        self.journal_dir = journal_dir
+        self.interval = interval_ms / 1000.0
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self.ids = IdAllocator(app, block_size=block_size)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = set()
+        self._failures = {}
+        self._journal = None
+        self._pid = None
+        self._token = None
+        self._thread = None
+        self._stats = {'queued': 0, 'committed': 0, 'replayed': 0, 'skipped': 0, 'batches': 0, 'errors': 0,
+                       'quarantined': 0, 'conflicts': 0}
+        os.makedirs(journal_dir, exist_ok=True)
+
+    # ----- request side -----
+
+    def _ensure_started(self):
+        # Per process: forked workers open their own journal and writer thread
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._token = _process_start(self._pid) or uuid.uuid4().hex
+        self._journal = open(self._journal_path(), 'a', encoding='utf-8')
+        self._pending = set()
+        self._failures = {}
+        self._thread = threading.Thread(target=self._run, name='prediction-write-behind', daemon=True)
+        self._thread.start()
+
+    def _journal_path(self):
+        return os.path.join(self.journal_dir, f'journal-{self._pid}-{self._token}.jsonl')
+
+    def reserve_ids(self, count=1):
+        return self.ids.reserve(count)
+
+    def enqueue_prediction(self, health_record, points=20):
+        """Journal a HealthRecord (with its id and created_at already set) and its gamification update"""
+        entry = {
+            'record_id': health_record.id,
+            'created_at': health_record.created_at.isoformat(),
+            'record': {field: getattr(health_record, field) for field in RECORD_FIELDS},
+            'points': points,
+        }
+        line = json.dumps(entry) + '\n'
+        with self._lock:
+            self._ensure_started()
+            self._journal.write(line)
+            self._journal.flush()
+            if self.fsync:
+                os.fsync(self._journal.fileno())
+            self._pending.add(health_record.id)
+            self._stats['queued'] += 1
+        self._wakeup.set()
+
+    def is_pending(self, record_id):
+        with self._lock:
+            return record_id in self._pending
+
+    def pending_elsewhere(self, record_id):
+        """
+        Whether a running process (this one or another worker) still has record_id
+        journaled but not committed; is_pending only knows this process's queue
+        """
+        needle = f'"record_id": {record_id},'
+        # Journals before segments: a journal rotated away mid-scan shows up as a segment
+        for pattern in ('journal-*.jsonl', 'journal-*.segment'):
+            for path in glob.glob(os.path.join(self.journal_dir, pattern)):
+                if not _owner_alive(path):
+                    continue
+                try:
+                    with open(path, encoding='utf-8') as f:
+                        if any(line.startswith('{' + needle) for line in f):
+                            return True
+                except FileNotFoundError:
+                    continue  # rotated or committed in the meantime
+        return False
+
+    def flush(self, timeout=5.0):
+        """Wait until everything queued so far has been committed"""
+        waited = 0.0
+        while waited < timeout:
+            with self._lock:
+                if not self._pending:
+                    return True
+            self._wakeup.set()
+            time.sleep(self.interval)
+            waited += self.interval
+        return False
+
+    # ----- writer side -----
+
+    def _rotate(self):
+        """Move the live journal aside as a segment; returns its path or None"""
+        with self._lock:
+            if self._journal is None or self._journal.tell() == 0:
+                return None
+            self._journal.close()
+            segment = _segment_path(self._journal_path())
+            os.replace(self._journal_path(), segment)
+            self._journal = open(self._journal_path(), 'a', encoding='utf-8')
+            return segment
+
+    @staticmethod
+    def _read_segment(path):
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # Only the last line can be torn, by a crash mid-append; it was never acknowledged
+                    print(f"⚠ Skipping unreadable journal line in {os.path.basename(path)}")
+        return entries
+
+    def _apply_segment(self, path):
+        """Commit all entries of one segment in a single transaction"""
+        entries = self._read_segment(path)
+
+        record_ids = [entry['record_id'] for entry in entries]
+        applied = 0
+        conflicts = []
+        try:
+            existing = {record.id: record for record in HealthRecord.query.filter(HealthRecord.id.in_(record_ids))}
+            for entry in entries:
+                if entry['record_id'] in existing:
+                    # Same id, same row: an earlier attempt already committed it
+                    if not _same_record(existing[entry['record_id']], entry):
+                        conflicts.append(entry)
+                    continue
+                db.session.add(HealthRecord(
+                    id=entry['record_id'],
+                    created_at=datetime.fromisoformat(entry['created_at']),
+                    **entry['record']
+                ))
+                gamification = Gamification.query.filter_by(user_id=entry['record']['user_id']).first()
+                if gamification:
+                    gamification.record_prediction(entry['points'])
+                applied += 1
+            db.session.commit()
+        except Exception:
+            # Nothing of a failed segment may stay in the session for the next segment's commit
+            db.session.rollback()
+            raise
+
+        if conflicts:
+            self._set_aside_conflicts(path, conflicts)
+        os.remove(path)
+        with self._lock:
+            self._pending.difference_update(record_ids)
+            self._stats['committed'] += applied
+            self._stats['skipped'] += len(entries) - applied - len(conflicts)
+            self._stats['conflicts'] += len(conflicts)
+            self._stats['batches'] += 1
+        return applied
+
+    def _set_aside_conflicts(self, path, entries):
+        """Keep entries that disagree with the committed row for inspection instead of dropping them"""
+        conflict = path[:-len('.segment')] + '.conflict'
+        with open(conflict, 'a', encoding='utf-8') as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + '\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        print(f"✗ {len(entries)} journaled prediction(s) differ from the stored record with the same id, "
+              f"moved to {os.path.basename(conflict)}")
+
+    def _quarantine(self, path):
+        """Set a segment that keeps failing aside as .failed so later segments are not held up behind it"""
+        record_ids = [entry['record_id'] for entry in self._read_segment(path)]
+        failed = path[:-len('.segment')] + '.failed'
+        os.replace(path, failed)
+        print(f"✗ Write-behind segment failed {self.max_attempts} times, moved to {os.path.basename(failed)}")
+        with self._lock:
+            self._pending.difference_update(record_ids)
+            self._stats['quarantined'] += 1
+
+    def _own_segments(self):
+        return sorted(glob.glob(os.path.join(self.journal_dir, f'journal-{self._pid}-{self._token}-*.segment')))
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            # Group everything that arrives within one interval into the same transaction
+            time.sleep(self.interval)
+            self._rotate()
+            with self.app.app_context():
+                for segment in self._own_segments():
+                    try:
+                        self._apply_segment(segment)
+                        self._failures.pop(segment, None)
+                    except Exception as e:
+                        with self._lock:
+                            self._stats['errors'] += 1
+                        self._failures[segment] = self._failures.get(segment, 0) + 1
+                        if self._failures[segment] >= self.max_attempts:
+                            self._failures.pop(segment)
+                            self._quarantine(segment)
+                        else:
+                            print(f"⚠ Write-behind commit failed, will retry: {e}")
+                            self._wakeup.set()
+                db.session.remove()
+
+    def replay(self):
+        """
+        Commit journals left behind by processes that are no longer running
+        Call once at startup, inside an app context
+        """
+        for journal in glob.glob(os.path.join(self.journal_dir, 'journal-*.jsonl')):
+            if _owner_alive(journal):
+                continue
+            os.replace(journal, _segment_path(journal))
+
+        for segment in sorted(glob.glob(os.path.join(self.journal_dir, 'journal-*.segment'))):
+            if _owner_alive(segment):
+                continue
+            try:
+                replayed = self._apply_segment(segment)
+                self._stats['replayed'] += replayed
+                if replayed:
+                    print(f"✓ Replayed {replayed} journaled prediction writes from {os.path.basename(segment)}")
+            except Exception as e:
+                print(f"⚠ Could not replay {segment}: {e}")
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = len(self._pending)
+        return stats
+
+
+def _same_record(record, entry):
+    """Whether a stored HealthRecord holds exactly what a journal entry would have inserted"""
+    if record.created_at != datetime.fromisoformat(entry['created_at']):
+        return False
+    return all(_same_value(getattr(record, field), entry['record'][field], HealthRecord.__table__.c[field])
+               for field in RECORD_FIELDS)
+
+
+def _same_value(stored, journaled, column):
+    if stored == journaled or stored is None or journaled is None:
+        return stored == journaled
+    # The database may have coerced the value to the column type (a float in an Integer column)
+    python_type = column.type.python_type
+    return stored == (round(journaled) if python_type is int else python_type(journaled))
+
+
+def _segment_path(journal):
+    # Unique per rotation: the journal name is unique per process and the suffix per call
+    return f"{journal[:-len('.jsonl')]}-{time.time_ns():020d}.segment"
+
+
+def _process_start(pid):
+    """Start time of a running process (clock ticks since boot) from /proc, or None"""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name in parentheses may contain spaces; fields after it are fixed
+            return f.read().rsplit(')', 1)[1].split()[19]
+    except (OSError, IndexError):
+        return None
+
+
+def _owner_alive(path):
+    """Whether the process that wrote a journal or segment is still running"""
+    parts = os.path.basename(path).split('.')[0].split('-')[1:]
+    pid = int(parts[0])
+    # Files from before start tokens were recorded carry only the pid (and a counter)
+    token = parts[1] if len(parts) == (2 if path.endswith('.jsonl') else 3) else None
+    if not _pid_alive(pid):
+        return False
+    if token is None:
+        return pid != os.getpid()
+    start = _process_start(pid)
+    # Without /proc the token is a random id that cannot be checked; fall back to the pid
+    return start is None or start == token
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
@@ -0,0 +1,103 @@
+"""
+Contextual Bandit for Intervention Recommendations
+Thompson sampling over preventive measures, with statistics kept per patient segment
+"""
+
+import numpy as np
+
+INTERVENTIONS = ['exercise', 'diet_change', 'stress_management', 'sleep_improvement', 'medication', 'hydration']
+
+# Segment edges: glucose (normal / prediabetic / diabetic range) and BMI (normal / overweight / obese)
+GLUCOSE_EDGES = [100, 126]
+BMI_EDGES = [25, 30]
+RISK_LEVELS = ['Low', 'High']
+
+N_SEGMENTS = (len(GLUCOSE_EDGES) + 1) * (len(BMI_EDGES) + 1) * len(RISK_LEVELS)
+
+
+def segment_index(glucose, bmi, risk_level):
+    """Segment of a patient context, or None when the context is unknown"""
+    if glucose is None or bmi is None or risk_level not in RISK_LEVELS:
+        return None
+    glucose_bucket = int(np.searchsorted(GLUCOSE_EDGES, glucose, side='right'))
+    bmi_bucket = int(np.searchsorted(BMI_EDGES, bmi, side='right'))
+    return (glucose_bucket * (len(BMI_EDGES) + 1) + bmi_bucket) * len(RISK_LEVELS) + RISK_LEVELS.index(risk_level)
+
+
+class InterventionBandit:
+    """
+    Sufficient statistics, one cell per (segment, intervention):
+        reward    sum of effectiveness scores (0-1), used as fractional Beta successes
+        trials    number of recorded outcomes
+        glucose   sum of glucose reductions
+    plus the same sums over all segments.
+
+    An intervention's posterior in a segment is a Beta distribution centred on its
+    global rate with `pooling` pseudo-trials, so sparse segments borrow from the
+    whole population. The global rate itself starts from prior_rates with
+    prior_strength pseudo-trials. Updates are O(1); ranking draws one Beta sample
+    per intervention in a single vectorized call.
+    """
+
+    def __init__(self, prior_rates, prior_strength=5.0, pooling=10.0, seed=None):
+        self.prior_rates = np.array([prior_rates[name] for name in INTERVENTIONS], dtype=float)
+        self.prior_strength = prior_strength
+        self.pooling = pooling
+        self.reward = np.zeros((N_SEGMENTS, len(INTERVENTIONS)))
+        self.trials = np.zeros((N_SEGMENTS, len(INTERVENTIONS)))
+        self.glucose = np.zeros((N_SEGMENTS, len(INTERVENTIONS)))
+        self.global_reward = np.zeros(len(INTERVENTIONS))
+        self.global_trials = np.zeros(len(INTERVENTIONS))
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, measure_type, effectiveness_score, glucose_reduction, segment):
+        arm = INTERVENTIONS.index(measure_type)
+        reward = min(max(float(effectiveness_score), 0.0), 1.0)
+        self.global_reward[arm] += reward
+        self.global_trials[arm] += 1
+        if segment is not None:
+            self.reward[segment, arm] += reward
+            self.trials[segment, arm] += 1
+            self.glucose[segment, arm] += glucose_reduction
+
+    def posterior(self, segment):
+        """(alpha, beta) arrays over interventions for one segment (None = global only)"""
+        global_rate = ((self.prior_strength * self.prior_rates + self.global_reward)
+                       / (self.prior_strength + self.global_trials))
+        alpha = self.pooling * global_rate
+        beta = self.pooling * (1 - global_rate)
+        if segment is not None:
+            alpha = alpha + self.reward[segment]
+            beta = beta + self.trials[segment] - self.reward[segment]
+        return alpha, beta
+
+    def rank(self, segment, explore=True):
+        """
+        Intervention scores for a segment: a Thompson sample when exploring,
+        the posterior mean otherwise. Returns (scores, posterior_means)
+        """
+        alpha, beta = self.posterior(segment)
+        means = alpha / (alpha + beta)
+        scores = self._rng.beta(alpha, beta) if explore else means
+        return scores, means
+
+    def segment_glucose_reduction(self, segment):
+        """Average glucose reduction per intervention within a segment (NaN where untried)"""
+        trials = self.trials[segment]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(trials > 0, self.glucose[segment] / trials, np.nan)
+
+    def state(self):
+        return {
+            'reward': self.reward.tolist(),
+            'trials': self.trials.tolist(),
+            'glucose': self.glucose.tolist(),
+            'global_reward': self.global_reward.tolist(),
+            'global_trials': self.global_trials.tolist(),
+        }
+
+    def load_state(self, state):
+        if np.shape(state['trials']) != self.trials.shape:
+            return  # segment layout changed; start counting again
+        for key in ('reward', 'trials', 'glucose', 'global_reward', 'global_trials'):
+            setattr(self, key, np.asarray(state[key], dtype=float))
@@ -0,0 +1,102 @@
+"""
+Probability Calibration for the RL Feedback System
+Binned isotonic calibration of the model's diabetes probability, learned from user feedback
+"""
+
+import numpy as np
+
+
+class BinnedCalibrator:
+    """
+    Feedback is counted into n_bins equal-width probability bins (O(1) per event).
+    fit() turns the counts into a monotone map:
+        1. per-bin outcome rate, shrunk towards the bin centre by prior_strength
+           pseudo-observations so sparse bins stay close to the identity
+        2. pool-adjacent-violators over the bins, weighted by their counts
+    Until min_samples feedbacks have arrived the map is the identity.
+
+    The fitted map is an immutable (knots, values) pair; apply() calibrates any
+    number of probabilities with a single np.interp call.
+    """
+
+    def __init__(self, n_bins=20, prior_strength=5.0, min_samples=30):
+        self.n_bins = n_bins
+        self.prior_strength = prior_strength
+        self.min_samples = min_samples
+        self.centers = (np.arange(n_bins) + 0.5) / n_bins
+        self.positives = np.zeros(n_bins)
+        self.totals = np.zeros(n_bins)
+        self.updates = 0  # bumped by every update; lets the refitter skip unchanged counts
+        self.version = 0  # bumped by every fit that changes the map
+        self.fitted_updates = 0
+        self._map = self._identity()
+
+    def _identity(self):
+        knots = np.array([0.0, 1.0])
+        return knots, knots.copy()
+
+    def update(self, probability, outcome):
+        index = min(max(int(probability * self.n_bins), 0), self.n_bins - 1)
+        self.positives[index] += outcome
+        self.totals[index] += 1
+        self.updates += 1
+
+    def fit(self):
+        """Rebuild the map from the current counts; returns True if it changed"""
+        updates = self.updates
+        if updates == self.fitted_updates:
+            return False
+        if self.totals.sum() < self.min_samples:
+            knots, values = self._identity()
+        else:
+            weights = self.totals + self.prior_strength
+            rates = (self.positives + self.prior_strength * self.centers) / weights
+            # Below the first and above the last bin centre np.interp holds the end values
+            knots, values = self.centers.copy(), _pool_adjacent_violators(rates, weights)
+        knots.setflags(write=False)
+        values.setflags(write=False)
+        self._map = (knots, values)
+        self.fitted_updates = updates
+        self.version += 1
+        return True
+
+    def apply(self, probabilities):
+        knots, values = self._map
+        return np.interp(probabilities, knots, values)
+
+    def inverse(self, calibrated):
+        """Smallest raw probability whose calibrated value reaches `calibrated` (the map is non-decreasing)"""
+        knots, values = self._map
+        if calibrated <= values[0]:
+            return 0.0
+        if calibrated > values[-1]:
+            return 1.0
+        upper = int(np.searchsorted(values, calibrated, side='left'))
+        lower = upper - 1
+        fraction = (calibrated - values[lower]) / (values[upper] - values[lower])
+        return float(knots[lower] + fraction * (knots[upper] - knots[lower]))
+
+    def state(self):
+        return {'positives': self.positives.tolist(), 'totals': self.totals.tolist()}
+
+    def load_state(self, state):
+        if len(state['totals']) != self.n_bins:
+            return  # bin layout changed; start counting again
+        self.positives = np.asarray(state['positives'], dtype=float)
+        self.totals = np.asarray(state['totals'], dtype=float)
+        self.updates += 1
+
+
+def _pool_adjacent_violators(values, weights):
+    """Weighted non-decreasing least-squares fit of values"""
+    blocks = []  # [mean, weight, length]
+    for value, weight in zip(values, weights):
+        blocks.append([value, weight, 1])
+        while len(blocks) > 1 and blocks[-2][0] > blocks[-1][0]:
+            value, weight, length = blocks.pop()
+            previous = blocks[-1]
+            total = previous[1] + weight
+            previous[0] = (previous[0] * previous[1] + value * weight) / total
+            previous[1] = total
+            previous[2] += length
+    return np.repeat([block[0] for block in blocks], [block[2] for block in blocks])
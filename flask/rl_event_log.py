@@ -0,0 +1,220 @@
+"""
+Append-only Event Log for the RL Feedback System
+One row per feedback/intervention event plus a small snapshot of the counters,
+so recording an event costs one insert no matter how long the system has run
+"""
+
+import gzip
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+class RLEventLog:
+    """
+    SQLite-backed log:
+        events    one row per recorded event, never rewritten
+        snapshot  counters as of last_event_id, replaced atomically on compaction
+
+    State is recovered by loading the snapshot and replaying the events after it.
+    Several worker processes can share one file: each appends its own events and
+    folds in everyone else's, in id order, so all of them reach the same counters.
+    """
+
+    def __init__(self, path='rl_feedback.db'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        # WAL lets every worker process read while one of them appends
+        self._enable_wal()
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS snapshot (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                last_event_id INTEGER NOT NULL,
+                state TEXT NOT NULL,
+                created_at TEXT NOT NULL
+            );
+        ''')
+
+    def _enable_wal(self, attempts=50):
+        # Switching journal mode skips the busy timeout, so retry while another worker holds the file
+        for _ in range(attempts):
+            try:
+                if self._conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+                    self._conn.execute('PRAGMA journal_mode=WAL')
+                return
+            except sqlite3.OperationalError:
+                time.sleep(0.1)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+
+    def append(self, kind, payload):
+        """Append one event; returns its id"""
+        with self._lock:
+            cursor = self._conn.execute(
+                'INSERT INTO events (kind, payload, created_at) VALUES (?, ?, ?)',
+                (kind, json.dumps(payload), datetime.now().isoformat())
+            )
+            return cursor.lastrowid
+
+    def seed(self, kind, payloads):
+        """Append payloads only if the log is still empty (one process wins); returns True if written"""
+        now = datetime.now().isoformat()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                if self._conn.execute('SELECT 1 FROM events LIMIT 1').fetchone() is not None:
+                    self._conn.execute('ROLLBACK')
+                    return False
+                self._conn.executemany(
+                    'INSERT INTO events (kind, payload, created_at) VALUES (?, ?, ?)',
+                    [(kind, json.dumps(payload), now) for payload in payloads]
+                )
+                self._conn.execute('COMMIT')
+                return True
+            except Exception:
+                self._rollback()
+                raise
+
+    def events_after(self, event_id, chunk_size=1000):
+        """Yield (id, kind, payload) for every event newer than event_id, oldest first, chunk_size rows per read"""
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, kind, payload FROM events WHERE id > ? ORDER BY id LIMIT ?', (event_id, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, kind, payload in rows:
+                yield row_id, kind, json.loads(payload)
+            event_id = rows[-1][0]
+
+    def iter_events(self, kind, chunk_size=1000):
+        """Yield (id, payload) for every event of one kind, oldest first, reading chunk_size rows at a time"""
+        last_id = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT id, payload FROM events WHERE kind = ? AND id > ? ORDER BY id LIMIT ?',
+                    (kind, last_id, chunk_size)
+                ).fetchall()
+            if not rows:
+                return
+            for row_id, payload in rows:
+                yield row_id, json.loads(payload)
+            last_id = rows[-1][0]
+
+    def recent_events(self, kind, limit, up_to):
+        """The newest `limit` events of one kind with id <= up_to, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT id, kind, payload FROM events WHERE kind = ? AND id <= ? ORDER BY id DESC LIMIT ?',
+                (kind, up_to, limit)
+            ).fetchall()
+        return [(row_id, kind, json.loads(payload)) for row_id, kind, payload in reversed(rows)]
+
+    def archive(self, archive_path, through_event_id, keep_feedback):
+        """
+        Move events already covered by the snapshot (id <= through_event_id) into a gzip
+        JSONL archive, keeping the newest keep_feedback feedback events for the in-memory window
+
+        Each call appends one gzip member, so the archive stays a single streamable file.
+        Runs under SQLite's write lock: concurrent workers archive one at a time and a crash
+        between the file append and the delete only repeats rows, which read_archive skips.
+        Returns the number of events archived.
+        """
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                row = self._conn.execute(
+                    'SELECT id FROM events WHERE kind = ? AND id <= ? ORDER BY id DESC LIMIT 1 OFFSET ?',
+                    ('feedback', through_event_id, keep_feedback - 1)
+                ).fetchone() if keep_feedback > 0 else None
+                # Archive a contiguous id range so the archive file stays in id order
+                cutoff = row[0] if row is not None else (0 if keep_feedback > 0 else through_event_id + 1)
+                rows = self._conn.execute(
+                    'SELECT id, kind, payload, created_at FROM events WHERE id < ? ORDER BY id', (cutoff,)
+                ).fetchall()
+                if rows:
+                    with gzip.open(archive_path, 'at', encoding='utf-8') as f:
+                        for row_id, kind, payload, created_at in rows:
+                            f.write(f'{{"id": {row_id}, "kind": {json.dumps(kind)}, '
+                                    f'"created_at": {json.dumps(created_at)}, "payload": {payload}}}\n')
+                    self._conn.execute('DELETE FROM events WHERE id < ?', (cutoff,))
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._rollback()
+                raise
+        return len(rows)
+
+    def _rollback(self):
+        # SQLite may already have rolled back (e.g. disk full); never let that hide the original error
+        if self._conn.in_transaction:
+            self._conn.execute('ROLLBACK')
+
+    def archived_through(self):
+        """Highest event id moved out of the log (archive removes a contiguous range from the start); 0 if none"""
+        with self._lock:
+            oldest = self._conn.execute('SELECT MIN(id) FROM events').fetchone()[0]
+            if oldest is not None:
+                return oldest - 1
+            # Everything was archived: AUTOINCREMENT remembers the last id handed out
+            row = self._conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'events'").fetchone()
+            return row[0] if row is not None else 0
+
+    def latest_event_id(self):
+        """Version counter shared by all processes: id of the newest event (0 when empty)"""
+        with self._lock:
+            return self._conn.execute('SELECT COALESCE(MAX(id), 0) FROM events').fetchone()[0]
+
+    def is_empty(self):
+        with self._lock:
+            return self._conn.execute('SELECT 1 FROM events LIMIT 1').fetchone() is None
+
+    def load_snapshot(self):
+        """(last_event_id, state) of the latest snapshot, or (0, None)"""
+        with self._lock:
+            row = self._conn.execute('SELECT last_event_id, state FROM snapshot WHERE id = 1').fetchone()
+        if row is None:
+            return 0, None
+        return row[0], json.loads(row[1])
+
+    def save_snapshot(self, last_event_id, state):
+        """
+        Replace the snapshot in one statement, so a crash leaves either the old or the new one
+        A snapshot older than the stored one (written by a lagging worker) is ignored
+        """
+        with self._lock:
+            self._conn.execute(
+                '''INSERT INTO snapshot (id, last_event_id, state, created_at) VALUES (1, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET
+                       last_event_id = excluded.last_event_id,
+                       state = excluded.state,
+                       created_at = excluded.created_at
+                   WHERE excluded.last_event_id > snapshot.last_event_id''',
+                (last_event_id, json.dumps(state), datetime.now().isoformat())
+            )
+
+
+def read_archive(archive_path, kind=None):
+    """
+    Stream archived events as dicts (id, kind, created_at, payload), oldest first,
+    without loading the archive into memory
+    """
+    last_id = 0
+    with gzip.open(archive_path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            event = json.loads(line)
+            if event['id'] <= last_id:
+                continue  # repeated by an archive run that crashed before deleting its rows
+            last_id = event['id']
+            if kind is None or event['kind'] == kind:
+                yield event
@@ -7,8 +7,62 @@ import joblib
 import numpy as np
 import json
 import os
+import threading
+import time
+from collections import deque
 from datetime import datetime
 from pathlib import Path
+from rl_event_log import RLEventLog
+from rl_metrics import AccuracyTracker
+from rl_calibration import BinnedCalibrator
+from rl_bandit import INTERVENTIONS, InterventionBandit, segment_index
+
+# Figures shown for interventions with no community data yet; the rates also seed the bandit's prior
+DEFAULT_RECOMMENDATIONS = {
+    'exercise': {
+        'effectiveness_rate': 0.85,
+        'avg_glucose_reduction': 15,
+        'total_users_tried': 45,
+        'success_count': 38,
+        'score': 0.85
+    },
+    'diet_change': {
+        'effectiveness_rate': 0.75,
+        'avg_glucose_reduction': 10,
+        'total_users_tried': 32,
+        'success_count': 24,
+        'score': 0.70
+    },
+    'stress_management': {
+        'effectiveness_rate': 0.65,
+        'avg_glucose_reduction': 8,
+        'total_users_tried': 28,
+        'success_count': 18,
+        'score': 0.58
+    },
+    'sleep_improvement': {
+        'effectiveness_rate': 0.70,
+        'avg_glucose_reduction': 12,
+        'total_users_tried': 35,
+        'success_count': 25,
+        'score': 0.66
+    },
+    'medication': {
+        'effectiveness_rate': 0.90,
+        'avg_glucose_reduction': 20,
+        'total_users_tried': 22,
+        'success_count': 20,
+        'score': 0.88
+    },
+    'hydration': {
+        'effectiveness_rate': 0.55,
+        'avg_glucose_reduction': 5,
+        'total_users_tried': 18,
+        'success_count': 10,
+        'score': 0.52
+    }
+}
+
 
 class RLFeedbackSystem:
     """
@@ -17,20 +71,87 @@ class RLFeedbackSystem:
     2. Preventive measure effectiveness to recommend interventions
     """
     
-    def __init__(self, feedback_file='rl_feedback_data.pkl'):
-        self.feedback_file = feedback_file
-        self.feedback_history = self._load_feedback()
-        self.confidence_adjustment = 0.0
+    def __init__(self, feedback_file='rl_feedback_data.pkl', log_file='rl_feedback.db', snapshot_every=100,
+                 refresh_interval=1.0, feedback_window=1000, history_window=200,
+                 archive_file='rl_feedback_archive.jsonl.gz', archive_every=1000,
+                 accuracy_half_life_hours=72.0, accuracy_window=200, calibration_refit_seconds=5.0):
+        self.feedback_file = feedback_file  # legacy pickle, imported once into the event log
+        self.snapshot_every = snapshot_every
+        # Only the newest events stay in memory; older ones move to archive_file (see read_archive)
+        self.feedback_window = feedback_window
+        self.history_window = history_window
+        self.archive_file = archive_file
+        self.archive_every = archive_every
+        self._archive_checked_event_id = 0
+        self.event_log = RLEventLog(log_file)
+        self.feedback_history = self._init_feedback()
+        self.accuracy = AccuracyTracker(accuracy_half_life_hours, accuracy_window)
+        self.confidence_adjustment = 1.0
+        # Counts update with each feedback; the map is refit by a background thread
+        self.calibration = BinnedCalibrator()
+        self.calibration_refit_seconds = calibration_refit_seconds
+        self._refit_pid = None
         self.intervention_effectiveness = self._init_interventions()
+        self.bandit = InterventionBandit({name: default['effectiveness_rate']
+                                          for name, default in DEFAULT_RECOMMENDATIONS.items()})
+        self.last_event_id = 0
+        self._snapshot_event_id = 0
+        self._reloading = False
+        self.refresh_interval = refresh_interval  # seconds between checks for other workers' events
+        self._last_refresh = time.monotonic()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)  # notified when events are applied
+        self._load_feedback()
         
     def _load_feedback(self):
-        """Load existing feedback history"""
-        if os.path.exists(self.feedback_file):
-            try:
-                return joblib.load(self.feedback_file)
-            except:
-                return self._init_feedback()
-        return self._init_feedback()
+        """Restore state from the latest snapshot and replay the log tail after it"""
+        snapshot_event_id, state = self.event_log.load_snapshot()
+        
+        imported = state is None and self._import_legacy_pickle()
+        
+        if state is not None:
+            for key in ('total_predictions', 'correct_predictions', 'predictions_by_risk_level'):
+                self.feedback_history[key] = state[key]
+            self.feedback_history['accuracy_history'].extend(state['accuracy_history'])
+            self.intervention_effectiveness.update(state['interventions'])
+            if 'bandit' in state:
+                self.bandit.load_state(state['bandit'])
+            else:
+                # Snapshot predates the bandit: seed the global statistics from the counters
+                for arm, name in enumerate(INTERVENTIONS):
+                    self.bandit.global_trials[arm] = state['interventions'][name]['total']
+                    self.bandit.global_reward[arm] = state['interventions'][name]['effective']
+            if 'calibration' in state:
+                self.calibration.load_state(state['calibration'])
+            if 'accuracy' in state:
+                self.accuracy.load_state(state['accuracy'])
+            else:
+                # Snapshot predates the incremental estimators: start decay from the lifetime counts
+                self.accuracy.decayed_correct = float(state['correct_predictions'])
+                self.accuracy.decayed_total = float(state['total_predictions'])
+            self._update_confidence()
+        
+        # Counters already include events up to the snapshot; only the feedback window needs them
+        for event_id, kind, payload in self.event_log.recent_events('feedback', self.feedback_window, snapshot_event_id):
+            self.feedback_history['user_feedback'].append(payload)
+        self.last_event_id = snapshot_event_id
+        self._catch_up()
+        
+        self._snapshot_event_id = snapshot_event_id
+        self._archive_checked_event_id = snapshot_event_id
+        self.calibration.fit()
+        if imported:
+            self.save_feedback()
+    
+    def _import_legacy_pickle(self):
+        """Move feedback from the old full-rewrite pickle into the (still empty) event log"""
+        if not os.path.exists(self.feedback_file):
+            return False
+        try:
+            legacy = joblib.load(self.feedback_file)
+        except Exception:
+            return False
+        return self.event_log.seed('feedback', legacy.get('user_feedback', []))
     
     def _init_feedback(self):
         """Initialize feedback structure"""
@@ -38,8 +159,8 @@ class RLFeedbackSystem:
             'total_predictions': 0,
             'correct_predictions': 0,
             'predictions_by_risk_level': {},
-            'user_feedback': [],
-            'accuracy_history': [],
+            'user_feedback': deque(maxlen=self.feedback_window),
+            'accuracy_history': deque(maxlen=self.history_window),
             'interventions': {}  # Track preventive measure effectiveness
         }
     
@@ -55,8 +176,110 @@ class RLFeedbackSystem:
         }
     
     def save_feedback(self):
-        """Save feedback history to disk"""
-        joblib.dump(self.feedback_history, self.feedback_file)
+        """Compact: write a snapshot of the counters as of the latest event"""
+        state = {
+            'total_predictions': self.feedback_history['total_predictions'],
+            'correct_predictions': self.feedback_history['correct_predictions'],
+            'predictions_by_risk_level': self.feedback_history['predictions_by_risk_level'],
+            'accuracy_history': list(self.feedback_history['accuracy_history']),
+            'interventions': self.intervention_effectiveness,
+            'accuracy': self.accuracy.state(),
+            'calibration': self.calibration.state(),
+            'bandit': self.bandit.state()
+        }
+        self.event_log.save_snapshot(self.last_event_id, state)
+        self._snapshot_event_id = self.last_event_id
+        
+        if self.last_event_id - self._archive_checked_event_id >= self.archive_every:
+            try:
+                self.event_log.archive(self.archive_file, self.last_event_id, self.feedback_window)
+                self._archive_checked_event_id = self.last_event_id
+            except Exception as e:
+                # The snapshot is saved and the events stay in the log; the next snapshot retries
+                print(f"⚠ Archiving RL events failed: {e}")
+    
+    def _record_event(self, kind, payload):
+        """Append one event to the log and fold it (and any other workers' events) into memory"""
+        with self._lock:
+            self.event_log.append(kind, payload)
+            self._catch_up()
+            self._changed.notify_all()
+            if self.last_event_id - self._snapshot_event_id >= self.snapshot_every:
+                self.save_feedback()
+    
+    def _catch_up(self):
+        """Apply every logged event newer than the in-memory state, in log order"""
+        applied_any = False
+        for event_id, kind, payload in self.event_log.events_after(self.last_event_id):
+            if event_id > self.last_event_id + 1 and self._missed_archived_events():
+                return
+            self._apply_event(kind, payload)
+            self.last_event_id = event_id
+            applied_any = True
+        if not applied_any:
+            self._missed_archived_events()
+    
+    def _missed_archived_events(self):
+        """
+        Another worker may archive events this one has not applied yet (it only refreshes
+        on reads). The snapshot covers everything archived, so reload from it.
+        Returns True if the state was reloaded.
+        """
+        if self._reloading or self.event_log.archived_through() <= self.last_event_id:
+            return False
+        print(f"⚠ RL events after {self.last_event_id} were archived before this worker applied them; "
+              f"reloading from the snapshot")
+        self.feedback_history = self._init_feedback()
+        self.intervention_effectiveness = self._init_interventions()
+        self._reloading = True
+        try:
+            self._load_feedback()
+        finally:
+            self._reloading = False
+        return True
+    
+    def refresh(self, force=False):
+        """
+        Pick up events recorded by other worker processes
+        Checks the shared version counter at most once per refresh_interval,
+        so readers like adjust_risk_score stay in-memory reads
+        """
+        now = time.monotonic()
+        if not force and now - self._last_refresh < self.refresh_interval:
+            return
+        self._last_refresh = now
+        if self.event_log.latest_event_id() == self.last_event_id:
+            return
+        with self._lock:
+            self._catch_up()
+            self._changed.notify_all()
+    
+    def state_version(self):
+        """Id of the newest applied event; changes exactly when feedback or an intervention is recorded"""
+        self.refresh()
+        return self.last_event_id
+    
+    def wait_for_change(self, version, timeout=15.0):
+        """
+        Block until the state moves past version or timeout expires; returns the current version
+        Wakes immediately for events recorded in this process, within refresh_interval for others
+        """
+        deadline = time.monotonic() + timeout
+        while self.last_event_id == version:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            with self._lock:
+                if self.last_event_id == version:
+                    self._changed.wait(min(remaining, self.refresh_interval))
+            self.refresh(force=True)
+        return self.last_event_id
+    
+    def _apply_event(self, kind, payload):
+        if kind == 'feedback':
+            self._apply_feedback(payload)
+        elif kind == 'intervention':
+            self._apply_intervention(payload)
     
     def record_prediction(self, user_id, prediction_prob, predicted_label, actual_features):
         """Record a prediction for later feedback"""
@@ -73,54 +296,97 @@ class RLFeedbackSystem:
         Record user feedback on whether prediction was correct
         actual_outcome: 1 if user confirmed diabetes, 0 if not
         """
-        self.feedback_history['total_predictions'] += 1
-        self.feedback_history['user_feedback'].append({
+        self._record_event('feedback', {
             'prediction_data': prediction_data,
             'actual_outcome': int(actual_outcome),
             'feedback_timestamp': datetime.now().isoformat()
         })
+    
+    def _apply_feedback(self, entry):
+        self.feedback_history['total_predictions'] += 1
+        self.feedback_history['user_feedback'].append(entry)
         
         # Check if prediction was correct
-        if prediction_data['predicted_label'] == actual_outcome:
+        if entry['prediction_data']['predicted_label'] == entry['actual_outcome']:
             self.feedback_history['correct_predictions'] += 1
         
+        self.accuracy.update(
+            entry['prediction_data']['prediction_prob'],
+            entry['prediction_data']['predicted_label'],
+            entry['actual_outcome'],
+            entry['feedback_timestamp']
+        )
+        self._update_confidence()
+        self.calibration.update(
+            entry['prediction_data'].get('model_prob', entry['prediction_data']['prediction_prob']),
+            entry['actual_outcome']
+        )
+        
         # Track accuracy
         if self.feedback_history['total_predictions'] % 5 == 0:  # Every 5 predictions
             accuracy = self.feedback_history['correct_predictions'] / self.feedback_history['total_predictions']
             self.feedback_history['accuracy_history'].append({
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': entry['feedback_timestamp'],
                 'accuracy': accuracy,
                 'total_predictions': self.feedback_history['total_predictions']
             })
-        
-        self.save_feedback()
+    
+    def _update_confidence(self):
+        """
+        Precompute the confidence adjustment from the time-decayed accuracy
+        If accuracy is high, increase confidence in predictions; if low, decrease it
+        Scale from 0.8x to 1.2x based on accuracy
+        """
+        accuracy = self.accuracy.decayed_accuracy()
+        self.confidence_adjustment = 1.0 if accuracy is None else 0.8 + (accuracy * 0.4)
     
     def get_confidence_adjustment(self):
         """
-        Calculate confidence adjustment based on historical accuracy
+        Confidence adjustment based on recent (time-decayed) accuracy, shown on the RL dashboard
         Returns: adjustment factor between 0.8 and 1.2
         """
-        if self.feedback_history['total_predictions'] == 0:
-            return 1.0
-        
-        accuracy = self.feedback_history['correct_predictions'] / self.feedback_history['total_predictions']
-        
-        # If accuracy is high, increase confidence in predictions
-        # If accuracy is low, decrease confidence
-        # Scale from 0.8x to 1.2x based on accuracy
-        adjustment = 0.8 + (accuracy * 0.4)
-        return adjustment
+        self.refresh()
+        return self.confidence_adjustment
+    
+    def _ensure_refitter(self):
+        # Per process: forked web workers start their own refit thread
+        if self._refit_pid == os.getpid():
+            return
+        self._refit_pid = os.getpid()
+        threading.Thread(target=self._refit_loop, name='rl-calibration-refit', daemon=True).start()
+    
+    def _refit_loop(self):
+        while True:
+            time.sleep(self.calibration_refit_seconds)
+            try:
+                self.refresh()
+                with self._lock:
+                    self.calibration.fit()
+            except Exception as e:
+                print(f"⚠ Calibration refit failed: {e}")
+    
+    def calibration_version(self):
+        """Changes whenever the calibration map changes (part of the prediction cache generation)"""
+        self._ensure_refitter()
+        return self.calibration.version
     
     def adjust_risk_score(self, risk_score):
-        """Apply RL-based adjustment to risk score"""
-        adjustment = self.get_confidence_adjustment()
-        
-        # Apply adjustment but keep score within 0-100 range
-        adjusted_score = risk_score * adjustment
-        return min(100, max(0, adjusted_score))
+        """
+        Calibrate the model's risk score with the map learned from user feedback
+        Accepts a single score or a NumPy array of scores (batch predictions), 0-100
+        """
+        self._ensure_refitter()
+        calibrated = self.calibration.apply(np.asarray(risk_score, dtype=float) / 100) * 100
+        return np.clip(calibrated, 0, 100)
+    
+    def raw_threshold(self, calibrated_threshold=0.5):
+        """Model probability at which the calibrated probability reaches calibrated_threshold"""
+        self._ensure_refitter()
+        return self.calibration.inverse(calibrated_threshold)
     
     def get_feedback_stats(self):
         """Get statistics about the feedback system"""
+        self.refresh()
         total = self.feedback_history['total_predictions']
         correct = self.feedback_history['correct_predictions']
         
@@ -128,15 +394,22 @@ class RLFeedbackSystem:
             'total_predictions': total,
             'correct_predictions': correct,
             'accuracy': (correct / total * 100) if total > 0 else 0,
-            'confidence_adjustment': self.get_confidence_adjustment(),
-            'recent_accuracy_history': self.feedback_history['accuracy_history'][-5:] if self.feedback_history['accuracy_history'] else []
+            'decayed_accuracy': _percent(self.accuracy.decayed_accuracy()),
+            'window_accuracy': _percent(self.accuracy.window_accuracy()),
+            'window_size': len(self.accuracy.recent),
+            'confusion_by_risk_level': self.accuracy.confusion,
+            'confidence_adjustment': self.confidence_adjustment,
+            'calibration_samples': int(self.calibration.totals.sum()),
+            'recent_accuracy_history': list(self.feedback_history['accuracy_history'])[-5:]
         }
     
-    def record_intervention(self, user_id, measure_type, baseline_glucose, outcome_glucose, effectiveness_score):
+    def record_intervention(self, user_id, measure_type, baseline_glucose, outcome_glucose, effectiveness_score,
+                            baseline_bmi=None, risk_level=None):
         """
         Record preventive measure effectiveness
         measure_type: exercise, diet_change, stress_management, sleep_improvement, medication, hydration
         effectiveness_score: 0-1 scale (higher = more effective)
+        baseline_bmi, risk_level: patient context; with baseline_glucose they pick the bandit segment
         """
         if measure_type not in self.intervention_effectiveness:
             return False
@@ -144,14 +417,27 @@ class RLFeedbackSystem:
         # Calculate glucose reduction
         glucose_reduction = max(0, baseline_glucose - outcome_glucose)
         
+        self._record_event('intervention', {
+            'user_id': user_id,
+            'measure_type': measure_type,
+            'glucose_reduction': float(glucose_reduction),
+            'effectiveness_score': float(effectiveness_score),
+            'baseline_glucose': float(baseline_glucose) if baseline_glucose is not None else None,
+            'baseline_bmi': float(baseline_bmi) if baseline_bmi is not None else None,
+            'risk_level': risk_level
+        })
+        return True
+    
+    def _apply_intervention(self, payload):
         # Update intervention tracking
-        intervention = self.intervention_effectiveness[measure_type]
+        intervention = self.intervention_effectiveness[payload['measure_type']]
         intervention['total'] += 1
         
-        if effectiveness_score >= 0.5:  # Consider effective if >= 50% effective
+        if payload['effectiveness_score'] >= 0.5:  # Consider effective if >= 50% effective
             intervention['effective'] += 1
         
         # Update average glucose reduction (moving average)
+        glucose_reduction = payload['glucose_reduction']
         if intervention['total'] == 1:
             intervention['avg_glucose_reduction'] = glucose_reduction
         else:
@@ -160,98 +446,51 @@ class RLFeedbackSystem:
                 / intervention['total']
             )
         
-        self.save_feedback()
-        return True
+        segment = segment_index(payload.get('baseline_glucose'), payload.get('baseline_bmi'), payload.get('risk_level'))
+        self.bandit.update(payload['measure_type'], payload['effectiveness_score'], glucose_reduction, segment)
     
-    def get_recommended_interventions(self, current_glucose, current_bmi, risk_level):
+    def get_recommended_interventions(self, current_glucose, current_bmi, risk_level, explore=True):
         """
-        Get personalized intervention recommendations based on what works best
-        Returns list of interventions sorted by effectiveness
+        Get personalized intervention recommendations based on what works best for similar patients
+        Ranks by a Thompson sample from each intervention's posterior in the patient's
+        glucose/BMI/risk segment (posterior mean when explore is False)
+        Returns list of interventions sorted by score
         """
-        # Default recommendations for new interventions with no community data yet
-        default_recommendations = {
-            'exercise': {
-                'effectiveness_rate': 0.85,
-                'avg_glucose_reduction': 15,
-                'total_users_tried': 45,
-                'success_count': 38,
-                'score': 0.85
-            },
-            'diet_change': {
-                'effectiveness_rate': 0.75,
-                'avg_glucose_reduction': 10,
-                'total_users_tried': 32,
-                'success_count': 24,
-                'score': 0.70
-            },
-            'stress_management': {
-                'effectiveness_rate': 0.65,
-                'avg_glucose_reduction': 8,
-                'total_users_tried': 28,
-                'success_count': 18,
-                'score': 0.58
-            },
-            'sleep_improvement': {
-                'effectiveness_rate': 0.70,
-                'avg_glucose_reduction': 12,
-                'total_users_tried': 35,
-                'success_count': 25,
-                'score': 0.66
-            },
-            'medication': {
-                'effectiveness_rate': 0.90,
-                'avg_glucose_reduction': 20,
-                'total_users_tried': 22,
-                'success_count': 20,
-                'score': 0.88
-            },
-            'hydration': {
-                'effectiveness_rate': 0.55,
-                'avg_glucose_reduction': 5,
-                'total_users_tried': 18,
-                'success_count': 10,
-                'score': 0.52
-            }
-        }
+        self.refresh()
+        segment = segment_index(current_glucose, current_bmi, risk_level)
+        scores, rates = self.bandit.rank(segment, explore=explore)
+        segment_glucose = self.bandit.segment_glucose_reduction(segment) if segment is not None else None
         
         recommendations = []
-        
-        for measure_type, stats in self.intervention_effectiveness.items():
+        for i, measure_type in enumerate(INTERVENTIONS):
+            stats = self.intervention_effectiveness[measure_type]
             if stats['total'] == 0:
-                # Use default recommendation if no community data yet
-                if measure_type in default_recommendations:
-                    default = default_recommendations[measure_type]
-                    recommendations.append({
-                        'type': measure_type,
-                        'effectiveness_rate': default['effectiveness_rate'],
-                        'avg_glucose_reduction': default['avg_glucose_reduction'],
-                        'total_users_tried': default['total_users_tried'],
-                        'success_count': default['success_count'],
-                        'score': default['score']
-                    })
-                continue
-            
-            effectiveness_rate = stats['effective'] / stats['total']
-            glucose_impact = stats['avg_glucose_reduction']
-            
-            # Score based on effectiveness and glucose impact
-            score = (effectiveness_rate * 0.6) + (min(glucose_impact / 50, 1.0) * 0.4)
+                # Use default figures if no community data yet
+                default = DEFAULT_RECOMMENDATIONS[measure_type]
+                glucose_impact = default['avg_glucose_reduction']
+                total, effective = default['total_users_tried'], default['success_count']
+            else:
+                glucose_impact = stats['avg_glucose_reduction']
+                total, effective = stats['total'], stats['effective']
+            if segment_glucose is not None and not np.isnan(segment_glucose[i]):
+                glucose_impact = float(segment_glucose[i])
             
             recommendations.append({
                 'type': measure_type,
-                'effectiveness_rate': effectiveness_rate,
+                'effectiveness_rate': float(rates[i]),
                 'avg_glucose_reduction': glucose_impact,
-                'total_users_tried': stats['total'],
-                'success_count': stats['effective'],
-                'score': score
+                'total_users_tried': total,
+                'success_count': effective,
+                'score': float(scores[i])
             })
         
-        # Sort by effectiveness score
+        # Sort by sampled effectiveness
         recommendations.sort(key=lambda x: x['score'], reverse=True)
         return recommendations
     
     def get_intervention_stats(self):
         """Get detailed intervention statistics"""
+        self.refresh()
         stats = {}
         for measure_type, data in self.intervention_effectiveness.items():
             if data['total'] > 0:
@@ -263,5 +502,9 @@ class RLFeedbackSystem:
                 }
         return stats
 
+def _percent(fraction):
+    return fraction * 100 if fraction is not None else 0
+
+
 # Initialize RL system when module loads
 rl_system = RLFeedbackSystem()
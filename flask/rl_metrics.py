@@ -0,0 +1,90 @@
+"""
+Incremental Accuracy Estimators for the RL Feedback System
+Each feedback event updates every estimator in O(1), so readers never rescan history
+"""
+
+from collections import deque
+from datetime import datetime
+
+# Same cut points as the risk gauge on the results page (probability of diabetes)
+RISK_BUCKETS = (('low', 0.25), ('moderate', 0.5), ('high', 1.0))
+
+
+def risk_bucket(prediction_prob):
+    for name, upper in RISK_BUCKETS:
+        if prediction_prob <= upper:
+            return name
+    return RISK_BUCKETS[-1][0]
+
+
+def _empty_confusion():
+    return {name: {'tp': 0, 'fp': 0, 'tn': 0, 'fn': 0} for name, _ in RISK_BUCKETS}
+
+
+class AccuracyTracker:
+    """
+    Maintains, per feedback event:
+        decayed accuracy   exponentially time-decayed, weight halves every half_life_hours
+        window accuracy    over the last `window` feedback events (running sum over a ring buffer)
+        confusion matrix   tp/fp/tn/fn per risk bucket of the predicted probability
+
+    Decay is driven by the feedback timestamps, so every worker replaying the same
+    events reaches the same values.
+    """
+
+    def __init__(self, half_life_hours=72.0, window=200):
+        self.half_life_seconds = half_life_hours * 3600.0
+        self.window = window
+        self.decayed_correct = 0.0
+        self.decayed_total = 0.0
+        self.last_timestamp = None
+        self.recent = deque(maxlen=window)
+        self.recent_correct = 0
+        self.confusion = _empty_confusion()
+
+    def update(self, prediction_prob, predicted_label, actual_outcome, timestamp):
+        correct = int(predicted_label == actual_outcome)
+
+        moment = datetime.fromisoformat(timestamp).timestamp()
+        if self.last_timestamp is not None and moment > self.last_timestamp:
+            decay = 0.5 ** ((moment - self.last_timestamp) / self.half_life_seconds)
+            self.decayed_correct *= decay
+            self.decayed_total *= decay
+        if self.last_timestamp is None or moment > self.last_timestamp:
+            self.last_timestamp = moment
+        self.decayed_correct += correct
+        self.decayed_total += 1.0
+
+        if len(self.recent) == self.window:
+            self.recent_correct -= self.recent[0]
+        self.recent.append(correct)
+        self.recent_correct += correct
+
+        cell = ('t' if correct else 'f') + ('p' if predicted_label == 1 else 'n')
+        self.confusion[risk_bucket(prediction_prob)][cell] += 1
+
+    def decayed_accuracy(self):
+        return self.decayed_correct / self.decayed_total if self.decayed_total else None
+
+    def window_accuracy(self):
+        return self.recent_correct / len(self.recent) if self.recent else None
+
+    def state(self):
+        return {
+            'decayed_correct': self.decayed_correct,
+            'decayed_total': self.decayed_total,
+            'last_timestamp': self.last_timestamp,
+            'recent': list(self.recent),
+            'confusion': self.confusion,
+        }
+
+    def load_state(self, state):
+        self.decayed_correct = state['decayed_correct']
+        self.decayed_total = state['decayed_total']
+        self.last_timestamp = state['last_timestamp']
+        self.recent.clear()
+        self.recent.extend(state['recent'])
+        self.recent_correct = sum(self.recent)
+        self.confusion = _empty_confusion()
+        for name, cells in state['confusion'].items():
+            self.confusion.setdefault(name, {}).update(cells)
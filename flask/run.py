@@ -1,6 +1,9 @@
 from app import create_app
 
-app = create_app()
+# Spawned inference-pool workers re-import this module as __mp_main__; they load
+# only the model (see inference_pool._init_worker), not the whole app
+if __name__ != '__mp_main__':
+    app = create_app()
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import app.* and the top-level rl_* modules the way run.py does, from the flask directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,19 @@
+"""Input grids for the rule equivalence tests"""
+
+
+def straddle(*thresholds, low, high):
+    """Values just below, on and just above every threshold, plus one value beyond each end"""
+    values = {low, high}
+    for threshold in thresholds:
+        values.update((threshold - 0.5, threshold, threshold + 0.5))
+    return sorted(values)
+
+
+# Every threshold the checkup rules compare each input against
+CHECKUP_GRID = {
+    'age': straddle(40, 45, 50, 60, 65, low=21, high=80),
+    'bmi': straddle(25, 30, low=15, high=45),
+    'glucose': straddle(100, 125, low=70, high=250),
+    'blood_pressure_systolic': straddle(130, 140, low=100, high=180),
+    'blood_pressure_diastolic': straddle(80, 90, low=60, high=110),
+}
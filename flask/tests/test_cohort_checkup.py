@@ -0,0 +1,45 @@
+"""Vectorized cohort checkup codes must reproduce the per-patient checkup rules"""
+
+from itertools import product
+
+import numpy as np
+import pytest
+
+from app.utils.health_checkup import (generate_cohort_checkup_codes, decode_blood_tests, get_blood_test_recommendations,
+                                      get_checkup_frequency, get_lifestyle_recommendations, CHECKUP_FREQUENCY_LEVELS,
+                                      BP_CATEGORIES, EXERCISE_PLANS, SLEEP_PLANS, STRESS_PLANS)
+from grids import CHECKUP_GRID
+
+
+def bp_category(systolic, diastolic):
+    if systolic >= 140 or diastolic >= 90:
+        return "High (Hypertension)"
+    if systolic >= 130 or diastolic >= 80:
+        return "Elevated"
+    return "Normal"
+
+
+@pytest.mark.parametrize('has_diabetes, family_history', list(product([False, True], [False, True])))
+def test_cohort_codes_match_scalar_rules(has_diabetes, family_history):
+    grid = np.array(list(product(*CHECKUP_GRID.values())))
+    age, bmi, glucose, systolic, diastolic = grid.T
+    codes = generate_cohort_checkup_codes(age, bmi, glucose, systolic, diastolic,
+                                          np.full(len(grid), has_diabetes), np.full(len(grid), family_history))
+
+    for inputs, code in zip(grid.tolist(), codes.itertuples()):
+        age, bmi, glucose, systolic, diastolic = inputs
+        assert CHECKUP_FREQUENCY_LEVELS[code.checkup_frequency] == \
+            get_checkup_frequency(age, has_diabetes, glucose, systolic, diastolic), inputs
+        assert BP_CATEGORIES[code.bp_category] == bp_category(systolic, diastolic), inputs
+
+        tests = get_blood_test_recommendations(age, bmi, glucose, systolic, diastolic, has_diabetes, family_history)
+        assert sorted(decode_blood_tests(code.blood_tests)) == \
+            sorted(test['name'] for group in tests.values() for test in group), inputs
+
+        tips = {tip['category']: tip['recommendation']
+                for tip in get_lifestyle_recommendations(age, bmi, glucose, systolic, has_diabetes)}
+        assert SLEEP_PLANS[code.sleep_plan] == tips['Sleep'], inputs
+        assert EXERCISE_PLANS[code.exercise_plan] == tips['Exercise'], inputs
+        assert STRESS_PLANS[code.stress_plan] == tips['Stress Management'], inputs
+        assert code.glucose_monitoring == ('Monitoring' in tips), inputs
+        assert code.weight_management == ('Weight Management' in tips), inputs
@@ -0,0 +1,122 @@
+"""Explanations must add up to the model output and stay within the per-request latency budget"""
+
+import time
+from math import factorial
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from app.config import Config
+from app.utils.explainer import LinearExplainer, TreeExplainer, build_explainer
+from app.utils.model_registry import LoadedModel
+
+# Single-row explanation budget of the prediction form, in seconds
+ROW_BUDGET = 0.001
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(n_samples=3000, n_features=8, n_informative=5, random_state=0)
+    # Feature scales like the diabetes inputs, so the scaler folding is exercised
+    X = X * np.array([3, 30, 12, 10, 80, 7, 0.3, 12]) + np.array([4, 120, 70, 20, 80, 32, 0.5, 33])
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=0)
+    scaler = StandardScaler().fit(X_train)
+    return scaler, scaler.transform(X_train), y_train, X_test
+
+
+def raw_output(model, scaled):
+    if isinstance(model, (GradientBoostingClassifier, LogisticRegression)):
+        return model.decision_function(scaled)
+    return model.predict_proba(scaled)[:, 1]
+
+
+def median_row_seconds(explain, X, rows=50):
+    for row in X[:5]:
+        explain(row[None])
+    timings = []
+    for row in X[:rows]:
+        start = time.perf_counter()
+        explain(row[None])
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+@pytest.mark.parametrize('model, explainer_type', [
+    (LogisticRegression(max_iter=1000), LinearExplainer),
+    (RandomForestClassifier(n_estimators=30, max_depth=12, random_state=0), TreeExplainer),
+    (GradientBoostingClassifier(n_estimators=60, random_state=0), TreeExplainer),
+    (DecisionTreeClassifier(max_depth=8, random_state=0), TreeExplainer),
+])
+def test_attributions_add_up_to_model_output(data, model, explainer_type):
+    scaler, X_train_scaled, y_train, X_test = data
+    model.fit(X_train_scaled, y_train)
+
+    explainer = build_explainer(model, scaler)
+
+    assert isinstance(explainer, explainer_type)
+    phi = explainer.shap_values(X_test)
+    np.testing.assert_allclose(explainer.expected_value + phi.sum(axis=1),
+                               raw_output(model, scaler.transform(X_test)), atol=1e-9)
+
+
+def test_tree_attributions_match_brute_force_shapley(data):
+    scaler, X_train_scaled, y_train, X_test = data
+    tree = DecisionTreeClassifier(max_depth=4, random_state=0).fit(X_train_scaled, y_train)
+    explainer = TreeExplainer(tree, scaler)
+    x = scaler.transform(X_test[:1])[0].astype(np.float32)
+
+    def expected_value(subset, node=0):
+        # Path-dependent expectation: follow x on the features in subset, weight by cover elsewhere
+        t = tree.tree_
+        if t.children_left[node] == -1:
+            return t.value[node, 0, 1] / t.value[node, 0].sum()
+        left, right = t.children_left[node], t.children_right[node]
+        if t.feature[node] in subset:
+            return expected_value(subset, left if x[t.feature[node]] <= t.threshold[node] else right)
+        cover = t.weighted_n_node_samples
+        return (cover[left] * expected_value(subset, left) + cover[right] * expected_value(subset, right)) / cover[node]
+
+    n = X_test.shape[1]
+    phi = np.zeros(n)
+    for i in range(n):
+        others = [j for j in range(n) if j != i]
+        for mask in range(1 << (n - 1)):
+            subset = {others[k] for k in range(n - 1) if mask >> k & 1}
+            weight = factorial(len(subset)) * factorial(n - len(subset) - 1) / factorial(n)
+            phi[i] += weight * (expected_value(subset | {i}) - expected_value(subset))
+
+    np.testing.assert_allclose(explainer.shap_values(X_test[:1])[0], phi, atol=1e-12)
+
+
+def test_boosting_row_within_budget(data):
+    scaler, X_train_scaled, y_train, X_test = data
+    model = GradientBoostingClassifier(n_estimators=150, random_state=0).fit(X_train_scaled, y_train)
+    explainer = build_explainer(model, scaler)
+
+    assert explainer.cost <= Config.EXPLAIN_MAX_TREE_PAIRS
+    assert median_row_seconds(explainer.shap_values, X_test) < ROW_BUDGET
+
+
+def test_production_forest_row_within_budget(data):
+    # The production random forest: too many leaf paths to explain exactly within the budget,
+    # so the bundle explains it through its first stage as soon as it is loaded
+    scaler, X_train_scaled, y_train, X_test = data
+    model = RandomForestClassifier(n_estimators=200, max_depth=15, random_state=0).fit(X_train_scaled, y_train)
+    first_stage = LogisticRegression(max_iter=1000).fit(X_train_scaled, y_train)
+    bundle = LoadedModel('v0001', model, scaler, {'feature_names': []}, first_stage)
+
+    bundle.build_explainers(Config.EXPLAIN_MAX_TREE_PAIRS)
+
+    assert bundle.explains_with_first_stage
+    explainer = bundle.explainer(first_stage=True)
+    assert median_row_seconds(explainer.shap_values, X_test) < ROW_BUDGET
+    # The full model's explainer is still exact, for batch use
+    phi = bundle.explainer().shap_values(X_test[:20])
+    np.testing.assert_allclose(bundle.explainer().expected_value + phi.sum(axis=1),
+                               model.predict_proba(scaler.transform(X_test[:20]))[:, 1], atol=1e-9)
@@ -0,0 +1,40 @@
+"""Compiled NumPy inference must reproduce sklearn's predict_proba"""
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.tree import DecisionTreeClassifier
+
+from app.utils.fast_inference import CompiledLinearModel, CompiledTreeEnsemble, compile_model
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(n_samples=1200, n_features=8, n_informative=5, random_state=0)
+    # Feature scales like the diabetes inputs, so the scaler folding is exercised
+    X = X * np.array([3, 30, 12, 10, 80, 7, 0.3, 12]) + np.array([4, 120, 70, 20, 80, 32, 0.5, 33])
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25, random_state=0)
+    scaler = StandardScaler().fit(X_train)
+    return scaler, scaler.transform(X_train), y_train, X_test
+
+
+@pytest.mark.parametrize('model, compiled_type', [
+    (LogisticRegression(max_iter=1000), CompiledLinearModel),
+    (RandomForestClassifier(n_estimators=50, max_depth=12, random_state=0), CompiledTreeEnsemble),
+    (GradientBoostingClassifier(n_estimators=60, random_state=0), CompiledTreeEnsemble),
+    (DecisionTreeClassifier(max_depth=8, random_state=0), CompiledTreeEnsemble),
+])
+def test_compiled_model_matches_sklearn(data, model, compiled_type):
+    scaler, X_train_scaled, y_train, X_test = data
+    model.fit(X_train_scaled, y_train)
+
+    compiled = compile_model(model, scaler)
+
+    # None would mean the load-time self-check rejected the compiled model
+    assert isinstance(compiled, compiled_type)
+    np.testing.assert_allclose(compiled.predict_proba(X_test),
+                               model.predict_proba(scaler.transform(X_test)), atol=1e-9)
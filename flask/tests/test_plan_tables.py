@@ -0,0 +1,73 @@
+"""Table-based diet and checkup plans must match the original rule code on every threshold bucket"""
+
+import os
+import subprocess
+import types
+from itertools import product
+from types import MappingProxyType
+
+import pytest
+
+from app.utils.diet_planner import generate_diet_plan
+from app.utils.health_checkup import generate_health_checkup_plan
+from grids import CHECKUP_GRID, straddle
+
+# Last commit whose plan generators were plain if/elif rule code, before the lookup tables
+RULE_CODE_COMMIT = '290c9cc1e3a89023ce68d27b33a3cb86adab96f3'
+
+
+def rule_code_module(path):
+    """Import the rule-code version of a module straight from git history"""
+    try:
+        source = subprocess.run(['git', 'show', f'{RULE_CODE_COMMIT}:flask/{path}'], capture_output=True,
+                                check=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    except (OSError, subprocess.CalledProcessError):
+        pytest.skip(f'{path} at {RULE_CODE_COMMIT[:7]} is not available (needs the git history)')
+    module = types.ModuleType(f'rule_code_{os.path.basename(path)[:-3]}')
+    exec(compile(source, path, 'exec'), module.__dict__)
+    return module
+
+
+@pytest.fixture(scope='module')
+def legacy_diet_planner():
+    return rule_code_module('app/utils/diet_planner.py')
+
+
+@pytest.fixture(scope='module')
+def legacy_health_checkup():
+    return rule_code_module('app/utils/health_checkup.py')
+
+
+def thaw(value):
+    """Shared plan sections are read-only; compare them as the plain dicts/lists the old code returned"""
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
+
+# Every threshold the diet rules compare each input against
+DIET_GRID = {
+    'glucose': straddle(140, 180, low=70, high=250),
+    'insulin': straddle(150, low=20, high=300),
+    'bmi': straddle(18.5, 25, 30, low=15, high=45),
+    'age': straddle(30, 60, low=21, high=80),
+}
+
+
+@pytest.mark.parametrize('has_diabetes', [0, 1])
+def test_diet_plan_matches_rule_code(legacy_diet_planner, has_diabetes):
+    for glucose, insulin, bmi, age in product(*DIET_GRID.values()):
+        expected = legacy_diet_planner.generate_diet_plan(glucose, insulin, bmi, age, has_diabetes)
+        actual = thaw(generate_diet_plan(glucose, insulin, bmi, age, has_diabetes))
+        assert actual == expected, (glucose, insulin, bmi, age, has_diabetes)
+
+
+@pytest.mark.parametrize('has_diabetes, family_history', list(product([0, 1], [False, True])))
+def test_checkup_plan_matches_rule_code(legacy_health_checkup, has_diabetes, family_history):
+    for age, bmi, glucose, systolic, diastolic in product(*CHECKUP_GRID.values()):
+        inputs = (age, bmi, glucose, systolic, diastolic, has_diabetes, family_history)
+        expected = legacy_health_checkup.generate_health_checkup_plan(*inputs)
+        actual = thaw(generate_health_checkup_plan(*inputs))
+        assert actual == expected, inputs
@@ -1,78 +1,92 @@
 """
 Train ML models on merged diabetes datasets with improved accuracy.
 This script:
-1. Merges diabetes.csv and healthcare_diabetes.csv
-2. Trains multiple models
-3. Selects the best one
-4. Saves model and scaler for production use
+1. Merges diabetes.csv and healthcare_diabetes.csv into a deduplicated, cached dataset
+   (with --production, the health records labelled through prediction feedback are added on top)
+2. Cross-validates multiple models in parallel across all cores
+3. Benchmarks each candidate's inference latency and footprint
+4. Selects the most accurate one within the latency/size budget and confirms it on a held-out test set
+5. Saves model and scaler for production use
+6. Distills the winner into a compact student that serves instead when it agrees closely enough
+7. Publishes the winner with a linear first stage for cascade inference
 """
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, ParameterGrid
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.svm import SVC
 from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+from sklearn.base import clone
 import joblib
+import json
 import os
+import sys
 import warnings
+from app.config import Config
+from app.utils.model_registry import ModelRegistry
+from app.utils.parallel_training import cross_validate_models, successive_halving_search
+from app.utils.dataset_cache import build_dataset, with_extra_rows
+from app.utils.model_benchmark import benchmark_model, select_model
+from app.utils.distillation import distill
+from app.utils.cascade import evaluate_band
 warnings.filterwarnings('ignore')
 
 print("=" * 80)
 print("🔬 TRAINING MERGED DIABETES PREDICTION MODEL")
 print("=" * 80)
 
-# Step 1: Load both datasets
+sources = ['diabetes.csv', 'healthcare_diabetes.csv']
+production_export = None
+production_source = None
+
+# Retraining: `python train_merged_model.py --production` adds the health records users labelled via feedback
+if '--production' in sys.argv:
+    from app import create_app
+    from app.utils.production_data import load_feedback_labels, export_labelled_records
+
+    print("\n🏥 Exporting labelled production records...")
+    app = create_app()
+    with load_feedback_labels('rl_feedback.db', 'rl_feedback_archive.jsonl.gz', Config.RETRAIN_CHUNK_SIZE,
+                              os.path.dirname(Config.PRODUCTION_DATA_FILE)) as labels, app.app_context():
+        production_export = export_labelled_records(
+            Config.PRODUCTION_DATA_FILE, ['Pregnancies', 'Glucose', 'BloodPressure', 'SkinThickness',
+                                          'Insulin', 'BMI', 'DiabetesPedigreeFunction', 'Age'],
+            labels, chunk_size=Config.RETRAIN_CHUNK_SIZE
+        )
+    print(f"✓ {production_export['records_exported']} of {production_export['records_scanned']} health records "
+          f"have a feedback label ({production_export['labels']} feedback labels)")
+    if not production_export['records_exported']:
+        print("⚠ No labelled production records; training on the base datasets only")
+
+# Steps 1-4: Build (or reuse) the merged, deduplicated dataset
 print("\n📂 Loading datasets...")
-try:
-    df1 = pd.read_csv('diabetes.csv')
-    print(f"✓ Dataset 1 (Diabetes): {df1.shape}")
-    print(f"  Columns: {list(df1.columns)}")
-except Exception as e:
-    print(f"✗ Error loading diabetes.csv: {e}")
-    df1 = pd.DataFrame()
-
-try:
-    df2 = pd.read_csv('healthcare_diabetes.csv')
-    print(f"✓ Dataset 2 (Healthcare-Diabetes): {df2.shape}")
-    print(f"  Columns: {list(df2.columns)}")
-    
-    # Remove 'Id' column if present
-    if 'Id' in df2.columns:
-        df2 = df2.drop('Id', axis=1)
-        print(f"  Removed 'Id' column")
-except Exception as e:
-    print(f"✗ Error loading healthcare_diabetes.csv: {e}")
-    df2 = pd.DataFrame()
-
-# Step 2: Merge datasets
-print("\n🔀 Merging datasets...")
-if not df1.empty and not df2.empty:
-    merged_df = pd.concat([df1, df2], axis=0, ignore_index=True)
-    print(f"✓ Merged dataset shape: {merged_df.shape}")
+dataset, built = build_dataset(sources, Config.DATASET_CACHE_DIR)
+schema = dataset.schema
+if built:
+    print(f"✓ Built dataset cache {schema['key']} in {Config.DATASET_CACHE_DIR}")
 else:
-    print("⚠ Using single dataset due to loading issues")
-    merged_df = df1 if not df1.empty else df2
-
-# Step 3: Handle missing values
-print("\n🧹 Handling missing values...")
-print(f"Missing values before:\n{merged_df.isna().sum()}")
-merged_df = merged_df.fillna(merged_df.mean(numeric_only=True))
-print(f"✓ Missing values filled with mean")
+    print(f"✓ Memory-mapped dataset cache {schema['key']} (CSV parsing skipped)")
+for source in schema['sources']:
+    print(f"  {source['path']}: {source['rows_read']} rows read, {source['rows_kept']} kept, "
+          f"{source['duplicates_dropped']} duplicates dropped")
+print(f"✓ Deduplicated dataset: {schema['n_rows']} rows ({schema['duplicates_dropped']} duplicate rows removed)")
+if schema['conflicting_label_rows']:
+    print(f"⚠ {schema['conflicting_label_rows']} rows share features but disagree on the label")
+if schema['missing_values_filled']:
+    print(f"✓ Missing values filled with mean: {schema['missing_values_filled']}")
 
-# Step 4: Prepare features and target
 print("\n📊 Preparing features...")
-target_col = 'Outcome'
-if target_col not in merged_df.columns:
-    print(f"✗ Target column '{target_col}' not found!")
-    print(f"Available columns: {list(merged_df.columns)}")
-    exit(1)
-
-# Drop non-numeric columns
-X = merged_df.drop(target_col, axis=1).select_dtypes(include=[np.number])
-y = merged_df[target_col]
+if production_export and production_export['records_exported']:
+    # Merged onto the cached base rows, so a fresh export does not re-parse the base CSVs
+    X, y, production_source = with_extra_rows(dataset, Config.PRODUCTION_DATA_FILE)
+    print(f"✓ Added {production_source['rows_read']} labelled production rows to the cached dataset")
+    if production_source['missing_values_filled']:
+        print(f"✓ Unstored production features filled with the base mean: {production_source['missing_values_filled']}")
+else:
+    X, y = dataset.frame()
 
 print(f"✓ Features shape: {X.shape}")
 print(f"✓ Target distribution:\n{y.value_counts()}")
@@ -93,8 +107,7 @@ X_train_scaled = scaler.fit_transform(X_train)
 X_test_scaled = scaler.transform(X_test)
 print(f"✓ Features scaled using StandardScaler")
 
-# Step 6: Train multiple models
-print("\n🤖 Training multiple models...")
+# Step 6: Cross-validate the candidate models in parallel
 models = {
     'Logistic Regression': LogisticRegression(max_iter=1000, random_state=42),
     'Random Forest': RandomForestClassifier(n_estimators=200, random_state=42, max_depth=15),
@@ -102,56 +115,111 @@ models = {
     'SVM': SVC(kernel='rbf', probability=True, random_state=42, C=1.0),
 }
 
-results = {}
-best_model = None
-best_accuracy = 0
-best_model_name = ""
+# Grids explored with `python train_merged_model.py --search`
+search_spaces = {
+    'Logistic Regression': {'C': [0.01, 0.1, 1.0, 10.0], 'class_weight': [None, 'balanced']},
+    'Random Forest': {'n_estimators': [100, 200, 400], 'max_depth': [8, 15, None], 'min_samples_leaf': [1, 3]},
+    'Gradient Boosting': {'n_estimators': [100, 150, 300], 'learning_rate': [0.05, 0.1, 0.2], 'max_depth': [2, 3, 4]},
+    'SVM': {'C': [0.3, 1.0, 3.0, 10.0], 'gamma': ['scale', 0.1]},
+}
+hyperparameters_path = 'best_hyperparameters.json'
+
+if '--search' in sys.argv:
+    print(f"\n🔎 Successive-halving hyperparameter search "
+          f"({sum(len(ParameterGrid(grid)) for grid in search_spaces.values())} configurations)...")
+    best_configs, rungs = successive_halving_search(
+        models, search_spaces, X_train, y_train, Config.TRAINING_SEARCH_DIR,
+        n_splits=Config.TRAINING_CV_FOLDS, n_jobs=Config.TRAINING_N_JOBS
+    )
+    for rung in rungs:
+        print(f"  Rung {rung['rung']}: {rung['configurations']} configurations on {rung['n_samples']} rows "
+              f"per fold, {rung['fits']} fits in {rung['seconds']:.1f}s")
+    with open(hyperparameters_path, 'w') as f:
+        json.dump(best_configs, f, indent=2)
+    print(f"✓ Best configurations saved: {hyperparameters_path}")
 
-for name, model in models.items():
-    print(f"\n  Training {name}...")
-    model.fit(X_train_scaled, y_train)
-    
-    # Predictions
-    y_pred = model.predict(X_test_scaled)
-    y_pred_proba = model.predict_proba(X_test_scaled)[:, 1]
-    
-    # Metrics
-    accuracy = accuracy_score(y_test, y_pred)
-    precision = precision_score(y_test, y_pred)
-    recall = recall_score(y_test, y_pred)
-    f1 = f1_score(y_test, y_pred)
-    auc = roc_auc_score(y_test, y_pred_proba)
-    
-    results[name] = {
-        'accuracy': accuracy,
-        'precision': precision,
-        'recall': recall,
-        'f1': f1,
-        'auc': auc
-    }
-    
-    print(f"    ✓ Accuracy: {accuracy:.4f}")
-    print(f"    ✓ Precision: {precision:.4f}")
-    print(f"    ✓ Recall: {recall:.4f}")
-    print(f"    ✓ F1-Score: {f1:.4f}")
-    print(f"    ✓ ROC-AUC: {auc:.4f}")
-    
-    if accuracy > best_accuracy:
-        best_accuracy = accuracy
-        best_model = model
-        best_model_name = name
+if os.path.exists(hyperparameters_path):
+    with open(hyperparameters_path) as f:
+        best_configs = json.load(f)
+    for name, config in best_configs.items():
+        if name in models:
+            models[name].set_params(**config['params'])
+            print(f"  ✓ {name}: {config['params']} (searched CV accuracy {config['accuracy']:.4f})")
+
+print(f"\n🤖 Cross-validating models ({Config.TRAINING_CV_FOLDS} folds, n_jobs={Config.TRAINING_N_JOBS})...")
+results, fold_results, cv_wall_seconds = cross_validate_models(
+    models, X_train, y_train, n_splits=Config.TRAINING_CV_FOLDS, n_jobs=Config.TRAINING_N_JOBS
+)
+cpu_seconds = sum(metrics['cpu_seconds'] for metrics in results.values())
+workers = len({row['pid'] for row in fold_results})
+print(f"✓ {len(fold_results)} fits on {workers} worker processes in {cv_wall_seconds:.1f}s "
+      f"({cpu_seconds:.1f}s of fitting, {cpu_seconds / cv_wall_seconds:.1f}x parallel speedup)")
+
+best_by_accuracy = max(results, key=lambda name: results[name]['accuracy'])
 
 # Step 7: Display results summary
 print("\n" + "=" * 80)
-print("📈 MODEL COMPARISON")
+print("📈 MODEL COMPARISON (mean ± std over folds)")
 print("=" * 80)
-print(f"\n{'Model':<25} {'Accuracy':<12} {'Precision':<12} {'F1-Score':<12} {'ROC-AUC':<12}")
+print(f"\n{'Model':<22} {'Accuracy':<16} {'F1-Score':<16} {'ROC-AUC':<16} {'Fit s':<8} {'Predict s':<8}")
 print("-" * 80)
 for name, metrics in results.items():
-    marker = "⭐ BEST" if name == best_model_name else ""
-    print(f"{name:<25} {metrics['accuracy']:<12.4f} {metrics['precision']:<12.4f} {metrics['f1']:<12.4f} {metrics['auc']:<12.4f} {marker}")
+    marker = "⭐ BEST ACCURACY" if name == best_by_accuracy else ""
+    print(f"{name:<22} "
+          f"{metrics['accuracy']:.4f}±{metrics['accuracy_std']:<9.4f} "
+          f"{metrics['f1']:.4f}±{metrics['f1_std']:<9.4f} "
+          f"{metrics['auc']:.4f}±{metrics['auc_std']:<9.4f} "
+          f"{metrics['fit_seconds']:<8.2f} {metrics['predict_seconds']:<8.3f} {marker}")
+
+# Serving cost of every candidate, fitted on the full training split and served like the app does
+print("\n⏱️  Benchmarking inference latency and footprint...")
+fitted_models = {}
+benchmarks = {}
+for name, model in models.items():
+    fitted_models[name] = clone(model).fit(X_train_scaled, y_train)
+    benchmarks[name] = benchmark_model(fitted_models[name], scaler, X_test)
+
+best_model_name, selection = select_model(
+    results, benchmarks,
+    max_single_p99_ms=Config.SELECTION_MAX_SINGLE_P99_MS,
+    max_model_mb=Config.SELECTION_MAX_MODEL_MB,
+    tolerance=Config.SELECTION_ACCURACY_TOLERANCE,
+)
+
+print(f"\n{'Model':<22} {'1 row p50/p99 ms':<18} {'1000 rows p50/p99 ms':<22} {'Pickle KB':<11} {'Memory KB':<11}")
+print("-" * 80)
+for name, benchmark in benchmarks.items():
+    marker = "⭐ SELECTED" if name == best_model_name else ("" if name in selection['within_budget'] else "over budget")
+    print(f"{name:<22} "
+          f"{benchmark['single_p50_ms']:.3f}/{benchmark['single_p99_ms']:<11.3f} "
+          f"{benchmark['batch_p50_ms']:.2f}/{benchmark['batch_p99_ms']:<15.2f} "
+          f"{benchmark['pickle_bytes'] / 1024:<11.0f} {benchmark['memory_bytes'] / 1024:<11.0f} {marker}")
+print(f"\nBudget: single-row p99 ≤ {Config.SELECTION_MAX_SINGLE_P99_MS} ms, pickle ≤ {Config.SELECTION_MAX_MODEL_MB} MB, "
+      f"accuracy ties within {Config.SELECTION_ACCURACY_TOLERANCE:.3f} go to the fastest")
+if not selection['within_budget']:
+    print("⚠ No candidate fits the budget; choosing among all of them")
+if best_model_name != best_by_accuracy:
+    print(f"✓ Chose {best_model_name} over {best_by_accuracy} "
+          f"({results[best_model_name]['accuracy']:.4f} vs {results[best_by_accuracy]['accuracy']:.4f} CV accuracy)")
+
+# Refit the winner on the whole training split and confirm on the held-out test set
+print(f"\n🏁 Evaluating {best_model_name} (refit on the full training set)...")
+best_model = fitted_models[best_model_name]
+y_pred = best_model.predict(X_test_scaled)
+y_pred_proba = best_model.predict_proba(X_test_scaled)[:, 1]
+best_accuracy = accuracy_score(y_test, y_pred)
+test_metrics = {
+    'accuracy': best_accuracy,
+    'precision': precision_score(y_test, y_pred),
+    'recall': recall_score(y_test, y_pred),
+    'f1': f1_score(y_test, y_pred),
+    'auc': roc_auc_score(y_test, y_pred_proba),
+}
+print(f"    ✓ Test accuracy: {test_metrics['accuracy']:.4f}")
+print(f"    ✓ Test ROC-AUC: {test_metrics['auc']:.4f}")
 
-print(f"\n✅ BEST MODEL: {best_model_name} (Accuracy: {best_accuracy:.4f})")
+print(f"\n✅ BEST MODEL: {best_model_name} (CV accuracy: {results[best_model_name]['accuracy']:.4f}, "
+      f"test accuracy: {best_accuracy:.4f})")
 
 # Step 8: Save model and scaler
 print("\n💾 Saving model and scaler...")
@@ -167,9 +235,23 @@ metadata = {
     'accuracy': best_accuracy,
     'feature_names': list(X.columns),
     'all_results': results,
+    'test_results': test_metrics,
+    'cv_folds': Config.TRAINING_CV_FOLDS,
+    'cv_wall_seconds': cv_wall_seconds,
+    'hyperparameters': best_model.get_params(),
+    'benchmarks': benchmarks,
+    'selection': selection,
     'merged_datasets': {
         'dataset1': 'diabetes_original.csv',
         'dataset2': 'healthcare_diabetes.csv'
+    },
+    'dataset': {
+        'cache_key': schema['key'],
+        'n_rows': schema['n_rows'],
+        'duplicates_dropped': schema['duplicates_dropped'],
+        'sources': schema['sources'],
+        'production_export': production_export,
+        'production_source': production_source,
     }
 }
 joblib.dump(metadata, metadata_path)
@@ -178,6 +260,92 @@ print(f"✓ Model saved: {model_path}")
 print(f"✓ Scaler saved: {scaler_path}")
 print(f"✓ Metadata saved: {metadata_path}")
 
+# Step 9: Distill the winner into a compact student
+students = {}
+if Config.DISTILLATION_ENABLED and isinstance(best_model, LogisticRegression):
+    print(f"\n✓ {best_model_name} is already as compact as a student; skipping distillation")
+elif Config.DISTILLATION_ENABLED:
+    print(f"\n🧪 Distilling {best_model_name} into a compact student "
+          f"({len(X_train)} training rows + {Config.DISTILLATION_SYNTHETIC_SAMPLES} synthetic rows)...")
+    student_kind, students = distill(
+        best_model, scaler, X_train, X_test,
+        n_synthetic=Config.DISTILLATION_SYNTHETIC_SAMPLES, max_depth=Config.DISTILLATION_TREE_DEPTH
+    )
+
+    teacher_benchmark = benchmarks[best_model_name]
+    print(f"\n{'Model':<32} {'Agreement':<11} {'Prob MAE':<10} {'Test acc':<10} {'1 row p99 ms':<14} {'Pickle KB':<10}")
+    print("-" * 80)
+    print(f"{best_model_name + ' (teacher)':<32} {'-':<11} {'-':<10} {best_accuracy:<10.4f} "
+          f"{teacher_benchmark['single_p99_ms']:<14.3f} {teacher_benchmark['pickle_bytes'] / 1024:<10.0f}")
+    for kind, entry in students.items():
+        entry['benchmark'] = benchmark_model(entry['model'], scaler, X_test)
+        entry['test_accuracy'] = accuracy_score(y_test, entry['model'].predict(X_test_scaled))
+        marker = "⭐ BEST FIT" if kind == student_kind else ""
+        print(f"{kind + ' student':<32} {entry['fidelity']['agreement']:<11.4f} "
+              f"{entry['fidelity']['probability_mae']:<10.4f} {entry['test_accuracy']:<10.4f} "
+              f"{entry['benchmark']['single_p99_ms']:<14.3f} {entry['benchmark']['pickle_bytes'] / 1024:<10.0f} {marker}")
+
+# Step 10: Cascade first stage; a linear model scores every request and the winner
+# only rescores the rows near the threshold. Always published (it is small), so the
+# cascade can be switched on with CASCADE_ENABLED once its agreement is acceptable
+first_stage = None
+if not isinstance(best_model, LogisticRegression):
+    if 'logistic' in students:
+        first_stage, first_stage_name = students['logistic']['model'], 'logistic student'
+    else:
+        first_stage, first_stage_name = fitted_models['Logistic Regression'], 'Logistic Regression'
+    cascade_report = evaluate_band(first_stage.predict_proba(X_test_scaled)[:, 1], y_pred_proba,
+                                   threshold=Config.CASCADE_THRESHOLD, band=Config.CASCADE_BAND)
+    cascade_report['first_stage'] = first_stage_name
+    metadata['cascade'] = cascade_report
+    print(f"\n🪜 Cascade: {first_stage_name} first, {best_model_name} within ±{Config.CASCADE_BAND:.2f} "
+          f"of {Config.CASCADE_THRESHOLD:.2f}")
+    print(f"✓ Test rows escalated: {cascade_report['escalation_rate']:.1%}, "
+          f"label agreement with {best_model_name} alone: {cascade_report['agreement']:.1%}")
+    if not Config.CASCADE_ENABLED:
+        print("  (served only with CASCADE_ENABLED=true)")
+
+# Publish a new registry version; running workers switch to the active one on their next poll
+registry = ModelRegistry(Config.MODEL_REGISTRY_DIR)
+version = registry.publish(best_model, scaler, metadata, activate=False, first_stage=first_stage)
+print(f"\n✓ Published model version {version} to {Config.MODEL_REGISTRY_DIR}")
+
+serving_version = version
+if students:
+    student = students[student_kind]
+    speedup = teacher_benchmark['single_p99_ms'] / student['benchmark']['single_p99_ms']
+    serve_student = (student['fidelity']['agreement'] >= Config.DISTILLATION_MIN_AGREEMENT
+                     and speedup > 1.0 and '--keep-teacher' not in sys.argv)
+
+    student_metadata = dict(metadata)
+    student_metadata.pop('cascade', None)
+    student_metadata.update({
+        'model_name': f'{student_kind.title()} student of {best_model_name}',
+        'accuracy': student['test_accuracy'],
+        'hyperparameters': student['model'].get_params(),
+        'distillation': {
+            'teacher_version': version,
+            'teacher_model_name': best_model_name,
+            'student_kind': student_kind,
+            'synthetic_samples': Config.DISTILLATION_SYNTHETIC_SAMPLES,
+            'fidelity': student['fidelity'],
+            'benchmark': student['benchmark'],
+            'single_p99_speedup': speedup,
+        },
+    })
+    student_version = registry.publish(student['model'], scaler, student_metadata, activate=False)
+    print(f"✓ Published {student_kind} student as version {student_version} "
+          f"({student['fidelity']['agreement']:.1%} agreement, {speedup:.1f}x faster single-row p99)")
+    if serve_student:
+        serving_version = student_version
+        print(f"✓ Serving the student; teacher {version} stays in the registry as the fallback")
+    elif student['fidelity']['agreement'] < Config.DISTILLATION_MIN_AGREEMENT:
+        print(f"⚠ Student agreement is below {Config.DISTILLATION_MIN_AGREEMENT:.0%}; serving the teacher")
+    else:
+        print("✓ Serving the teacher (the student is not faster, or --keep-teacher was given)")
+registry.activate(serving_version)
+print(f"✓ Active model version: {serving_version}")
+
 print("\n" + "=" * 80)
 print("✅ MODEL TRAINING COMPLETE!")
 print("=" * 80)